@@ -22,6 +22,7 @@ import glob
 import argparse
 import hashlib
 import ast
+import tidals as td
 
 
 # %% USER INPUTS
@@ -95,6 +96,15 @@ parser.add_argument("--filterByDatesExceptUploadsAndSettings",
                          "after start and end dates, so include ALL " +
                          "upload and settings data in export")
 
+parser.add_argument("--deprecated-timezone-list",
+                    dest="timezoneAliasesFilePathAndName",
+                    default=None,
+                    help="optional .csv file that contains a list of " +
+                         "deprecated timezones and their alias. If it is " +
+                         "specified, and the data does not have an " +
+                         "est.localTime, the local time is estimated " +
+                         "before the data is exported")
+
 args = parser.parse_args()
 # Because having a default for an action="append" always includes the default...
 if args.exportFormat is None:
@@ -103,17 +113,20 @@ if args.exportFormat is None:
 
 # %% LOAD DATA FUNCTIONS
 def checkInputFile(inputFile):
+    # compressed files (e.g., .json.gz, .json.zst, .csv.gz) are decompressed
+    # as they are read (pandas infers the compression from the extension)
+    baseFile, compression = td.split_compression(inputFile)
     if os.path.isfile(inputFile):
-        if os.stat(inputFile).st_size > 2:
-            if inputFile[-4:] == "json":
+        if td.has_data(inputFile, 2):
+            if baseFile[-4:] == "json":
                 inputData = pd.read_json(inputFile, orient="records")
-                fileName = os.path.split(inputFile)[-1][:-5]
-            elif inputFile[-4:] == "xlsx":
+                fileName = os.path.split(baseFile)[-1][:-5]
+            elif (baseFile[-4:] == "xlsx") and (compression is None):
                 inputData = readXlsxData(inputFile)
-                fileName = os.path.split(inputFile)[-1][:-5]
-            elif inputFile[-3:] == "csv":
+                fileName = os.path.split(baseFile)[-1][:-5]
+            elif baseFile[-3:] == "csv":
                 inputData = pd.read_csv(inputFile, low_memory=False)
-                fileName = os.path.split(inputFile)[-1][:-4]
+                fileName = os.path.split(baseFile)[-1][:-4]
             else:
                 sys.exit("{0} is not a json, xlsx, or csv".format(inputFile))
         else:
@@ -197,48 +210,17 @@ def tempRemoveFields(df):
     return df, tempDf
 
 
-def removeBrackets(df, fieldName):
-    if fieldName in list(df):
-        df.loc[df[fieldName].notnull(), fieldName] = \
-            df.loc[df[fieldName].notnull(), fieldName].str[0]
-
-    return df
-
-
 def flattenJson(df, dataFieldsForExport):
 
     # remove fields that we don't want to flatten
     df, holdData = tempRemoveFields(df)
 
-    # remove [] from annotations field
-    df = removeBrackets(df, "annotations")
-
-    # get a list of data types of column headings
-    columnHeadings = list(df)  # ["payload", "suppressed"]
+    # flatten the embedded json (to any depth), and only create the nested
+    # fields that are approved for export
+    df = td.flatten_json(df, columns=dataFieldsForExport)
 
-    # loop through each columnHeading
-    newDataFrame = pd.DataFrame()
-
-    for colHead in columnHeadings:
-        # if the df field has embedded json
-        if any(isinstance(item, dict) for item in df[colHead]):
-            # grab the data that is in brackets
-            jsonBlob = df[colHead][df[colHead].astype(str).str[0] == "{"]
-
-            # replace those values with nan
-            df.loc[jsonBlob.index, colHead] = np.nan
-
-            # turn jsonBlob to dataframe
-            newDataFrame = pd.concat([newDataFrame, pd.DataFrame(jsonBlob.tolist(),
-                                        index=jsonBlob.index).add_prefix(colHead + '.')], axis=1)
-
-    newColHeadings = list(newDataFrame)
-
-    # put df back into the main dataframe
-    # and add the fields that were removed back in
-    columnFilter = list(set(newColHeadings) & set(dataFieldsForExport))
-    tempDataFrame = newDataFrame.filter(items=columnFilter)
-    df = pd.concat([df, tempDataFrame, holdData], axis=1)
+    # add the fields that were removed back in
+    df = pd.concat([df, holdData], axis=1)
 
     return df
 
@@ -650,6 +632,17 @@ def exportData(df, fileName, fileType, exportDirectory, mergeCalculatorData):
 # and in either json, xlsx, or csv format
 data, userID = checkInputFile(args.inputFilePathAndName)
 
+# estimate the local time (in memory) if it has not already been estimated
+# (see estimate-local-time.py and tidals.localtime.estimate)
+if ((args.timezoneAliasesFilePathAndName is not None) &
+        ("est.localTime" not in data)):
+    if not os.path.isfile(args.timezoneAliasesFilePathAndName):
+        sys.exit("{0} is not a valid file".format(
+                args.timezoneAliasesFilePathAndName))
+    timezoneAliases = td.read_timezone_aliases(
+        args.timezoneAliasesFilePathAndName)
+    data, _ = td.localtime.estimate(data, timezoneAliases)
+
 
 # %% FILTER DATA
 # check export/approved data field list
@@ -106,6 +106,7 @@ if not os.path.isdir(metadataPath):
     os.makedirs(jsonDataPath)
 
 allStats = pd.DataFrame()
+allCgm = []
 metaData = pd.DataFrame(columns=["userID",
                                  "studyID",
                                  "getData.response1",
@@ -114,73 +115,30 @@ metaData = pd.DataFrame(columns=["userID",
 
 
 # %% FUNCTIONS
-def get_stats(df):
-    statDF = pd.DataFrame(index=[0])
-    statDF["totalNumberCBGValues"] = df.mg_dL.count()
-
-    statDF["mean_mgdL"] = df.mg_dL.mean()
-    statDF["std_mgdL"] = df.mg_dL.std()
-    statDF["cov_mgdL"] = statDF["std_mgdL"] / statDF["mean_mgdL"]
-
-    statDF["totalBelow54"] = sum(df.mg_dL < 54)
-    statDF["totalBelow70"] = sum(df.mg_dL < 70)
-    statDF["total54to70"] = sum((df.mg_dL >= 54) & (df.mg_dL < 70))
-    statDF["total70to140"] = sum((df.mg_dL >= 70) & (df.mg_dL <= 140))
-    statDF["total70to180"] = sum((df.mg_dL >= 70) & (df.mg_dL <= 180))
-    statDF["total180to250"] = sum((df.mg_dL > 180) & (df.mg_dL <= 250))
-    statDF["totalAbove180"] = sum(df.mg_dL > 180)
-    statDF["totalAbove250"] = sum(df.mg_dL > 250)
-
-    statDF["percentBelow54"] = statDF["totalBelow54"] / statDF["totalNumberCBGValues"]
-    statDF["percentBelow70"] = statDF["totalBelow70"] / statDF["totalNumberCBGValues"]
-    statDF["percent70to140"] = statDF["total70to140"] / statDF["totalNumberCBGValues"]
-    statDF["percent70to180"] = statDF["total70to180"] / statDF["totalNumberCBGValues"]
-    statDF["percentAbove180"] = statDF["totalAbove180"] / statDF["totalNumberCBGValues"]
-    statDF["percentAbove250"] = statDF["totalAbove250"]  / statDF["totalNumberCBGValues"]
-
-    statDF["min_mgdL"] = df.mg_dL.min()
-    statDF["median_mgdL"] = df.mg_dL.describe()["50%"]
-    statDF["max_mgdL"] = df.mg_dL.max()
-
-    # calculate the start and end time of the cbg data
-    startTime = df["localTime"].min()
-    statDF["startTime"] = startTime
-    endTime = df["localTime"].max()
-    statDF["endTime"] = endTime
-    statDF["totalNumberPossibleCBGvalues"] = len(pd.date_range(startTime, endTime, freq="5min"))
-
+def add_feedback_flags(statDF):
     # feedback criteria
-    # A.  incomplete dataset
-    statDF["percentOfExpectedData"] = \
-        (((endTime - startTime).days * 86400) +
-         ((endTime - startTime).seconds)) / (86400 - (5*60))
-
-    if statDF.loc[0, "percentOfExpectedData"] < 0.834:  # greater than 4 hours of expected data
-        statDF["GTE4hoursNoCgmSignal"] = "NA"
-        statDF["incompleteDataset"] = "FLAG (" + \
-            str(round(statDF.loc[0, "percentOfExpectedData"] * 100, 1)) + "%)"
-    else:
-        statDF["incompleteDataset"] = np.nan
-
-        # 1.  >=4 hours without CGM signal
-        missingCgm = statDF["totalNumberPossibleCBGvalues"] - statDF["totalNumberCBGValues"]
-        if missingCgm[0] > (4 * 60 / 5):
-            statDF["GTE4hoursNoCgmSignal"] = "FLAG"
-        else:
-            statDF["GTE4hoursNoCgmSignal"] = np.nan
+    # A.  incomplete dataset (less than 20 hours of expected data)
+    isIncomplete = statDF["percentOfExpectedData"] < 0.834
+    statDF["incompleteDataset"] = statDF["percentOfExpectedData"].map(
+        lambda x: "FLAG (" + str(round(x * 100, 1)) + "%)").where(isIncomplete)
+
+    # 1.  >=4 hours without CGM signal
+    missingCgm = \
+        statDF["totalNumberPossibleCBGvalues"] - statDF["totalNumberCBGValues"]
+    statDF["GTE4hoursNoCgmSignal"] = pd.Series(
+        "FLAG", index=statDF.index).where(missingCgm > (4 * 60 / 5))
+    statDF["GTE4hoursNoCgmSignal"] = \
+        statDF["GTE4hoursNoCgmSignal"].mask(isIncomplete, "NA")
 
     # 2.  >= 2 hours 54 <= BG < 70 mg/dl
-    if statDF.loc[0, "total54to70"] > (2 * 60 / 5):
-        statDF["GTE2hoursBetween54to70"] = \
-            "FLAG (" + str(round(statDF.loc[0, "total54to70"] * 5)) + "min)"
-    else:
-        statDF["GTE2hoursBetween54to70"] = np.nan
+    statDF["GTE2hoursBetween54to70"] = statDF["total54to70"].map(
+        lambda x: "FLAG (" + str(round(x * 5)) + "min)").where(
+            statDF["total54to70"] > (2 * 60 / 5))
 
     # 3.  >= 15 minutes < 54 mg/dl"
-    if statDF.loc[0, "totalBelow54"] > (15 / 5):
-        statDF["GTE15minBelow54"] = "FLAG (" + str(round(statDF.loc[0, "totalBelow54"] * 5)) + "min)"
-    else:
-        statDF["GTE15minBelow54"] = np.nan
+    statDF["GTE15minBelow54"] = statDF["totalBelow54"].map(
+        lambda x: "FLAG (" + str(round(x * 5)) + "min)").where(
+            statDF["totalBelow54"] > (15 / 5))
 
     return statDF
 
@@ -229,12 +187,8 @@ def sort_and_pretty_stat_output(df):
 
 
 def get_timeZoneOffset(currentDate, userTz):
-    tz = timezone(userTz)
-    tzoNum = int(tz.localize(pd.to_datetime(currentDate) + timedelta(days=1)).strftime("%z"))
-    tzoHours = np.floor(tzoNum / 100)
-    tzoMinutes = round((tzoNum / 100 - tzoHours) * 100, 0)
-    tzoSign = np.sign(tzoHours)
-    tzo = int((tzoHours * 60) + (tzoMinutes * tzoSign))
+    # the offset of the start of the next day (see tidals.timezone_offsets)
+    tzo = int(td.timezone_offsets(userTz, [pd.to_datetime(currentDate)])[0])
     return tzo
 
 
@@ -396,7 +350,10 @@ for dIndex in studyPartipants.index:
 
                 if len(cgm) > 1:
 
-                    stats = get_stats(cgm)
+                    # the stats of all participants are calculated together
+                    allCgm.append(cgm[["mg_dL", "localTime"]].assign(
+                        dIndex=dIndex))
+                    stats = pd.DataFrame(index=[dIndex])
 
                     # save raw data
                     cgm = cgm.sort_values("localTime").reset_index(drop=True)
@@ -419,8 +376,17 @@ for dIndex in studyPartipants.index:
         stats["incompleteDataset"] = "no data"
 
     stats["studyID"] = studyID
+    stats["dIndex"] = dIndex
     allStats = pd.concat([allStats, stats], ignore_index=True, sort=False)
 
+# calculate the stats of all participants with cgm data (at once)
+if len(allCgm) > 0:
+    cgmStats = add_feedback_flags(
+        td.cgm_stats(pd.concat(allCgm, ignore_index=True), by="dIndex"))
+    allStats = allStats.set_index("dIndex")
+    allStats = cgmStats.set_index("dIndex").combine_first(allStats).reindex(
+        allStats.index).reset_index()
+
 # sort and save output
 feedback = sort_and_pretty_stat_output(allStats)
 
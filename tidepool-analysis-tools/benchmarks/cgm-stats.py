@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: check and benchmark tidals.stats.cgm_stats against the
+    original (one participant at a time) get_stats of
+    clinician-insights/daily-feedback.py, on synthetic days of cgm data
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python cgm-stats.py [--n-participants 500]
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if tidalsPath not in sys.path:
+    sys.path.insert(0, tidalsPath)
+import tidals as td
+
+
+# %% USER INPUTS
+codeDescription = "Check and benchmark tidals.stats.cgm_stats"
+
+parser = argparse.ArgumentParser(description=codeDescription)
+parser.add_argument("--n-participants",
+                    dest="nParticipants",
+                    default=500,
+                    type=int,
+                    help="number of participants")
+parser.add_argument("--n-days",
+                    dest="nDays",
+                    default=3,
+                    type=int,
+                    help="number of days of cgm data per participant")
+parser.add_argument("--seed",
+                    dest="seed",
+                    default=0,
+                    type=int,
+                    help="random seed of the synthetic data")
+
+args = parser.parse_args()
+
+
+# %% FUNCTIONS
+def get_stats(df):
+    # the stats of the original get_stats (without the feedback flags)
+    statDF = pd.DataFrame(index=[0])
+    statDF["totalNumberCBGValues"] = df.mg_dL.count()
+
+    statDF["mean_mgdL"] = df.mg_dL.mean()
+    statDF["std_mgdL"] = df.mg_dL.std()
+    statDF["cov_mgdL"] = statDF["std_mgdL"] / statDF["mean_mgdL"]
+
+    statDF["totalBelow54"] = sum(df.mg_dL < 54)
+    statDF["totalBelow70"] = sum(df.mg_dL < 70)
+    statDF["total54to70"] = sum((df.mg_dL >= 54) & (df.mg_dL < 70))
+    statDF["total70to140"] = sum((df.mg_dL >= 70) & (df.mg_dL <= 140))
+    statDF["total70to180"] = sum((df.mg_dL >= 70) & (df.mg_dL <= 180))
+    statDF["total180to250"] = sum((df.mg_dL > 180) & (df.mg_dL <= 250))
+    statDF["totalAbove180"] = sum(df.mg_dL > 180)
+    statDF["totalAbove250"] = sum(df.mg_dL > 250)
+
+    statDF["percentBelow54"] = statDF["totalBelow54"] / statDF["totalNumberCBGValues"]
+    statDF["percentBelow70"] = statDF["totalBelow70"] / statDF["totalNumberCBGValues"]
+    statDF["percent70to140"] = statDF["total70to140"] / statDF["totalNumberCBGValues"]
+    statDF["percent70to180"] = statDF["total70to180"] / statDF["totalNumberCBGValues"]
+    statDF["percentAbove180"] = statDF["totalAbove180"] / statDF["totalNumberCBGValues"]
+    statDF["percentAbove250"] = statDF["totalAbove250"] / statDF["totalNumberCBGValues"]
+
+    statDF["min_mgdL"] = df.mg_dL.min()
+    statDF["median_mgdL"] = df.mg_dL.describe()["50%"]
+    statDF["max_mgdL"] = df.mg_dL.max()
+
+    startTime = df["localTime"].min()
+    statDF["startTime"] = startTime
+    endTime = df["localTime"].max()
+    statDF["endTime"] = endTime
+    statDF["totalNumberPossibleCBGvalues"] = len(pd.date_range(startTime, endTime, freq="5min"))
+    statDF["percentOfExpectedData"] = \
+        (((endTime - startTime).days * 86400) +
+         ((endTime - startTime).seconds)) / (86400 - (5*60))
+
+    return statDF
+
+
+def make_cgm_data(nParticipants, nDays, seed):
+    # 5-minute cgm data (mg/dL) with random missing values, for each day of
+    # each participant
+    rng = np.random.RandomState(seed)
+    nSlots = nDays * 288
+    participantData = []
+    for pIndex in range(nParticipants):
+        hasData = rng.uniform(size=nSlots) < rng.uniform(0.5, 1)
+        nPoints = hasData.sum()
+        participantData.append(pd.DataFrame({
+            "participant": pIndex,
+            "day": np.nonzero(hasData)[0] // 288,
+            "localTime": pd.Timestamp("2018-01-01 06:00") +
+            pd.to_timedelta(np.nonzero(hasData)[0] * 5, unit="m"),
+            "mg_dL": rng.normal(150, 60, nPoints).clip(39, 401).astype(int)}))
+
+    return pd.concat(participantData, ignore_index=True)
+
+
+# %% START OF CODE
+cgm = make_cgm_data(args.nParticipants, args.nDays, args.seed)
+print("{0} cgm points, {1} participants, {2} days each".format(
+    len(cgm), args.nParticipants, args.nDays))
+
+for by in [["participant"], ["participant", "day"]]:
+    startTime = time.perf_counter()
+    loopStats = pd.concat([get_stats(groupData) for _, groupData in
+                           cgm.groupby(by)], ignore_index=True)
+    loopTime = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    newStats = td.cgm_stats(cgm, by=by)
+    newTime = time.perf_counter() - startTime
+
+    # the stats have to match the original implementation
+    pd.testing.assert_frame_equal(loopStats, newStats[list(loopStats)],
+                                  check_dtype=False, rtol=1e-12)
+    print("by {0}: same stats, loop {1:.3f} s, batched {2:.3f} s "
+          "({3:.0f}x faster)".format(by, loopTime, newTime,
+                                     loopTime / newTime))
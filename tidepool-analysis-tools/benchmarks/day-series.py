@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: check and benchmark tidals.localtime.estimate_day_series against
+    the day by day (reference) implementation of the local time estimation,
+    on synthetic day series with travel, dst, am/pm, and clock drift errors
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python day-series.py [--n-series 200 --n-days 365]
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if tidalsPath not in sys.path:
+    sys.path.insert(0, tidalsPath)
+import tidals as td
+
+
+# %% USER INPUTS
+codeDescription = "Check and benchmark tidals.localtime.estimate_day_series"
+
+parser = argparse.ArgumentParser(description=codeDescription)
+parser.add_argument("--n-series",
+                    dest="nSeries",
+                    default=200,
+                    type=int,
+                    help="number of synthetic day series to check")
+parser.add_argument("--n-days",
+                    dest="nDays",
+                    default=365,
+                    type=int,
+                    help="(max) number of days of each day series")
+parser.add_argument("--compiled",
+                    dest="compiled",
+                    default=None,
+                    type=lambda x: x.lower() in ["1", "true", "yes"],
+                    help="whether to compile the day loops with numba "
+                    "(default: if numba is installed)")
+parser.add_argument("--seed",
+                    dest="seed",
+                    default=0,
+                    type=int,
+                    help="random seed of the synthetic day series")
+
+args = parser.parse_args()
+
+
+# %% FUNCTIONS
+timezones = ["US/Central", "America/Denver", "America/Los_Angeles",
+             "Europe/London", "Asia/Kolkata", "Australia/Adelaide",
+             "America/Phoenix", "Pacific/Auckland"]
+
+
+def random_days(rng, nDays, p):
+    # a random subset of the days
+    return rng.uniform(size=nDays) < p
+
+
+def masked(values, isDay):
+    # the values of the days, and nan on the other days
+    return pd.Series(values, dtype=object).where(isDay).values
+
+
+def make_day_series(rng, nDays):
+    # a (most recent day first) day series, with a home timezone, trips to
+    # other timezones, and device tzos with the errors that the estimation
+    # looks for
+    nDays = rng.randint(2, nDays + 1)
+    lastDay = pd.Timestamp("2014-01-01") + \
+        pd.Timedelta(days=int(rng.randint(0, 5 * 365)))
+    dates = pd.date_range(end=lastDay, periods=nDays)[::-1]
+    cDays = pd.DataFrame({"date": dates.date})
+
+    homeTz = np.nan
+    if rng.uniform() < 0.95:
+        homeTz = timezones[rng.randint(len(timezones))]
+    trueTz = np.full(nDays, homeTz, dtype=object)
+    for tripStart in rng.randint(0, nDays, rng.randint(0, 4)):
+        trueTz[tripStart:tripStart + rng.randint(1, 20)] = \
+            timezones[rng.randint(len(timezones))]
+    isTz = pd.notnull(trueTz)
+    trueTzo = np.full(nDays, np.nan)
+    trueTzo[isTz] = td.timezone_offsets(trueTz[isTz], dates[isTz])
+
+    def device_tzos(p):
+        tzo = trueTzo.copy()
+        tzo[~random_days(rng, nDays, p)] = np.nan
+        errors = rng.choice([0, 60, -60, 15, -30, 720, 180], nDays,
+                            p=[0.7, 0.07, 0.07, 0.04, 0.04, 0.04, 0.04])
+        return tzo + errors
+
+    cDays["upload.timezoneOffset"] = np.nan
+    if rng.uniform() < 0.9:
+        isUpload = random_days(rng, nDays, 0.05) & isTz
+        cDays["upload.timezoneOffset"] = np.where(isUpload, trueTzo, np.nan)
+        cDays["upload.timezone"] = masked(trueTz, isUpload)
+        cDays["upload.timeProcessing"] = masked(
+            rng.choice(["utc-bootstrapping", "none"], nDays), isUpload)
+    cDays["cgm.timezoneOffset"] = device_tzos(rng.uniform(0, 1))
+    cDays["pump.timezoneOffset"] = device_tzos(rng.uniform(0, 1))
+
+    for deviceType in ["pump", "cgm", "healthkit"]:
+        imputed = deviceType + ".upload.imputed."
+        isUpload = random_days(rng, nDays, 0.03) & isTz
+        tz = pd.Series(masked(trueTz, isUpload)).ffill()
+        tzo = np.full(nDays, np.nan)
+        hasTz = tz.notnull().values
+        tzo[hasTz] = td.timezone_offsets(tz[hasTz].values, dates[hasTz])
+        cDays[imputed + "timezoneOffset"] = tzo
+        cDays[imputed + "timezone"] = tz.values
+        cDays[imputed + "timeProcessing"] = pd.Series(masked(
+            [deviceType + "-processing"] * nDays, isUpload)).ffill().values
+
+    cDays["home.imputed.timezoneOffset"] = np.nan
+    if pd.notnull(homeTz):
+        cDays["home.imputed.timezoneOffset"] = \
+            td.timezone_offsets(homeTz, dates)
+    cDays["home.imputed.timezone"] = homeTz
+    cDays["home.imputed.timeProcessing"] = np.nan
+
+    return cDays
+
+
+# %% START OF CODE
+rng = np.random.RandomState(args.seed)
+daySeries = [make_day_series(rng, args.nDays) for s in range(args.nSeries)]
+
+# the first (compiled) call of estimate_day_series is not timed
+td.estimate_day_series(daySeries[0], compiled=args.compiled)
+
+nMismatches, referenceTime, newTime = 0, 0, 0
+for sIndex, cDays in enumerate(daySeries):
+    startTime = time.perf_counter()
+    referenceDays = td.estimate_day_series_reference(cDays.copy())
+    referenceTime += time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    newDays = td.localtime.with_annotation_messages(
+        td.estimate_day_series(cDays, compiled=args.compiled))
+    newTime += time.perf_counter() - startTime
+
+    try:
+        pd.testing.assert_frame_equal(newDays, referenceDays)
+    except AssertionError as error:
+        nMismatches += 1
+        print("MISMATCH in day series", sIndex, error)
+
+print("{0} day series, {1} days, {2} mismatches".format(
+    len(daySeries), sum(len(d) for d in daySeries), nMismatches))
+print("reference: {0:.2f} s, tidals.localtime: {1:.2f} s".format(
+    referenceTime, newTime))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: benchmark how long it takes to import the tidals package
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python import-time.py [-n 20]
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+
+# %% USER INPUTS
+codeDescription = "Benchmark the import time of the tidals package " + \
+                  "(using python -X importtime)"
+
+parser = argparse.ArgumentParser(description=codeDescription)
+parser.add_argument("-n",
+                    "--n-runs",
+                    dest="nRuns",
+                    default=20,
+                    type=int,
+                    help="number of times each import is timed")
+
+args = parser.parse_args()
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+# %% FUNCTIONS
+def import_time(code):
+    # returns the cumulative import time (in ms) of each top-level module
+    # imported by <code>, and the names of all of the imported modules, from
+    # the stderr of "python -X importtime"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = tidalsPath + os.pathsep + env.get("PYTHONPATH", "")
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            env=env, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True).stderr
+    moduleTimes = {}
+    moduleNames = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or ("cumulative" in line):
+            continue
+        _, cumulative, moduleName = line[len("import time:"):].split("|")
+        moduleNames.add(moduleName.strip())
+        # nested imports are indented, only keep the top-level ones
+        if not moduleName.startswith("  "):
+            moduleTimes[moduleName.strip()] = int(cumulative) / 1000
+
+    return moduleTimes, moduleNames
+
+
+def benchmark(code, nRuns):
+    runs = [import_time(code) for _ in range(nRuns)]
+    tidalsTimes = [moduleTimes.get("tidals", 0) for moduleTimes, _ in runs]
+    totalTimes = [sum(moduleTimes.values()) for moduleTimes, _ in runs]
+    loaded = [m for m in ["numpy", "pandas", "pyarrow"] if m in runs[-1][1]]
+
+    return {"tidals (ms)": statistics.median(tidalsTimes),
+            "all imports (ms)": statistics.median(totalTimes),
+            "heavy dependencies": ", ".join(loaded) if loaded else "none"}
+
+
+# %% START OF CODE
+cases = {
+    "import tidals": "import tidals",
+    "first use (tidals.load_data)": "import tidals; tidals.load_data",
+}
+
+for caseName, code in cases.items():
+    results = benchmark(code, args.nRuns)
+    print("{0}:".format(caseName))
+    for k, v in results.items():
+        print("    {0}: {1}".format(
+            k, round(v, 1) if isinstance(v, float) else v))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: check and benchmark tidals.localtime.apply_local_time_estimates
+    against the record by record (reference) implementation of the local time
+    estimation, on synthetic 5-minute data with trips to other timezones
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python local-time.py [--n-donors 5 --n-days 730]
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if tidalsPath not in sys.path:
+    sys.path.insert(0, tidalsPath)
+import tidals as td
+
+
+# %% USER INPUTS
+codeDescription = "Check and benchmark tidals.localtime.apply_local_time_" + \
+    "estimates"
+
+parser = argparse.ArgumentParser(description=codeDescription)
+parser.add_argument("--n-donors",
+                    dest="nDonors",
+                    default=5,
+                    type=int,
+                    help="number of synthetic donors")
+parser.add_argument("--n-days",
+                    dest="nDays",
+                    default=730,
+                    type=int,
+                    help="number of days of data per donor")
+parser.add_argument("--seed",
+                    dest="seed",
+                    default=0,
+                    type=int,
+                    help="random seed of the synthetic data")
+
+args = parser.parse_args()
+
+
+# %% FUNCTIONS
+timezones = ["US/Central", "America/Denver", "America/Los_Angeles",
+             "Europe/London", "Asia/Kolkata", "Australia/Adelaide",
+             "America/Phoenix", "Pacific/Auckland"]
+
+
+def make_donor(rng, nDays):
+    # 5-minute utc times (with missing days), and a day series with a home
+    # timezone, trips, and days without a timezone estimate
+    firstDay = pd.Timestamp("2014-01-01") + \
+        pd.Timedelta(days=int(rng.randint(0, 3 * 365)))
+    utcTimes = pd.date_range(firstDay, periods=nDays * 288, freq="5min")
+    utcTimes = utcTimes[rng.uniform(size=len(utcTimes)) < 0.9]
+    data = pd.DataFrame({"utcTime": utcTimes,
+                         "value": rng.randint(40, 400, len(utcTimes))})
+    data["date"] = data["utcTime"].dt.date
+
+    dates = pd.date_range(firstDay, data["utcTime"].max().normalize())[::-1]
+    homeTz = timezones[rng.randint(len(timezones))]
+    estTz = np.full(len(dates), homeTz, dtype=object)
+    for tripStart in rng.randint(0, len(dates), 6):
+        estTz[tripStart:tripStart + rng.randint(1, 20)] = \
+            timezones[rng.randint(len(timezones))]
+    estTz[rng.uniform(size=len(dates)) < 0.05] = np.nan
+
+    cDays = pd.DataFrame({"date": dates.date})
+    cDays["home.imputed.timezoneOffset"] = td.timezone_offsets(homeTz, dates)
+    cDays["home.imputed.timezone"] = homeTz
+    cDays["est.timezone"] = estTz
+    cDays["est.timezoneOffset"] = td.timezone_offsets(estTz, dates)
+    isTzoOnly = rng.uniform(size=len(dates)) < 0.05
+    cDays.loc[isTzoOnly, "est.timezone"] = np.nan
+
+    return data, cDays
+
+
+# %% START OF CODE
+rng = np.random.RandomState(args.seed)
+nMismatches, nRecords, referenceTime, newTime = 0, 0, 0, 0
+for dIndex in range(args.nDonors):
+    data, cDays = make_donor(rng, args.nDays)
+    nRecords += len(data)
+
+    startTime = time.perf_counter()
+    referenceData = td.apply_local_time_estimates_reference(data.copy(), cDays)
+    referenceTime += time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    newData = td.apply_local_time_estimates(data, cDays)
+    newTime += time.perf_counter() - startTime
+
+    try:
+        pd.testing.assert_frame_equal(newData, referenceData)
+    except AssertionError as error:
+        nMismatches += 1
+        print("MISMATCH in donor", dIndex, error)
+
+print("{0} donors, {1} records, {2} mismatches".format(
+    args.nDonors, nRecords, nMismatches))
+print("reference: {0:.2f} s, tidals.localtime: {1:.2f} s".format(
+    referenceTime, newTime))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: check and benchmark tidals.clean.round_time against the
+    original (loop over each gap) implementation, on a year of 5-minute
+    cgm data with sensor gaps
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python round-time.py [--n-gaps 3000]
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if tidalsPath not in sys.path:
+    sys.path.insert(0, tidalsPath)
+import tidals as td
+
+
+# %% USER INPUTS
+codeDescription = "Check and benchmark tidals.clean.round_time"
+
+parser = argparse.ArgumentParser(description=codeDescription)
+parser.add_argument("--n-days",
+                    dest="nDays",
+                    default=365,
+                    type=int,
+                    help="number of days of 5-minute cgm data")
+parser.add_argument("--n-gaps",
+                    dest="nGaps",
+                    default=3000,
+                    type=int,
+                    help="number of sensor gaps in the data")
+parser.add_argument("--seed",
+                    dest="seed",
+                    default=0,
+                    type=int,
+                    help="random seed of the synthetic data")
+
+args = parser.parse_args()
+
+
+# %% FUNCTIONS
+def round_time_loop(df, timeIntervalMinutes=5, timeField="time",
+                    roundedTimeFieldName="roundedTime", verbose=False):
+    # the original round_time, which loops over each large gap
+    df.sort_values(by=timeField, ascending=True, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    t = pd.to_datetime(df.time)
+    t_shift = pd.to_datetime(df.time.shift(1))
+    df["TIB"] = round((t - t_shift).dt.days*(86400/(60 * timeIntervalMinutes)) +
+                      (t - t_shift).dt.seconds/(60 * timeIntervalMinutes)) * timeIntervalMinutes
+
+    largeGaps = list(df.query("TIB > " + str(timeIntervalMinutes)).index)
+    largeGaps.insert(0, 0)
+    largeGaps.append(len(df))
+
+    for gIndex in range(0, len(largeGaps) - 1):
+
+        df.loc[largeGaps[gIndex], "TIB"] = 0
+
+        df.loc[largeGaps[gIndex]:(largeGaps[gIndex + 1] - 1), "TIB_cumsum"] = \
+            df.loc[largeGaps[gIndex]:(largeGaps[gIndex + 1] - 1), "TIB"].cumsum()
+
+        df.loc[largeGaps[gIndex]:(largeGaps[gIndex + 1] - 1), roundedTimeFieldName] = \
+            pd.to_datetime(df.loc[largeGaps[gIndex], timeField]).round(str(timeIntervalMinutes) + "min") + \
+            pd.to_timedelta(df.loc[largeGaps[gIndex]:(largeGaps[gIndex + 1] - 1), "TIB_cumsum"], unit="m")
+
+    df.sort_values(by=timeField, ascending=False, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    if verbose is False:
+        df.drop(columns=["TIB", "TIB_cumsum"], inplace=True)
+
+    return df
+
+
+def make_cgm_data(nDays, nGaps, seed):
+    # 5-minute cgm data with jitter (+/- 30 seconds) and <nGaps> sensor gaps
+    # of 10 minutes to 2 days, in a random order
+    rng = np.random.RandomState(seed)
+    nPoints = nDays * 288
+    timeInBetween = 300 + rng.randint(-30, 31, nPoints)
+    gapIndices = rng.choice(np.arange(1, nPoints), nGaps, replace=False)
+    timeInBetween[gapIndices] = rng.randint(600, 2 * 86400, nGaps)
+    times = pd.Timestamp("2018-01-01") + \
+        pd.to_timedelta(np.cumsum(timeInBetween), unit="s")
+    cgm = pd.DataFrame({"time": times.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                        "value": rng.uniform(2.2, 22.2, nPoints).round(1)})
+
+    return cgm.sample(frac=1, random_state=rng).reset_index(drop=True)
+
+
+def time_it(roundTimeFunction, cgm, **kwargs):
+    startTime = time.perf_counter()
+    rounded = roundTimeFunction(cgm.copy(), **kwargs)
+    return rounded, time.perf_counter() - startTime
+
+
+# %% START OF CODE
+cgm = make_cgm_data(args.nDays, args.nGaps, args.seed)
+print("{0} cgm points, {1} gaps".format(len(cgm), args.nGaps))
+
+for kwargs in [{"timeIntervalMinutes": 5},
+               {"timeIntervalMinutes": 5, "verbose": True},
+               {"timeIntervalMinutes": 15}]:
+    loopData, loopTime = time_it(round_time_loop, cgm, **kwargs)
+    newData, newTime = time_it(td.round_time, cgm, **kwargs)
+
+    # the output has to be identical to the original implementation
+    pd.testing.assert_frame_equal(loopData, newData, check_exact=True)
+    print("{0}: identical output, loop {1:.3f} s, vectorized {2:.3f} s "
+          "({3:.0f}x faster)".format(kwargs, loopTime, newTime,
+                                     loopTime / newTime))
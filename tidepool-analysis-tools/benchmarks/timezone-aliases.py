@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: check and benchmark tidals.tz.TimezoneAliases (through
+    tidals.localtime.convert_deprecated_timezones) against the str.endswith
+    loop over the alias table, the way the local time estimation has always
+    replaced deprecated timezones
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python timezone-aliases.py [--n-donors 20 --n-records 100000]
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+import time
+import pickle
+import argparse
+import numpy as np
+import pandas as pd
+import pytz
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if tidalsPath not in sys.path:
+    sys.path.insert(0, tidalsPath)
+import tidals as td
+
+
+# %% USER INPUTS
+codeDescription = "Check and benchmark tidals.tz.TimezoneAliases"
+
+defaultAliases = os.path.abspath(os.path.join(
+    tidalsPath, "..", "projects", "bigdata-processing-pipeline",
+    "estimate-local-time", "wikipedia-timezone-aliases-2018-04-28.csv"))
+
+parser = argparse.ArgumentParser(description=codeDescription)
+parser.add_argument("--deprecated-timezone-list",
+                    dest="timezoneAliasesFilePathAndName",
+                    default=defaultAliases,
+                    help="a .csv file that contains a list of deprecated " +
+                    "timezones and their alias")
+parser.add_argument("--n-donors",
+                    dest="nDonors",
+                    default=20,
+                    type=int,
+                    help="number of synthetic donors")
+parser.add_argument("--n-records",
+                    dest="nRecords",
+                    default=100000,
+                    type=int,
+                    help="number of records per donor")
+parser.add_argument("--seed",
+                    dest="seed",
+                    default=0,
+                    type=int,
+                    help="random seed of the synthetic timezones")
+
+args = parser.parse_args()
+
+
+# %% FUNCTIONS
+def candidate_timezones(timezoneAliases, rng):
+    # every pytz timezone, every tz and alias of the table, and random
+    # suffixes of them (e.g., "Central", "/Denver", ""), which are matched
+    # by more than one row (or none) of the table
+    timezones = list(pytz.all_timezones)
+    timezones += list(timezoneAliases["tz"].dropna())
+    timezones += list(timezoneAliases["alias"].dropna())
+    timezones += [tz[rng.randint(len(tz) + 1):] for tz in list(timezones)]
+
+    return np.unique(timezones)
+
+
+def make_donor(rng, candidates, nRecords):
+    # the timezones of a donor's records, a few timezones (and nans) each
+    donorTimezones = rng.choice(candidates, rng.randint(1, 8))
+    timezones = pd.Series(
+        donorTimezones[rng.randint(len(donorTimezones), size=nRecords)],
+        dtype=object)
+    timezones[rng.uniform(size=nRecords) < 0.2] = np.nan
+
+    return pd.DataFrame({"timezone": timezones,
+                         "value": rng.randint(40, 400, nRecords)})
+
+
+# %% START OF CODE
+rng = np.random.RandomState(args.seed)
+timezoneTable = pd.read_csv(args.timezoneAliasesFilePathAndName,
+                            low_memory=False)
+
+startTime = time.perf_counter()
+timezoneAliases = td.TimezoneAliases(timezoneTable)
+buildTime = time.perf_counter() - startTime
+
+# the aliases are sent to worker processes (see localtime.estimate_dataset)
+timezoneAliases = pickle.loads(pickle.dumps(timezoneAliases))
+
+# each candidate timezone on its own
+candidates = candidate_timezones(timezoneTable, rng)
+reference = td.convert_deprecated_timezones_reference(
+    pd.DataFrame({"timezone": candidates}), timezoneTable)
+new = td.localtime.convert_deprecated_timezones(
+    pd.DataFrame({"timezone": candidates}), timezoneAliases)
+nMismatches = (reference["timezone"] != new["timezone"]).sum()
+print("{0} timezones, {1} mismatches".format(len(candidates), nMismatches))
+
+# donors without any timezone (all null, and no records)
+for nRecords in [1000, 0]:
+    data = make_donor(rng, candidates, nRecords)
+    data["timezone"] = np.nan
+    data["timezone"] = data["timezone"].astype(object)
+    referenceData = td.convert_deprecated_timezones_reference(
+        data.copy(), timezoneTable)
+    newData = td.localtime.convert_deprecated_timezones(
+        data.copy(), timezoneAliases)
+    pd.testing.assert_frame_equal(newData, referenceData)
+print("all-null and empty donors match")
+
+# synthetic donors
+nMismatches, referenceTime, newTime = 0, 0, 0
+for dIndex in range(args.nDonors):
+    data = make_donor(rng, candidates, args.nRecords)
+
+    startTime = time.perf_counter()
+    referenceData = td.convert_deprecated_timezones_reference(
+        data.copy(), timezoneTable)
+    referenceTime += time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    newData = td.localtime.convert_deprecated_timezones(
+        data.copy(), timezoneAliases)
+    newTime += time.perf_counter() - startTime
+
+    try:
+        pd.testing.assert_frame_equal(newData, referenceData)
+    except AssertionError as error:
+        nMismatches += 1
+        print("MISMATCH in donor", dIndex, error)
+
+print("{0} donors, {1} records, {2} mismatches".format(
+    args.nDonors, args.nDonors * args.nRecords, nMismatches))
+print("reference: {0:.2f} s, tidals.tz: {1:.2f} s (+ {2:.3f} s to make the "
+      "aliases)".format(referenceTime, newTime, buildTime))
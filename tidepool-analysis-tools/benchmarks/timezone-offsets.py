@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: check and benchmark tidals.tz (timezone_offsets,
+    local_time_offsets and is_dst_change_day) against pytz localize +
+    strftime("%z"), the way the local time estimation has always calculated
+    timezone offsets
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python timezone-offsets.py [--timezones America/New_York Europe/Dublin]
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import pytz
+from datetime import timedelta
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if tidalsPath not in sys.path:
+    sys.path.insert(0, tidalsPath)
+import tidals as td
+
+
+# %% USER INPUTS
+codeDescription = "Check and benchmark tidals.tz"
+
+parser = argparse.ArgumentParser(description=codeDescription)
+parser.add_argument("--timezones",
+                    dest="timezones",
+                    nargs="+",
+                    default=pytz.all_timezones,
+                    help="timezones to check (default: all of them)")
+parser.add_argument("--n-random",
+                    dest="nRandom",
+                    default=60,
+                    type=int,
+                    help="number of random dates (and times) per timezone, "
+                    "in addition to the ones around each transition")
+parser.add_argument("--seed",
+                    dest="seed",
+                    default=0,
+                    type=int,
+                    help="random seed of the random dates")
+
+args = parser.parse_args()
+
+
+# %% FUNCTIONS
+def tzo_loop(localTime, timezoneName):
+    # one pytz localize + strftime("%z") per call, as in getTimezoneOffset
+    # and getTzoForDateTime of estimate-local-time.py
+    tzoNum = int(pytz.timezone(timezoneName).localize(
+        pd.to_datetime(localTime)).strftime("%z"))
+    tzoHours = np.floor(tzoNum / 100)
+    tzoMinutes = round((tzoNum / 100 - tzoHours) * 100, 0)
+    tzoSign = np.sign(tzoHours)
+
+    return int((tzoHours * 60) + (tzoMinutes * tzoSign))
+
+
+def check_times(timezoneName, rng):
+    # dates (and local times) on and around each transition, and random ones
+    table = td.get_timezone_table(timezoneName)
+    transitionTimes = table.transitionTimes[1:]
+    transitionTimes = transitionTimes[
+        (transitionTimes > pd.Timestamp("1900-01-01").value) &
+        (transitionTimes < pd.Timestamp("2037-01-01").value)]
+    dayNs, minuteNs = 86400 * 10**9, 60 * 10**9
+    randomStart = pd.Timestamp("1950-01-01").value
+
+    dates = pd.to_datetime(np.concatenate(
+        [transitionTimes + d * dayNs for d in [-2, -1, 0, 1]] +
+        [randomStart + rng.randint(0, 87 * 365, args.nRandom) * dayNs]
+    )).normalize()
+
+    # the local times just before, in, and after the gap (or overlap) of
+    # each transition
+    localTransitionTimes = table.localTransitionTimes[
+        np.searchsorted(table.transitionTimes[1:], transitionTimes)]
+    localTimes = pd.to_datetime(np.concatenate(
+        [localTransitionTimes + m * minuteNs
+         for m in [-61, -30, -1, 0, 1, 29, 30, 59, 60, 61, 90]] +
+        [randomStart +
+         rng.randint(0, 87 * 365 * 1440, args.nRandom) * minuteNs]))
+
+    return dates, localTimes
+
+
+# %% START OF CODE
+rng = np.random.RandomState(args.seed)
+nChecks, nMismatches, loopTime, newTime = 0, 0, 0, 0
+for timezoneName in args.timezones:
+    dates, localTimes = check_times(timezoneName, rng)
+
+    startTime = time.perf_counter()
+    loopDayTzos = np.array(
+        [tzo_loop(d + timedelta(days=1), timezoneName) for d in dates])
+    loopChangeDays = loopDayTzos != np.array(
+        [tzo_loop(d, timezoneName) for d in dates])
+    loopTzos = np.concatenate([
+        loopDayTzos,
+        [tzo_loop(t, timezoneName) for t in localTimes],
+        loopChangeDays]).astype(np.int64)
+    loopTime += time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    newTzos = np.concatenate([
+        td.timezone_offsets(timezoneName, dates),
+        td.local_time_offsets(timezoneName, localTimes),
+        td.is_dst_change_day(timezoneName, dates)]).astype(np.int64)
+    newTime += time.perf_counter() - startTime
+
+    isMismatch = loopTzos != newTzos
+    nChecks += len(loopTzos)
+    nMismatches += isMismatch.sum()
+    if isMismatch.any():
+        allTimes = np.concatenate([dates.values, localTimes.values,
+                                   dates.values])
+        print("MISMATCH", timezoneName, allTimes[isMismatch][:3],
+              newTzos[isMismatch][:3], loopTzos[isMismatch][:3])
+
+print("{0} timezones, {1} offsets and change days, {2} mismatches".format(
+    len(args.timezones), nChecks, nMismatches))
+print("pytz loop: {0:.2f} s, tidals.tz: {1:.2f} s (including building the "
+      "tables)".format(loopTime, newTime))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: check and benchmark tidals.variability.variability_metrics
+    against a loop over each patient (with a different algorithm for mage),
+    on a multi-year synthetic cohort of 5-minute cgm data, and check mage
+    against the example of its definition
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python variability.py [--n-patients 50 --n-days 730]
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+import time
+import heapq
+import argparse
+import numpy as np
+import pandas as pd
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if tidalsPath not in sys.path:
+    sys.path.insert(0, tidalsPath)
+import tidals as td
+
+
+# %% USER INPUTS
+codeDescription = "Check and benchmark tidals.variability.variability_metrics"
+
+parser = argparse.ArgumentParser(description=codeDescription)
+parser.add_argument("--n-patients",
+                    dest="nPatients",
+                    default=50,
+                    type=int,
+                    help="number of patients in the cohort")
+parser.add_argument("--n-days",
+                    dest="nDays",
+                    default=730,
+                    type=int,
+                    help="number of days of cgm data per patient")
+parser.add_argument("--n-check",
+                    dest="nCheck",
+                    default=5,
+                    type=int,
+                    help="number of patients to check against the loop")
+parser.add_argument("--seed",
+                    dest="seed",
+                    default=0,
+                    type=int,
+                    help="random seed of the synthetic data")
+
+args = parser.parse_args()
+
+
+# %% FUNCTIONS
+def make_cohort(nPatients, nDays, seed):
+    # a random walk of mg/dL values for each patient, with missing values
+    # and sensor gaps
+    rng = np.random.RandomState(seed)
+    cohort = {}
+    for pIndex in range(nPatients):
+        nSlots = nDays * 288
+        values = 150 + np.cumsum(rng.normal(0, 4, nSlots))
+        values = 150 + (values - 150) % 300 - 100
+        values = np.round(np.clip(values, 40, 400))
+        values[rng.uniform(size=nSlots) < 0.02] = np.nan
+        for gapStart in rng.randint(0, nSlots, nDays // 10):
+            values[gapStart:gapStart + rng.randint(12, 288)] = np.nan
+        cohort["patient-{0}".format(pIndex)] = td.CgmSeries(
+            pd.Timestamp("2016-01-01 08:00"), values, tzOffsetMinutes=-480)
+
+    return cohort
+
+
+def mage_loop(values):
+    # mage by eliminating the smallest oscillation (a pair of turning points,
+    # or a turning point at either end) until all of the changes between the
+    # turning points are more than one std (Baghurst, 2011), which is a
+    # different way to find the excursions than the one of tidals
+    values = [v for v in values if not np.isnan(v)]
+    std = np.std(values, ddof=1)
+    points = [values[0]]
+    for v in values[1:]:
+        if v != points[-1]:
+            points.append(v)
+    turningPoints = [points[0]]
+    for i in range(1, len(points) - 1):
+        if (points[i] - points[i - 1]) * (points[i + 1] - points[i]) < 0:
+            turningPoints.append(points[i])
+    turningPoints.append(points[-1])
+
+    # a linked list of the turning points, and a heap of the changes between
+    # them (from the smallest, and the first one for ties)
+    previous = list(range(-1, len(turningPoints) - 1))
+    following = list(range(1, len(turningPoints))) + [-1]
+    isKept = [True] * len(turningPoints)
+    heap = [(abs(turningPoints[i + 1] - turningPoints[i]), i, i + 1)
+            for i in range(len(turningPoints) - 1)]
+    heapq.heapify(heap)
+    while (len(heap) > 0) and (heap[0][0] <= std):
+        _, i, j = heapq.heappop(heap)
+        if not (isKept[i] and isKept[j] and (following[i] == j)):
+            continue
+        if previous[i] == -1:
+            removed = [i]
+        elif following[j] == -1:
+            removed = [j]
+        else:
+            removed = [i, j]
+        before, after = previous[removed[0]], following[removed[-1]]
+        for r in removed:
+            isKept[r] = False
+        if before != -1:
+            following[before] = after
+        if after != -1:
+            previous[after] = before
+        if (before != -1) and (after != -1) and (len(removed) == 2):
+            heapq.heappush(heap, (abs(turningPoints[after] -
+                                      turningPoints[before]), before, after))
+    turningPoints = [v for v, k in zip(turningPoints, isKept) if k]
+
+    changes = np.diff(turningPoints)
+    if len(changes) == 0:
+        return np.nan, np.nan, np.nan
+    rises, falls = changes[changes > 0], -changes[changes < 0]
+    mage = np.mean(rises) if changes[0] > 0 else np.mean(falls)
+
+    return mage, np.mean(rises) if len(rises) else np.nan, \
+        np.mean(falls) if len(falls) else np.nan
+
+
+def check_mage_example():
+    # the example of the definition of mage (Service et al., 1970): the
+    # 10 mg/dL oscillations (less than one std) are merged into the
+    # excursions, so there is one 200 mg/dL rise (100 -> 300) and one
+    # 240 mg/dL fall (300 -> 60), and the first excursion is a rise
+    values = np.full(288, np.nan)
+    values[:7] = [100, 200, 190, 300, 120, 130, 60]
+    metrics = td.variability_metrics(td.CgmSeries(
+        pd.Timestamp("2016-01-01"), values))
+    assert metrics.loc[0, ["mage", "magePlus", "mageMinus"]].tolist() == \
+        [200, 200, 240], metrics
+
+
+def metrics_loop(cgmSeries):
+    # the metrics of one patient, the way they were calculated in notebooks
+    values = pd.Series(cgmSeries.values.astype(np.float64),
+                       index=cgmSeries.local_times)
+    mean, std = values.mean(), values.std()
+    mage = mage_loop(values.values)
+    f = 1.509 * (np.log(values) ** 1.084 - 5.381)
+    lowRisk = (10 * f ** 2).where(f < 0, 0).where(values.notnull())
+    highRisk = (10 * f ** 2).where(f > 0, 0).where(values.notnull())
+    dailyRiskRange = (lowRisk.groupby(lowRisk.index.date).max() +
+                      highRisk.groupby(highRisk.index.date).max())
+
+    return {"count": values.count(),
+            "mean": mean,
+            "std": std,
+            "gmi": 3.31 + 0.02392 * mean,
+            "jIndex": 0.001 * (mean + std) ** 2,
+            "lbgi": lowRisk.mean(),
+            "hbgi": highRisk.mean(),
+            "adrr": dailyRiskRange.mean(),
+            "conga1": (values - values.shift(12)).std(),
+            "modd": (values - values.shift(288)).abs().mean(),
+            "mage": mage[0],
+            "magePlus": mage[1],
+            "mageMinus": mage[2]}
+
+
+# %% START OF CODE
+check_mage_example()
+print("mage of the example of its definition: 200 mg/dL")
+
+cohort = make_cohort(args.nPatients, args.nDays, args.seed)
+print("{0} patients, {1} days each ({2} cgm slots)".format(
+    args.nPatients, args.nDays, args.nPatients * args.nDays * 288))
+
+checkCohort = {key: cohort[key] for key in list(cohort)[:args.nCheck]}
+startTime = time.perf_counter()
+loopMetrics = pd.DataFrame([metrics_loop(s) for s in checkCohort.values()])
+loopTime = time.perf_counter() - startTime
+
+newMetrics = td.variability_metrics(checkCohort)
+pd.testing.assert_frame_equal(loopMetrics, newMetrics[list(loopMetrics)],
+                              check_dtype=False, rtol=1e-9)
+print("same metrics as the loop for {0} patients ({1:.2f} s per "
+      "patient)".format(args.nCheck, loopTime / args.nCheck))
+
+for perDay in [False, True]:
+    startTime = time.perf_counter()
+    metrics = td.variability_metrics(cohort, perDay=perDay)
+    newTime = time.perf_counter() - startTime
+    print("perDay={0}: {1} rows in {2:.2f} s (the loop would take about "
+          "{3:.0f} s for the per patient metrics)".format(
+              perDay, len(metrics), newTime,
+              loopTime / args.nCheck * args.nPatients))
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: pytest configuration of the tidals tests
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+usage: python -m pytest tests (from tidepool-analysis-tools)
+"""
+
+# %% REQUIRED LIBRARIES
+import os
+import sys
+
+# use the local copy of tidals (rather than an installed copy)
+tidalsPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if tidalsPath not in sys.path:
+    sys.path.insert(0, tidalsPath)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: tests of the columnar cache of tidals.load.load_data, i.e., that
+    the cached copy of the data gives the same data as the original file
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+# %% REQUIRED LIBRARIES
+import json
+import pytest
+import pandas as pd
+import tidals as td
+from tidals.cache import cacheSettings
+
+pytest.importorskip("pyarrow")
+
+
+# %% FUNCTIONS
+filterCases = [{"types": ["cbg"]},
+               {"start": "2018-01-02", "end": "2018-01-02"},
+               {"types": ["basal", "upload"], "columns": ["type", "rate"]}]
+
+
+def make_records():
+    # cbg every 6 hours over 4 days, a basal a day, and two uploads. The
+    # fields that only some of the data types have (and the fields that are
+    # whole numbers for some types and not others) give different dtypes
+    # and categories for the different data types
+    cbgTimes = pd.date_range("2018-01-01", periods=16, freq="6h")
+    records = [{"type": "cbg", "time": t.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "value": 100 + i, "units": "mg/dL", "deviceId": "dexcom",
+                "uploadId": "upload1", "clockDriftOffset": 0,
+                "timezoneOffset": -420}
+               for i, t in enumerate(cbgTimes)]
+    for i, day in enumerate(["2018-01-01", "2018-01-02", "2018-01-03"]):
+        records.insert(5 * i + 1, {
+            "type": "basal", "time": day + "T07:00:00.000Z",
+            "deliveryType": "scheduled", "rate": 0.55 + i,
+            "duration": 86400000, "deviceId": "pump",
+            "uploadId": "upload2", "clockDriftOffset": 1.5,
+            "timezoneOffset": -420})
+    records.append({"type": "upload", "time": "2018-01-02T12:00:00.000Z",
+                    "deviceModel": "t:slim", "deviceId": "pump",
+                    "uploadId": "upload2", "deviceTags": ["insulin-pump"]})
+    records.append({"type": "upload", "time": "2018-01-04T12:00:00.000Z",
+                    "deviceModel": "G5", "deviceId": "dexcom",
+                    "uploadId": "upload1", "deviceTags": ["cgm"]})
+
+    return records
+
+
+def write_data_files(dataPath):
+    # the same data as a json, csv, and xlsx (one sheet per data type) file
+    records = make_records()
+    jsonFile = str(dataPath / "PHI-test-donor.json")
+    with open(jsonFile, "w") as f:
+        json.dump(records, f)
+
+    df = pd.DataFrame(records)
+    csvFile = str(dataPath / "PHI-test-donor.csv")
+    df.to_csv(csvFile, index=False)
+
+    xlsxFile = str(dataPath / "PHI-test-donor.xlsx")
+    df["jsonRowIndex"] = df.index
+    df["deviceTags"] = df["deviceTags"].astype(str)
+    with pd.ExcelWriter(xlsxFile) as writer:
+        for dataType, typeData in df.groupby("type", sort=False):
+            typeData.dropna(axis=1, how="all").to_excel(
+                writer, sheet_name=dataType, index=False)
+
+    return [jsonFile, csvFile, xlsxFile]
+
+
+@pytest.fixture
+def dataFiles(tmp_path):
+    # data files and an empty cache in a temporary folder, the cache
+    # settings are put back after the test
+    oldSettings = dict(cacheSettings)
+    td.configure_cache(cacheDir=str(tmp_path / "cache"), enabled=True)
+    yield write_data_files(tmp_path)
+    cacheSettings.update(oldSettings)
+
+
+# %% TESTS
+@pytest.mark.parametrize("filters", filterCases)
+def test_filtered_cold_and_warm_loads_are_the_same(dataFiles, filters):
+    for dataFile in dataFiles:
+        td.invalidate_cache(dataFile)
+        cold, _ = td.load_data(dataFile, **filters)
+        warm, _ = td.load_data(dataFile, **filters)
+        pd.testing.assert_frame_equal(cold, warm)
+
+        # and the same as the whole file filtered
+        td.invalidate_cache(dataFile)
+        data, _ = td.load_data(dataFile, useCache=False)
+        mask = pd.Series(True, index=data.index)
+        if "types" in filters:
+            mask = mask & data["type"].isin(filters["types"])
+        if "start" in filters:
+            # an end date includes the whole day
+            endTime = pd.Timestamp(filters["end"]) + pd.Timedelta(days=1)
+            mask = mask & (data["time"] >= filters["start"]) & \
+                (data["time"] < endTime)
+        expected = data[mask]
+        if "columns" in filters:
+            expected = expected[filters["columns"]]
+        pd.testing.assert_frame_equal(warm, expected)
+
+
+def test_cache_round_trip(dataFiles):
+    # the data is the same without the cache, when it is cached, and when it
+    # is read from the cache
+    for dataFile in dataFiles:
+        data, userID = td.load_data(dataFile, useCache=False)
+        cold, coldUserID = td.load_data(dataFile)
+        assert len(td.cache._list_entries()) > 0
+        warm, warmUserID = td.load_data(dataFile)
+        pd.testing.assert_frame_equal(cold, data)
+        pd.testing.assert_frame_equal(warm, data)
+        assert userID == coldUserID == warmUserID == "test-donor"
+
+        # a filtered load of the cached copy
+        cbg, _ = td.load_data(dataFile, types=["cbg"], columns=["value"])
+        pd.testing.assert_frame_equal(
+            cbg, data.loc[data["type"] == "cbg", ["value"]])
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: tests of tidals.clean.round_time and append_round_time
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+# %% REQUIRED LIBRARIES
+import numpy as np
+import pandas as pd
+import pytest
+import tidals as td
+
+
+# %% FUNCTIONS
+def make_cgm():
+    # four cgm records, with a gap (of more than 5 minutes) before the last
+    return pd.DataFrame({
+        "time": ["2018-01-01T00:01:00Z", "2018-01-01T00:06:10Z",
+                 "2018-01-01T00:11:50Z", "2018-01-01T02:00:20Z"],
+        "value": [1.0, 2.0, 3.0, 4.0]})
+
+
+def rounded(df):
+    return list(df["roundedTime"].dt.strftime("%H:%M"))
+
+
+def round_time_loop(df, timeIntervalMinutes=5, timeField="time",
+                    roundedTimeFieldName="roundedTime", verbose=False):
+    # the original round_time, which loops over each large gap (see
+    # benchmarks/round-time.py)
+    df.sort_values(by=timeField, ascending=True, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    t = pd.to_datetime(df.time)
+    t_shift = pd.to_datetime(df.time.shift(1))
+    df["TIB"] = round(
+        (t - t_shift).dt.days * (86400 / (60 * timeIntervalMinutes)) +
+        (t - t_shift).dt.seconds / (60 * timeIntervalMinutes)) * \
+        timeIntervalMinutes
+
+    largeGaps = list(df.query("TIB > " + str(timeIntervalMinutes)).index)
+    largeGaps.insert(0, 0)
+    largeGaps.append(len(df))
+
+    for gIndex in range(0, len(largeGaps) - 1):
+        gapRows = slice(largeGaps[gIndex], largeGaps[gIndex + 1] - 1)
+        df.loc[largeGaps[gIndex], "TIB"] = 0
+        df.loc[gapRows, "TIB_cumsum"] = df.loc[gapRows, "TIB"].cumsum()
+        df.loc[gapRows, roundedTimeFieldName] = \
+            pd.to_datetime(df.loc[largeGaps[gIndex], timeField]).round(
+                str(timeIntervalMinutes) + "min") + \
+            pd.to_timedelta(df.loc[gapRows, "TIB_cumsum"], unit="m")
+
+    df.sort_values(by=timeField, ascending=False, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    if verbose is False:
+        df.drop(columns=["TIB", "TIB_cumsum"], inplace=True)
+
+    return df
+
+
+def make_random_cgm(seed, nPoints=300, nGaps=10):
+    # 5-minute cgm data with jitter (+/- 30 seconds) and <nGaps> sensor gaps
+    # of 10 minutes to 2 days, in a random order
+    rng = np.random.RandomState(seed)
+    timeInBetween = 300 + rng.randint(-30, 31, nPoints)
+    gapIndices = rng.choice(np.arange(1, nPoints), nGaps, replace=False)
+    timeInBetween[gapIndices] = rng.randint(600, 2 * 86400, nGaps)
+    times = pd.Timestamp("2018-01-01") + \
+        pd.to_timedelta(np.cumsum(timeInBetween), unit="s")
+    cgm = pd.DataFrame({"time": times.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                        "value": rng.uniform(2.2, 22.2, nPoints).round(1)})
+
+    return cgm.sample(frac=1, random_state=rng).reset_index(drop=True)
+
+
+# %% TESTS
+def test_round_time():
+    df = td.round_time(make_cgm(), verbose=True)
+
+    # the records are sorted descendingly by time
+    assert list(df["value"]) == [4.0, 3.0, 2.0, 1.0]
+    assert rounded(df) == ["02:00", "00:10", "00:05", "00:00"]
+    assert list(df["TIB"]) == [0.0, 5.0, 5.0, 0.0]
+    assert list(df["TIB_cumsum"]) == [0.0, 10.0, 5.0, 0.0]
+
+
+def test_round_time_drops_tib_columns():
+    df = td.round_time(make_cgm())
+    assert list(df) == ["time", "value", "roundedTime"]
+
+
+def test_round_time_empty():
+    df = td.round_time(make_cgm().iloc[:0].copy())
+    assert len(df) == 0
+    assert list(df) == ["time", "value", "roundedTime"]
+
+
+def test_round_time_single_record():
+    df = td.round_time(make_cgm().iloc[:1].copy(), verbose=True)
+    assert rounded(df) == ["00:00"]
+    assert list(df["TIB"]) == [0.0]
+
+
+def test_round_time_all_null():
+    cgm = make_cgm()
+    cgm["time"] = None
+    df = td.round_time(cgm)
+    assert len(df) == 4
+    assert df["roundedTime"].isna().all()
+
+
+def test_round_time_missing_times_go_last():
+    cgm = make_cgm()
+    cgm.loc[1, "time"] = None
+    df = td.round_time(cgm)
+    assert list(df["value"]) == [4.0, 3.0, 1.0, 2.0]
+    assert rounded(df.iloc[:3]) == ["02:00", "00:10", "00:00"]
+    assert pd.isna(df.loc[3, "roundedTime"])
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("kwargs", [{"timeIntervalMinutes": 5},
+                                    {"timeIntervalMinutes": 5,
+                                     "verbose": True},
+                                    {"timeIntervalMinutes": 15}])
+def test_round_time_matches_loop(seed, kwargs):
+    cgm = make_random_cgm(seed)
+    pd.testing.assert_frame_equal(td.round_time(cgm.copy(), **kwargs),
+                                  round_time_loop(cgm.copy(), **kwargs),
+                                  check_exact=True)
+
+
+def test_append_round_time():
+    cgm = make_cgm()
+    expected = td.round_time(cgm.copy())
+    for nOld in range(len(cgm) + 1):
+        # the new records overlap the old ones by one record
+        df = td.append_round_time(td.round_time(cgm.iloc[:nOld].copy()),
+                                  cgm.iloc[max(nOld - 1, 0):].copy())
+        pd.testing.assert_frame_equal(df, expected)
+
+    # new records without a time go at the end
+    noTime = pd.DataFrame({"time": [None], "value": [5.0]})
+    df = td.append_round_time(expected, noTime)
+    assert list(df["value"]) == [4.0, 3.0, 2.0, 1.0, 5.0]
+    assert df["roundedTime"].dtype == expected["roundedTime"].dtype
+    assert pd.isna(df.loc[4, "roundedTime"])
+
+    # appending nothing doesn't change the data
+    df = td.append_round_time(expected, cgm.iloc[:0].copy())
+    pd.testing.assert_frame_equal(df, expected)
+    assert np.array_equal(rounded(df), rounded(expected))
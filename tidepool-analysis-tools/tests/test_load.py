@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: tests of the json loader of tidals.load, i.e., that a filtered
+    load gives the same data as the whole file filtered
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+# %% REQUIRED LIBRARIES
+import json
+import pytest
+import pandas as pd
+import tidals as td
+
+
+# %% FUNCTIONS
+filterCases = [{"types": ["cbg"]},
+               {"types": ["basal", "upload"]},
+               {"types": ["smbg"]},
+               {"start": "2018-01-02", "end": "2018-01-02"},
+               {"types": ["cbg"], "start": "2018-01-03", "end": "2018-01-04"},
+               {"columns": ["value", "type", "deviceTags"]},
+               {"types": ["basal"], "columns": ["rate", "deviceId"]}]
+
+
+def make_records():
+    # cbg every 6 hours over 4 days, a basal a day, and two uploads. The
+    # cbg values are whole numbers, the other data types have fields that
+    # the cbg data doesn't have, and a field that is a fraction, text, and
+    # missing for the different data types
+    cbgTimes = pd.date_range("2018-01-01", periods=16, freq="6h")
+    records = [{"type": "cbg", "time": t.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "value": 100 + i, "units": "mg/dL", "deviceId": "dexcom",
+                "clockDriftOffset": 0, "timezoneOffset": -420}
+               for i, t in enumerate(cbgTimes)]
+    for i, day in enumerate(["2018-01-01", "2018-01-02", "2018-01-03"]):
+        records.insert(5 * i + 1, {
+            "type": "basal", "time": day + "T07:00:00.000Z",
+            "deliveryType": "scheduled", "rate": 0.55 + i,
+            "deviceId": "pump", "clockDriftOffset": 1.5,
+            "timezoneOffset": -420})
+    records.append({"type": "upload", "time": "2018-01-02T12:00:00.000Z",
+                    "deviceId": "pump", "deviceTags": ["insulin-pump"],
+                    "clockDriftOffset": "unknown"})
+    records.append({"type": "upload", "time": "2018-01-04T12:00:00.000Z",
+                    "deviceId": "dexcom", "deviceTags": ["cgm"]})
+
+    return records
+
+
+@pytest.fixture
+def jsonFile(tmp_path):
+    dataFile = str(tmp_path / "PHI-test-donor.json")
+    with open(dataFile, "w") as f:
+        json.dump(make_records(), f)
+
+    return dataFile
+
+
+def filter_afterwards(df, filters):
+    mask = pd.Series(True, index=df.index)
+    if "types" in filters:
+        mask = mask & df["type"].isin(filters["types"])
+    if "start" in filters:
+        # an end date includes the whole day
+        times = pd.to_datetime(df["time"]).dt.tz_localize(None)
+        endTime = pd.Timestamp(filters["end"]) + pd.Timedelta(days=1)
+        mask = mask & (times >= filters["start"]) & (times < endTime)
+    df = df[mask]
+    if "columns" in filters:
+        df = df[[c for c in filters["columns"] if c in df]]
+
+    return df
+
+
+# %% TESTS
+@pytest.mark.parametrize("applySchema", [True, False])
+@pytest.mark.parametrize("filters", filterCases)
+def test_filtered_load_json(jsonFile, filters, applySchema):
+    data = td.load_json(jsonFile, applySchema=applySchema)
+    filtered = td.load_json(jsonFile, applySchema=applySchema, **filters)
+    pd.testing.assert_frame_equal(filtered, filter_afterwards(data, filters))
+
+
+@pytest.mark.parametrize("filters", filterCases)
+def test_filtered_load_json_in_batches(jsonFile, filters):
+    # the records that are filtered out of earlier batches still count
+    data = td.load_json(jsonFile)
+    filtered = td.load._load_json_filtered(jsonFile, batchSize=4, **filters)
+    pd.testing.assert_frame_equal(filtered, filter_afterwards(data, filters))
+
+
+def test_load_json_by_type_dtypes(jsonFile):
+    # the dtypes of each data type are inferred like the whole file's
+    typeData = td.load_json_by_type(jsonFile, applySchema=False)
+    assert typeData["cbg"]["value"].dtype == "int64"
+    assert typeData["cbg"]["clockDriftOffset"].dtype == "int64"
+    assert typeData["basal"]["clockDriftOffset"].dtype == "float64"
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: tests of the local time estimation of tidals.localtime, which
+    are checked against the day by day (reference) implementation
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+# %% REQUIRED LIBRARIES
+import numpy as np
+import pandas as pd
+import tidals as td
+
+
+# %% FUNCTIONS
+timezoneAliases = pd.DataFrame({"tz": ["US/Mountain"],
+                                "alias": ["America/Denver"]})
+
+
+def make_records():
+    # cgm records every 6 hours of a user in Denver, over the start of
+    # daylight savings time (2018-03-11), with a trip to London from
+    # 2018-03-07 to 2018-03-09, and two pump uploads
+    utcTimes = pd.date_range("2018-03-05", "2018-03-15", freq="6h", tz="UTC")
+    timezones = np.where((utcTimes >= "2018-03-07") &
+                         (utcTimes < "2018-03-10"),
+                         "Europe/London", "America/Denver")
+    tzos = [t.tz_convert(tz).utcoffset().total_seconds() // 60
+            for t, tz in zip(utcTimes, timezones)]
+    cgm = pd.DataFrame({
+        "type": "cbg",
+        "time": utcTimes.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "timezoneOffset": tzos,
+        "deviceTags": "['cgm']",
+        "value": 6.0})
+    uploads = pd.DataFrame({
+        "type": "upload",
+        "time": ["2018-03-05T12:00:00.000Z", "2018-03-13T12:00:00.000Z"],
+        "timezoneOffset": [-420, -360],
+        "timezone": ["US/Mountain", "America/Denver"],
+        "deviceTags": "['insulin-pump']",
+        "timeProcessing": "utc-bootstrapping"})
+
+    return pd.concat([cgm, uploads], ignore_index=True)
+
+
+def estimate_records():
+    return td.localtime.estimate(make_records(), timezoneAliases,
+                                 endDate="2018-03-20")
+
+
+def day_series_inputs(cDays):
+    # the day series without the estimates
+    return cDays.drop(columns=[c for c in cDays if c.startswith("est.")])
+
+
+def assert_day_series_match_reference(cDays):
+    newDays = td.localtime.with_annotation_messages(
+        td.estimate_day_series(cDays))
+    referenceDays = td.estimate_day_series_reference(cDays.copy())
+    pd.testing.assert_frame_equal(newDays, referenceDays)
+
+    return newDays
+
+
+# %% TESTS
+def test_estimate_day_series():
+    _, cDays = estimate_records()
+    cDays = cDays.set_index("date")
+
+    assert cDays.loc[pd.Timestamp("2018-03-05").date(), "est.type"] == \
+        "UPLOAD"
+    assert cDays.loc[pd.Timestamp("2018-03-13").date(), "est.timezone"] == \
+        "America/Denver"
+    # the trip (and the dst change) is found with the cgm tzos
+    tripDays = cDays.loc[[pd.Timestamp(d).date() for d in
+                          ["2018-03-07", "2018-03-08", "2018-03-09"]]]
+    assert list(tripDays["est.timezoneOffset"]) == [0, 0, 0]
+    assert list(tripDays["est.type"]) == ["DEVICE"] * 3
+    assert cDays.loc[pd.Timestamp("2018-03-10").date(),
+                     "est.timezoneOffset"] == -420
+    assert cDays.loc[pd.Timestamp("2018-03-12").date(),
+                     "est.timezoneOffset"] == -360
+
+
+def test_estimate_day_series_matches_reference():
+    _, cDays = estimate_records()
+    assert_day_series_match_reference(day_series_inputs(cDays))
+
+
+def test_estimate_day_series_empty():
+    _, cDays = estimate_records()
+    newDays = assert_day_series_match_reference(
+        day_series_inputs(cDays).iloc[:0])
+    assert len(newDays) == 0
+
+
+def test_estimate_day_series_single_day():
+    _, cDays = estimate_records()
+    newDays = assert_day_series_match_reference(
+        day_series_inputs(cDays).iloc[4:5].reset_index(drop=True))
+    assert newDays.loc[0, "est.timezoneOffset"] == -360
+
+
+def test_estimate_day_series_all_null():
+    # days without any upload, device, or home timezone offsets
+    _, cDays = estimate_records()
+    cDays = day_series_inputs(cDays)
+    for field in cDays.columns.drop("date"):
+        cDays[field] = np.nan
+    newDays = assert_day_series_match_reference(cDays)
+    assert newDays["est.timezoneOffset"].isna().all()
+
+
+def record_inputs(data, cDays):
+    # the records without the estimates (i.e., with utcTime and date only)
+    estimateFields = set(cDays.columns.drop("date")) | {"est.localTime"}
+    return data.drop(columns=[c for c in data if c in estimateFields])
+
+
+def assert_estimates_match_reference(data, cDays):
+    newData = td.apply_local_time_estimates(data, cDays)
+    referenceData = td.apply_local_time_estimates_reference(data.copy(),
+                                                            cDays)
+    pd.testing.assert_frame_equal(newData, referenceData)
+
+    return newData
+
+
+def test_apply_local_time_estimates():
+    data, cDays = estimate_records()
+    newData = assert_estimates_match_reference(record_inputs(data, cDays),
+                                               cDays)
+
+    # the utc times stay tz-aware, and the local times are utc + tzo
+    assert str(newData["utcTime"].dt.tz) == "UTC"
+    localTimes = newData.set_index("time")["est.localTime"]
+    assert localTimes["2018-03-05T06:00:00.000Z"] == \
+        pd.Timestamp("2018-03-04 23:00", tz="UTC")
+    assert localTimes["2018-03-08T06:00:00.000Z"] == \
+        pd.Timestamp("2018-03-08 06:00", tz="UTC")
+    assert localTimes["2018-03-12T06:00:00.000Z"] == \
+        pd.Timestamp("2018-03-12 00:00", tz="UTC")
+
+
+def test_apply_local_time_estimates_empty():
+    data, cDays = estimate_records()
+    newData = assert_estimates_match_reference(
+        record_inputs(data, cDays).iloc[:0], cDays)
+    assert len(newData) == 0
+    assert "est.localTime" in newData
+
+
+def test_apply_local_time_estimates_single_record():
+    data, cDays = estimate_records()
+    newData = assert_estimates_match_reference(
+        record_inputs(data, cDays).iloc[:1], cDays)
+    assert newData.loc[0, "est.timezoneOffset"] == -420
+
+
+def test_apply_local_time_estimates_all_null():
+    # days without any estimates, so the records don't get a local time
+    data, cDays = estimate_records()
+    cDays = cDays.assign(**{"est.timezoneOffset": np.nan,
+                            "est.timezone": np.nan})
+    newData = assert_estimates_match_reference(record_inputs(data, cDays),
+                                               cDays)
+    assert newData["est.localTime"].isna().all()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: tests of tidals.stats.cgm_stats
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+# %% REQUIRED LIBRARIES
+import numpy as np
+import pandas as pd
+import tidals as td
+
+
+# %% FUNCTIONS
+def make_cgm():
+    # three values of participant a, and a missing value of participant b
+    return pd.DataFrame({
+        "id": ["a", "a", "a", "b"],
+        "mg_dL": [50.0, 100.0, 200.0, np.nan],
+        "localTime": pd.to_datetime(["2018-01-01 00:00", "2018-01-01 00:05",
+                                     "2018-01-01 01:00", "2018-01-01 00:00"])})
+
+
+def group_stats(values):
+    # the stats of one group, computed one group at a time with pandas
+    values = values.dropna()
+    return {"totalNumberCBGValues": len(values),
+            "mean_mgdL": values.mean(),
+            "std_mgdL": values.std(),
+            "min_mgdL": values.min(),
+            "median_mgdL": values.median(),
+            "max_mgdL": values.max(),
+            "totalBelow54": (values < 54).sum(),
+            "total70to180": ((values >= 70) & (values <= 180)).sum(),
+            "totalAbove250": (values > 250).sum()}
+
+
+# %% TESTS
+def test_cgm_stats():
+    stats = td.cgm_stats(make_cgm(), by="id").set_index("id")
+
+    assert list(stats["totalNumberCBGValues"]) == [3, 0]
+    assert stats.loc["a", "mean_mgdL"] == np.mean([50, 100, 200])
+    assert np.isclose(stats.loc["a", "std_mgdL"], np.std([50, 100, 200],
+                                                         ddof=1))
+    assert stats.loc["a", "median_mgdL"] == 100
+    assert stats.loc["a", "totalBelow54"] == 1
+    assert stats.loc["a", "total54to70"] == 0
+    assert stats.loc["a", "total70to180"] == 1
+    assert stats.loc["a", "percentAbove180"] == 1 / 3
+    assert stats.loc["a", "startTime"] == pd.Timestamp("2018-01-01 00:00")
+    assert stats.loc["a", "endTime"] == pd.Timestamp("2018-01-01 01:00")
+    assert stats.loc["a", "totalNumberPossibleCBGvalues"] == 13
+
+    # a participant without any values has zero counts, and no stats
+    assert stats.loc["b", "totalBelow54"] == 0
+    assert stats.loc["b", ["mean_mgdL", "percentBelow54", "min_mgdL",
+                           "median_mgdL"]].isna().all()
+    assert pd.isna(stats.loc["b", "startTime"])
+
+
+def test_cgm_stats_matches_groupby():
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({"id": rng.randint(0, 20, 5000),
+                       "mg_dL": rng.randint(40, 400, 5000).astype(float)})
+    df.loc[rng.uniform(size=len(df)) < 0.1, "mg_dL"] = np.nan
+
+    stats = td.cgm_stats(df, by="id").set_index("id")
+    for userId, userData in df.groupby("id"):
+        for statName, value in group_stats(userData["mg_dL"]).items():
+            assert np.isclose(stats.loc[userId, statName], value), statName
+
+
+def test_cgm_stats_empty():
+    stats = td.cgm_stats(make_cgm().iloc[:0], by="id")
+    assert len(stats) == 0
+
+    # without groups, the (empty) data is still one row of stats
+    stats = td.cgm_stats(make_cgm().iloc[:0])
+    assert len(stats) == 1
+    assert stats.loc[0, "totalNumberCBGValues"] == 0
+    assert np.isnan(stats.loc[0, "mean_mgdL"])
+
+
+def test_cgm_stats_all_null():
+    stats = td.cgm_stats(make_cgm().iloc[3:])
+    assert stats.loc[0, "totalNumberCBGValues"] == 0
+    assert stats.loc[0, ["mean_mgdL", "min_mgdL", "median_mgdL",
+                         "max_mgdL", "percent70to180"]].isna().all()
+
+
+def test_cgm_stats_single_record():
+    stats = td.cgm_stats(make_cgm().iloc[:1])
+    assert stats.loc[0, "totalNumberCBGValues"] == 1
+    assert stats.loc[0, "mean_mgdL"] == 50
+    assert stats.loc[0, "median_mgdL"] == 50
+    assert np.isnan(stats.loc[0, "std_mgdL"])
+    assert stats.loc[0, "percentBelow54"] == 1
+    assert stats.loc[0, "totalNumberPossibleCBGvalues"] == 1
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: tests of the timezone offset lookup tables and the deprecated
+    timezone aliases of tidals.tz
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+# %% REQUIRED LIBRARIES
+import numpy as np
+import pandas as pd
+import pickle
+import pytz
+import tidals as td
+
+
+# %% FUNCTIONS
+aliasTable = pd.DataFrame({
+    "tz": ["US/Central", "US/Mountain", "Canada/Central", "US/Pacific-New"],
+    "alias": ["America/Chicago", "America/Denver", "America/Winnipeg",
+              "US/Pacific"]})
+
+
+def tzo_loop(localTime, timezoneName):
+    # one pytz localize + strftime("%z") per time, the way the local time
+    # estimation used to get the timezone offsets
+    tzoNum = int(pytz.timezone(timezoneName).localize(
+        pd.to_datetime(localTime)).strftime("%z"))
+
+    return td.tz.parse_tzo_number(tzoNum)
+
+
+# %% TESTS
+def test_parse_tzo_number():
+    assert td.tz.parse_tzo_number(-700) == -420
+    assert td.tz.parse_tzo_number(530) == 330
+    assert td.tz.parse_tzo_number(0) == 0
+
+
+def test_local_time_offsets_match_pytz():
+    # the times around the start and end of daylight savings time (and in
+    # the gap and the overlap) of a few timezones
+    localTimes = pd.to_datetime(
+        ["2018-03-11 01:59", "2018-03-11 02:30", "2018-03-11 03:00",
+         "2018-11-04 00:59", "2018-11-04 01:30", "2018-11-04 02:00",
+         "2018-07-01 12:00", "1950-01-01 00:00", "2030-12-31 23:59"])
+    for timezoneName in ["America/Denver", "Europe/London",
+                         "Australia/Lord_Howe", "Asia/Kolkata", "UTC"]:
+        expected = [tzo_loop(t, timezoneName) for t in localTimes]
+        tzos = td.local_time_offsets(timezoneName, localTimes)
+        assert list(tzos) == expected, timezoneName
+
+
+def test_timezone_offsets():
+    # the offset of a date is the one of the end of the day
+    tzos = td.timezone_offsets(
+        "America/Denver",
+        pd.to_datetime(["2018-03-10", "2018-03-11", "2018-11-04"]))
+    assert list(tzos) == [-420, -360, -420]
+
+
+def test_offsets_of_many_timezones():
+    dates = pd.to_datetime(["2018-07-01", "2018-07-01", "2018-07-01"])
+    tzos = td.timezone_offsets(["America/Denver", np.nan, "Asia/Kolkata"],
+                               dates)
+    assert tzos[0] == -360
+    assert np.isnan(tzos[1])
+    assert tzos[2] == 330
+
+
+def test_is_dst_change_day():
+    dates = pd.to_datetime(["2018-03-11", "2018-03-12", "2018-03-11"])
+    isChangeDay = td.is_dst_change_day(
+        ["America/Denver", "America/Denver", None], dates)
+    assert list(isChangeDay) == [True, False, False]
+
+    changeDays = td.dst_change_days("America/Denver", "2018-01-01",
+                                    "2018-12-31")
+    assert list(changeDays) == list(pd.to_datetime(["2018-03-11",
+                                                    "2018-11-04"]))
+
+
+def test_tzo_ranges():
+    minTzos, maxTzos = td.tzo_ranges(
+        ["America/Denver", "Asia/Kolkata", np.nan],
+        pd.to_datetime(["2018-01-01", "2018-01-01", "2018-01-01"]))
+    assert list(minTzos[:2]) == [-420, 330]
+    assert list(maxTzos[:2]) == [-360, 330]
+    assert np.isnan(minTzos[2]) and np.isnan(maxTzos[2])
+
+
+def test_offsets_empty():
+    noTimes = pd.to_datetime([])
+    assert len(td.local_time_offsets(np.array([], dtype=object),
+                                     noTimes)) == 0
+    assert len(td.timezone_offsets("America/Denver", noTimes)) == 0
+    assert len(td.is_dst_change_day([], noTimes)) == 0
+    minTzos, maxTzos = td.tzo_ranges([], noTimes)
+    assert (len(minTzos) == 0) and (len(maxTzos) == 0)
+
+
+def test_offsets_all_null():
+    dates = pd.to_datetime(["2018-07-01", "2018-07-02"])
+    assert np.isnan(td.timezone_offsets([np.nan, None], dates)).all()
+    assert not td.is_dst_change_day([np.nan, None], dates).any()
+    minTzos, maxTzos = td.tzo_ranges([np.nan, None], dates)
+    assert np.isnan(minTzos).all() and np.isnan(maxTzos).all()
+
+
+def test_offsets_single_time():
+    tzos = td.local_time_offsets(["Europe/London"],
+                                 pd.to_datetime(["2018-07-01 12:00"]))
+    assert list(tzos) == [60]
+
+
+def resolve_reference(timezones):
+    # the aliases, the way the local time estimation has always found them
+    return td.convert_deprecated_timezones_reference(
+        pd.DataFrame({"timezone": pd.Series(timezones, dtype=object)}),
+        aliasTable)["timezone"].values
+
+
+def test_timezone_aliases():
+    aliases = td.TimezoneAliases(aliasTable)
+    assert aliases.alias("US/Central") == "America/Chicago"
+    # a suffix of exactly one tz gets its alias, a suffix of more than one
+    # (e.g., "Central") is not changed
+    assert aliases.alias("Mountain") == "America/Denver"
+    assert aliases.alias("Central") == "Central"
+    assert aliases.alias("Europe/London") == "Europe/London"
+    assert np.isnan(aliases.alias(np.nan))
+
+    # the aliases can be sent to worker processes
+    aliases = pickle.loads(pickle.dumps(aliases))
+    assert aliases.alias("US/Central") == "America/Chicago"
+
+
+def test_resolve_matches_reference():
+    aliases = td.TimezoneAliases(aliasTable)
+    # the timezones that aren't in the table (or are ambiguous, null, or
+    # empty) are not changed
+    timezones = ["US/Pacific-New", "US/Central", np.nan, "Central",
+                 "US/Pacific", "Europe/London", "US/Central", None, ""]
+    resolved = aliases.resolve(timezones)
+    assert list(resolved[:2]) == ["US/Pacific", "America/Chicago"]
+    assert pd.isna(resolved[2]) and pd.isna(resolved[7])
+    pd.testing.assert_series_equal(pd.Series(resolved),
+                                   pd.Series(resolve_reference(timezones)))
+
+
+def test_resolve_empty():
+    aliases = td.TimezoneAliases(aliasTable)
+    assert len(aliases.resolve([])) == 0
+    assert len(resolve_reference([])) == 0
+
+
+def test_resolve_all_null():
+    aliases = td.TimezoneAliases(aliasTable)
+    resolved = aliases.resolve([np.nan, None, np.nan])
+    assert len(resolved) == 3
+    assert pd.isna(resolved).all()
+
+    df = td.localtime.convert_deprecated_timezones(
+        pd.DataFrame({"timezone": [np.nan, np.nan]}, dtype=object), aliases)
+    assert df["timezone"].isna().all()
+
+
+def test_resolve_single_timezone():
+    aliases = td.TimezoneAliases(aliasTable)
+    assert list(aliases.resolve(["US/Mountain"])) == ["America/Denver"]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: tests of tidals.variability.variability_metrics
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+# %% REQUIRED LIBRARIES
+import numpy as np
+import pandas as pd
+import tidals as td
+
+
+# %% FUNCTIONS
+def make_series(dayValues):
+    # a CgmSeries with the given values at the start of each day
+    values = np.full(288 * len(dayValues), np.nan)
+    for dayIndex, dayValue in enumerate(dayValues):
+        values[288 * dayIndex:288 * dayIndex + len(dayValue)] = dayValue
+
+    return td.CgmSeries(pd.Timestamp("2016-01-01"), values)
+
+
+# %% TESTS
+def test_mage_example():
+    # the example of the definition of mage (Service et al., 1970): the
+    # 10 mg/dL oscillations (less than one std) are merged into the
+    # excursions, so there is one 200 mg/dL rise (100 -> 300) and one
+    # 240 mg/dL fall (300 -> 60), and the first excursion is a rise
+    example = [100, 200, 190, 300, 120, 130, 60]
+    metrics = td.variability_metrics(make_series([example]))
+
+    assert metrics.loc[0, ["mage", "magePlus", "mageMinus"]].tolist() == \
+        [200, 200, 240]
+    assert metrics.loc[0, "count"] == 7
+    assert metrics.loc[0, "mean"] == np.mean(example)
+    assert np.isclose(metrics.loc[0, "std"], np.std(example, ddof=1))
+    assert np.isclose(metrics.loc[0, "gmi"], 3.31 + 0.02392 * np.mean(example))
+
+
+def test_risk_values():
+    # the risk is 0 at 112.5 mg/dL (f is about 0), low risk below it and high
+    # risk above it
+    lowRisk, highRisk = td.variability.risk_values(
+        np.array([40.0, 112.5, 400.0, np.nan]))
+    assert (lowRisk[0] > 0) and (highRisk[0] == 0)
+    assert np.isclose(lowRisk[1] + highRisk[1], 0, atol=0.01)
+    assert (lowRisk[2] == 0) and (highRisk[2] > 0)
+    assert np.isnan(lowRisk[3]) and np.isnan(highRisk[3])
+
+
+def test_per_day_metrics():
+    metrics = td.variability_metrics(
+        {"a": make_series([[100, 200, 190, 300, 120, 130, 60], [100, 300]])},
+        perDay=True)
+
+    assert list(metrics["key"]) == ["a", "a"]
+    assert list(metrics["date"]) == list(pd.date_range("2016-01-01",
+                                                       periods=2))
+    assert list(metrics["count"]) == [7, 2]
+    # the differences belong to the day of the later value
+    assert np.isnan(metrics.loc[0, "modd"])
+    assert metrics.loc[1, "modd"] == np.mean([0, 100])
+    assert metrics.loc[1, "mage"] == 200
+
+
+def test_variability_metrics_empty():
+    metrics = td.variability_metrics({})
+    assert len(metrics) == 0
+    assert "mage" in metrics
+
+    # a series without any slots is still one row, without any data
+    metrics = td.variability_metrics(
+        td.CgmSeries(pd.Timestamp("2016-01-01"), np.zeros(0)))
+    assert len(metrics) == 1
+    assert metrics.loc[0, "count"] == 0
+    assert np.isnan(metrics.loc[0, "mean"])
+
+
+def test_variability_metrics_all_null():
+    metrics = td.variability_metrics(make_series([[]]))
+    assert metrics.loc[0, "count"] == 0
+    assert metrics.drop(columns="count").isna().all(axis=None)
+
+
+def test_variability_metrics_single_value():
+    metrics = td.variability_metrics(make_series([[120]]))
+    assert metrics.loc[0, "count"] == 1
+    assert metrics.loc[0, "mean"] == 120
+    assert metrics.loc[0, ["std", "conga1", "modd", "mage"]].isna().all()
+
+
+def test_flat_series_has_no_excursions():
+    metrics = td.variability_metrics(
+        td.CgmSeries(pd.Timestamp("2016-01-01"), np.full(288, 100.0)))
+    assert metrics.loc[0, "std"] == 0
+    assert metrics.loc[0, "conga1"] == 0
+    assert np.isnan(metrics.loc[0, "mage"])
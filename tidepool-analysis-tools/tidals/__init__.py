@@ -8,16 +8,83 @@ author: Ed Nykaza
 license: BSD-2-Clause
 """
 
-# add the tidals path to sys path if it doesn't already exist
-import os, sys
-dirname = os.path.dirname(os.path.realpath(__file__))
-if dirname not in sys.path:
-    sys.path.insert(0, dirname)
-
-# List of functions in the tidals package
-from load import load_json, load_csv, load_xlsx, load_data
-from clean import remove_duplicates, round_time, remove_brackets, flatten_json
-
-# remove these modules and variables left over from the sys path
-# TODO: there has to be a better way to load in the path
-del os, sys, dirname
+import importlib
+
+# List of functions in the tidals package, and the module that each one is in.
+# NOTE: the modules (and pandas, numpy, etc.) are not imported until one of
+# their functions is first used, so that "import tidals" is fast (e.g., in
+# short-lived worker processes)
+_functionModules = {
+    "load_json": "load",
+    "load_csv": "load",
+    "load_xlsx": "load",
+    "load_data": "load",
+    "iter_json_records": "load",
+    "stream_json": "load",
+    "load_json_by_type": "load",
+    "list_donor_files": "load",
+    "load_dataset": "load",
+    "split_compression": "load",
+    "open_data_file": "load",
+    "has_data": "load",
+    "remove_duplicates": "clean",
+    "dedupe_cgm": "clean",
+    "round_time": "clean",
+    "append_round_time": "clean",
+    "remove_brackets": "clean",
+    "flatten_json": "clean",
+    "configure_cache": "cache",
+    "invalidate_cache": "cache",
+    "apply_schema": "schema",
+    "register_field": "schema",
+    "memory_report": "schema",
+    "CgmSeries": "series",
+    "to_cgm_series": "series",
+    "cgm_stats": "stats",
+    "GlucoseAccumulator": "stats",
+    "merge_accumulators": "stats",
+    "accumulator_stats": "stats",
+    "agp": "stats",
+    "AgpAccumulator": "stats",
+    "find_episodes": "episodes",
+    "detect_episodes": "episodes",
+    "variability_metrics": "variability",
+    "get_timezone_table": "tz",
+    "timezone_offsets": "tz",
+    "local_time_offsets": "tz",
+    "is_dst_change_day": "tz",
+    "dst_change_days": "tz",
+    "tzo_ranges": "tz",
+    "TimezoneAliases": "tz",
+    "read_timezone_aliases": "tz",
+    "convert_deprecated_timezones_reference": "localtime_reference",
+    "estimate_day_series": "localtime",
+    "estimate_day_series_reference": "localtime_reference",
+    "apply_local_time_estimates": "localtime",
+    "apply_local_time_estimates_reference": "localtime_reference",
+}
+
+_submodules = ["load", "clean", "cache", "schema", "series",
+               "stats", "episodes",
+               "variability", "tz", "localtime", "localtime_reference"]
+
+__all__ = list(_functionModules)
+
+
+def __getattr__(name):
+    if name in _functionModules:
+        module = importlib.import_module("." + _functionModules[name],
+                                         __name__)
+        function = getattr(module, name)
+        # keep the function, so __getattr__ is only called the first time
+        globals()[name] = function
+        return function
+    if name in _submodules:
+        return importlib.import_module("." + name, __name__)
+
+    raise AttributeError(
+        "module {0!r} has no attribute {1!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_submodules))
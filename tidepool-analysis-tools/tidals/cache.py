@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: on-disk columnar cache for tidals (tidepool data analytics tools)
+created: 2026-10-18
+author: Ed Nykaza
+dependencies:
+    * pyarrow (optional), if it is not installed the cache is disabled
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import re
+import json
+import glob
+import shutil
+import hashlib
+import warnings
+from .schema import parse_times, get_time_bounds, in_time_range
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+
+# the cache settings can also be set with the TIDALS_CACHE_DIR and
+# TIDALS_CACHE_MAX_BYTES environmental variables
+cacheSettings = {
+    "enabled": pa is not None,
+    "cacheDir": os.environ.get(
+        "TIDALS_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "tidals")),
+    "maxCacheSize": int(os.environ.get("TIDALS_CACHE_MAX_BYTES", 20 * 2**30)),
+}
+
+# hidden column used to restore the original row order of the data
+_ROW_ORDER = "__tidalsRowOrder"
+
+# part of the key of every cache entry, so the entries made before a change
+# to the schema (e.g., glucose values stored as float32) are not used
+_CACHE_FORMAT = 3
+
+
+def configure_cache(cacheDir=None, maxCacheSize=None, enabled=None):
+    # change where the cache lives, how big it can get (in bytes), or
+    # turn it on/off
+    if cacheDir is not None:
+        cacheSettings["cacheDir"] = os.path.abspath(cacheDir)
+    if maxCacheSize is not None:
+        cacheSettings["maxCacheSize"] = int(maxCacheSize)
+    if enabled is not None:
+        if enabled and (pa is None):
+            warnings.warn("pyarrow is not installed, so the cache is disabled")
+            enabled = False
+        cacheSettings["enabled"] = enabled
+
+    if cacheSettings["enabled"]:
+        _evict()
+
+    return dict(cacheSettings)
+
+
+def _path_key(inputFile):
+    return hashlib.sha256(
+        os.path.realpath(inputFile).encode()).hexdigest()[0:16]
+
+
+def _entry_dir(inputFile):
+    # the cache entry is keyed on the path, size, and modified time of the
+    # file (and the cache format)
+    fileStats = os.stat(inputFile)
+    stateKey = hashlib.sha256("{0}-{1}-{2}".format(
+        fileStats.st_size, fileStats.st_mtime_ns,
+        _CACHE_FORMAT).encode()).hexdigest()[0:16]
+
+    return os.path.join(cacheSettings["cacheDir"],
+                        _path_key(inputFile) + "-" + stateKey)
+
+
+def _is_nested(value):
+    return isinstance(value, (dict, list))
+
+
+def _encode_column(series):
+    # returns the series as is if arrow can store it, otherwise the non-null
+    # values are encoded as json strings (e.g., embedded json or mixed types)
+    if series.dtype != object:
+        return series, False
+
+    notNull = series[series.notnull()]
+    if not notNull.map(_is_nested).any():
+        try:
+            pa.array(series, from_pandas=True)
+            return series, False
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+    encoded = pd.Series(None, index=series.index, dtype=object)
+    encoded[notNull.index] = notNull.map(lambda x: json.dumps(x, default=str))
+
+    return encoded, True
+
+
+def _decode_column(series):
+    notNull = series.notnull()
+    decoded = series.astype(object)
+    decoded[notNull] = series[notNull].map(json.loads)
+
+    return decoded
+
+
+def _split_by_type(df):
+    # one part per data type, with only the fields that the type uses
+    if ("type" in df) and (len(df) > 0):
+        for dataType, typeData in df.groupby("type", sort=False, dropna=False,
+                                             observed=True):
+            typeColumns = typeData.columns[typeData.notnull().any()]
+            yield str(dataType), typeData[typeColumns.union(
+                ["type", _ROW_ORDER], sort=False)]
+    else:
+        yield "all", df
+
+
+def _entry_size(entryDir):
+    return sum(os.path.getsize(f) for f in glob.glob(
+        os.path.join(entryDir, "*")))
+
+
+def _list_entries(pattern="*"):
+    # the complete entries (i.e., not the ones that are still being written)
+    return [d for d in glob.glob(os.path.join(cacheSettings["cacheDir"],
+                                              pattern))
+            if (".tmp-" not in d) and
+            os.path.isfile(os.path.join(d, "manifest.json"))]
+
+
+def _evict(keepEntry=None):
+    # remove the least recently used entries until the cache fits
+    entries = _list_entries()
+    entries.sort(key=lambda d: os.path.getmtime(
+        os.path.join(d, "manifest.json")))
+    entrySizes = {d: _entry_size(d) for d in entries}
+    totalSize = sum(entrySizes.values())
+    for entryDir in entries:
+        if totalSize <= cacheSettings["maxCacheSize"]:
+            break
+        if entryDir != keepEntry:
+            shutil.rmtree(entryDir, ignore_errors=True)
+            totalSize = totalSize - entrySizes[entryDir]
+
+    return
+
+
+def invalidate_cache(inputFile=None):
+    # remove the cached copies of <inputFile>, or the entire cache if no
+    # file is given
+    if inputFile is None:
+        entries = _list_entries()
+    else:
+        entries = _list_entries(_path_key(inputFile) + "-*")
+    for entryDir in entries:
+        shutil.rmtree(entryDir, ignore_errors=True)
+
+    return len(entries)
+
+
+def _read_part(partPath, columns, startTime, endTime):
+    # memory map the uncompressed feather file, and only read the columns
+    # and rows that are needed
+    partSchema = pa.ipc.open_file(pa.memory_map(partPath)).schema
+    filterByTime = (startTime is not None) or (endTime is not None)
+    readColumns = None
+    if columns is not None:
+        indexColumns = [c for c in partSchema.pandas_metadata["index_columns"]
+                        if isinstance(c, str)]
+        neededColumns = set(columns) | set(indexColumns) | {_ROW_ORDER}
+        if filterByTime:
+            neededColumns.add("time")
+        readColumns = [c for c in partSchema.names if c in neededColumns]
+    table = feather.read_table(partPath, columns=readColumns, memory_map=True)
+
+    isFiltered = False
+    if filterByTime and ("time" in table.column_names) and \
+       pa.types.is_timestamp(table.schema.field("time").type):
+        times = table.column("time")
+        mask = pc.is_valid(times)
+        if startTime is not None:
+            mask = pc.and_(mask, pc.greater_equal(
+                times, pa.scalar(startTime, type=times.type)))
+        if endTime is not None:
+            mask = pc.and_(mask, pc.less(
+                times, pa.scalar(endTime, type=times.type)))
+        table = table.filter(mask)
+        isFiltered = True
+
+    return table.to_pandas(), isFiltered
+
+
+def read_cache(inputFile, columns=None, types=None, start=None, end=None):
+    # returns the cached data, or None if there isn't a valid cached copy.
+    # columns, types, start, and end are applied as the cache is read (see
+    # load.load_data)
+    if not cacheSettings["enabled"]:
+        return None
+
+    entryDir = _entry_dir(inputFile)
+    manifestPath = os.path.join(entryDir, "manifest.json")
+    if not os.path.isfile(manifestPath):
+        return None
+
+    startTime, endTime = get_time_bounds(start, end)
+    try:
+        with open(manifestPath, "r") as f:
+            manifest = json.load(f)
+
+        parts = []
+        for part in manifest["parts"]:
+            if (types is not None) and (part["type"] not in set(types)):
+                continue
+            df, isFiltered = _read_part(os.path.join(entryDir, part["file"]),
+                                        columns, startTime, endTime)
+            if (not isFiltered) and \
+               ((startTime is not None) or (endTime is not None)):
+                if "time" in df:
+                    df = df[in_time_range(parse_times(df["time"]),
+                                          startTime, endTime)]
+                else:
+                    df = df.head(0)
+            for colHead in part["jsonColumns"]:
+                if colHead in df:
+                    df[colHead] = _decode_column(df[colHead])
+            parts.append(df)
+
+    except (OSError, ValueError, KeyError, pa.ArrowException):
+        shutil.rmtree(entryDir, ignore_errors=True)
+        return None
+
+    outputColumns = manifest["columns"]
+    if columns is not None:
+        outputColumns = [c for c in columns if c in set(outputColumns)]
+
+    if len(parts) == 0:
+        df = pd.DataFrame(columns=outputColumns)
+    else:
+        if len(parts) == 1:
+            df = parts[0]
+        else:
+            df = pd.concat(parts, sort=False)
+        df = df.sort_values(_ROW_ORDER, kind="mergesort")
+        df = df.reindex(columns=outputColumns)
+    df.index.name = manifest["indexName"]
+
+    # arrow returns None for missing text, pandas parsers return nan
+    for colHead in df.columns[df.dtypes == object]:
+        df[colHead] = df[colHead].where(df[colHead].notnull(), np.nan)
+
+    # fields can change dtype when the data types are put back together
+    # (e.g., fields that a data type doesn't use), so restore the original
+    # dtypes, and all of the categories of the original data, so the
+    # filtered data is the same as the original data filtered
+    for colHead in outputColumns:
+        dtype = manifest["dtypes"][colHead]
+        if colHead in manifest["categories"]:
+            df[colHead] = df[colHead].astype(
+                pd.CategoricalDtype(manifest["categories"][colHead]))
+        elif str(df[colHead].dtype) != dtype:
+            try:
+                df[colHead] = df[colHead].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+
+    # mark this entry as recently used
+    os.utime(manifestPath)
+
+    return df
+
+
+def write_cache(inputFile, df):
+    # write a columnar copy of <df>, one feather file per data type
+    if not cacheSettings["enabled"]:
+        return False
+
+    entryDir = _entry_dir(inputFile)
+    tempDir = entryDir + ".tmp-" + str(os.getpid())
+    try:
+        os.makedirs(tempDir, exist_ok=True)
+        df = df.assign(**{_ROW_ORDER: range(len(df))})
+        manifest = {"source": os.path.realpath(inputFile),
+                    "columns": [c for c in df.columns if c != _ROW_ORDER],
+                    "indexName": df.index.name,
+                    "dtypes": {c: str(df[c].dtype) for c in df.columns
+                               if c != _ROW_ORDER},
+                    "categories": {c: df[c].cat.categories.tolist()
+                                   for c in df.columns
+                                   if isinstance(df[c].dtype,
+                                                 pd.CategoricalDtype)},
+                    "parts": []}
+
+        for pIndex, (dataType, typeData) in enumerate(_split_by_type(df)):
+            typeData = typeData.copy()
+            jsonColumns = []
+            for colHead in list(typeData):
+                typeData[colHead], isEncoded = \
+                    _encode_column(typeData[colHead])
+                if isEncoded:
+                    jsonColumns.append(colHead)
+
+            partFile = "{0:03d}-{1}.feather".format(
+                pIndex, re.sub(r"[^A-Za-z0-9]+", "_", dataType))
+            feather.write_feather(
+                pa.Table.from_pandas(typeData, preserve_index=True),
+                os.path.join(tempDir, partFile),
+                compression="uncompressed")
+            manifest["parts"].append({"file": partFile, "type": dataType,
+                                      "jsonColumns": jsonColumns})
+
+        with open(os.path.join(tempDir, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+        # remove old copies of this file, then put the new copy in place
+        invalidate_cache(inputFile)
+        os.rename(tempDir, entryDir)
+
+    except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+        shutil.rmtree(tempDir, ignore_errors=True)
+        warnings.warn("unable to cache {0}: {1}".format(inputFile, e))
+        return False
+
+    _evict(keepEntry=entryDir)
+
+    return True
@@ -20,6 +20,67 @@ def remove_duplicates(df, criteriaDF):
     return df, nDuplicatesRemoved
 
 
+def _to_datetime_index(times):
+    # the times as a DatetimeIndex in nanoseconds, so asi8 is epoch ns
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times)
+    t = pd.DatetimeIndex(times)
+    if hasattr(t, "as_unit"):
+        t = t.as_unit("ns")
+
+    return t
+
+
+def _time_in_between(tNs, isNaT, timeIntervalMinutes):
+    # calculate the time-in-between (TIB) consecutive records, from the whole
+    # days and seconds between the records
+    tib = np.full(len(tNs), np.nan)
+    if len(tNs) > 1:
+        hasTib = ~(isNaT[1:] | isNaT[:-1])
+        tibSeconds = (tNs[1:] - tNs[:-1])[hasTib] // 10**9
+        intervalSeconds = 60 * timeIntervalMinutes
+        tib[1:][hasTib] = np.round(
+            (tibSeconds // 86400) * (86400 / intervalSeconds) +
+            (tibSeconds % 86400) / intervalSeconds) * timeIntervalMinutes
+
+    return tib
+
+
+def _round_sorted_times(t, timeIntervalMinutes):
+    # the rounding engine of round_time, where t is a DatetimeIndex that is
+    # sorted ascendingly (with the missing times at the end)
+    isNaT = np.asarray(t.isna())
+    tib = _time_in_between(t.asi8, isNaT, timeIntervalMinutes)
+
+    # start a new segment at the first record and after each gap that is
+    # greater than <timeIntervalMinutes> minutes, so that the rounding
+    # process can start over
+    with np.errstate(invalid="ignore"):
+        isSegmentStart = tib > timeIntervalMinutes
+    isSegmentStart[0:1] = True
+    tib[isSegmentStart] = 0
+    segmentId = np.cumsum(isSegmentStart) - 1
+
+    # cumulative sum of TIB within each segment (missing TIBs are skipped)
+    tibCumsum = np.cumsum(np.where(np.isnan(tib), 0, tib))
+    tibCumsum = tibCumsum - tibCumsum[isSegmentStart][segmentId]
+    tibCumsum[np.isnan(tib)] = np.nan
+
+    # round the first time of each segment, and add the cumulative sum
+    segmentStartTimes = \
+        t[isSegmentStart].round(str(timeIntervalMinutes) + "min")
+    if np.array_equal(tibCumsum, np.round(tibCumsum), equal_nan=True):
+        # whole minutes, which can be added as int64 nanoseconds
+        minutes = np.where(np.isnan(tibCumsum), 0, tibCumsum).astype(np.int64)
+        cumsumDeltas = pd.TimedeltaIndex(minutes * 60 * 10**9)
+        cumsumDeltas = cumsumDeltas.where(~np.isnan(tibCumsum))
+    else:
+        cumsumDeltas = pd.to_timedelta(tibCumsum, unit="m")
+    roundedTimes = segmentStartTimes[segmentId] + cumsumDeltas
+
+    return tib, tibCumsum, roundedTimes
+
+
 def round_time(df, timeIntervalMinutes=5, timeField="time",
                roundedTimeFieldName="roundedTime", verbose=False):
     # A general purpose round time function that rounds the
@@ -29,43 +90,203 @@ def round_time(df, timeIntervalMinutes=5, timeField="time",
     #   * timeIntervalMinutes defaults to 5 minutes given that most cgms output every 5 minutes
     #   * timeField defaults to UTC time "time"
     #   * verbose specifies whether the "TIB" and "TIB_cumsum" columns are returned
+    # NOTE: the times are handled as int64 (epoch) nanoseconds, and the data
+    # is split into segments at each large gap with a cumulative sum (rather
+    # than looping over the gaps), so this scales to data with many gaps
 
     df.sort_values(by=timeField, ascending=True, inplace=True)
     df.reset_index(drop=True, inplace=True)
 
-    # calculate the time-in-between (TIB) consecutive records
-    t = pd.to_datetime(df.time)
-    t_shift = pd.to_datetime(df.time.shift(1))
-    df["TIB"] = round((t - t_shift).dt.days*(86400/(60 * timeIntervalMinutes)) +
-                      (t - t_shift).dt.seconds/(60 * timeIntervalMinutes)) * timeIntervalMinutes
+    tib, tibCumsum, roundedTimes = _round_sorted_times(
+        _to_datetime_index(df[timeField]), timeIntervalMinutes)
+    df["TIB"] = tib
+    df["TIB_cumsum"] = tibCumsum
+    df[roundedTimeFieldName] = roundedTimes
+
+    # sort descendingly by time and drop fieldsfields
+    df.sort_values(by=timeField, ascending=False, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    if verbose is False:
+        df.drop(columns=["TIB", "TIB_cumsum"], inplace=True)
+
+    return df
 
-    # separate the data into chunks if TIB is greater than <timeIntervalMinutes> minutes
-    # so that rounding process can start over
-    largeGaps = list(df.query("TIB > " + str(timeIntervalMinutes)).index)
-    largeGaps.insert(0, 0)
-    largeGaps.append(len(df))
 
-    # loop through each chunk to get the cumulative sum and the rounded time
-    for gIndex in range(0, len(largeGaps) - 1):
+def _last_segment_start(tNs, endIndex, timeIntervalMinutes, windowSize):
+    # the index of the last record before <endIndex> that starts a segment
+    # (i.e., comes after a gap that is greater than <timeIntervalMinutes>),
+    # where tNs are the (sorted) times. The search goes backwards in windows
+    # that double in size, so only the end of the data is usually looked at
+    hi = endIndex
+    while hi > 1:
+        lo = max(hi - windowSize, 0)
+        tib = _time_in_between(tNs[lo:hi], np.zeros(hi - lo, dtype=bool),
+                               timeIntervalMinutes)
+        with np.errstate(invalid="ignore"):
+            segmentStarts = np.flatnonzero(tib > timeIntervalMinutes)
+        if len(segmentStarts) > 0:
+            return lo + segmentStarts[-1]
+        hi = lo + 1
+        windowSize = 2 * windowSize
 
-        df.loc[largeGaps[gIndex], "TIB"] = 0
+    return 0
 
-        df.loc[largeGaps[gIndex]:(largeGaps[gIndex + 1] - 1), "TIB_cumsum"] = \
-            df.loc[largeGaps[gIndex]:(largeGaps[gIndex + 1] - 1), "TIB"].cumsum()
 
-        df.loc[largeGaps[gIndex]:(largeGaps[gIndex + 1] - 1), roundedTimeFieldName] = \
-            pd.to_datetime(df.loc[largeGaps[gIndex], timeField]).round(str(timeIntervalMinutes) + "min") + \
-            pd.to_timedelta(df.loc[largeGaps[gIndex]:(largeGaps[gIndex + 1] - 1), "TIB_cumsum"], unit="m")
+def append_round_time(df, newData, timeIntervalMinutes=5, timeField="time",
+                      roundedTimeFieldName="roundedTime"):
+    # incremental version of round_time, which adds new (raw) records to data
+    # that has already been rounded (e.g., a daily job that downloads
+    # overlapping windows of data). Only the segment of the data that can
+    # change (i.e., from the last large gap before the new records) is
+    # re-rounded, so the cost is proportional to the new data rather than
+    # the full history
+    # INPUTS:
+    #   * df is the output of round_time (or append_round_time)
+    #   * newData contains the new records, which can overlap df
+    # OUTPUT: the same as round_time on all of the records, except the new
+    # records that have the same time as a record in df are dropped, as they
+    # are duplicates (e.g., from overlapping downloads) that don't change
+    # the rounding
+    verbose = "TIB" in list(df)
+    if len(df) == 0:
+        return round_time(newData.copy(), timeIntervalMinutes, timeField,
+                          roundedTimeFieldName, verbose)
+    if len(newData) == 0:
+        return df
 
-    # sort descendingly by time and drop fieldsfields
-    df.sort_values(by=timeField, ascending=False, inplace=True)
+    # df is sorted descendingly by time with the missing times at the end,
+    # so the reversed times that are not missing are sorted ascendingly
+    t = _to_datetime_index(df[timeField])
+    nTimes = int((~t.isna()).sum())
+    tNs = t.asi8[:nTimes][::-1]
+
+    # drop the new records that overlap the records in df
+    newTimes = _to_datetime_index(newData[timeField])
+    newNs = newTimes.asi8
+    isNewNaT = np.asarray(newTimes.isna())
+    if (~isNewNaT).any():
+        overlapIndex = np.searchsorted(tNs, newNs[~isNewNaT].min())
+        isOverlap = np.isin(newNs, tNs[overlapIndex:]) & ~isNewNaT
+        newData = newData[~isOverlap]
+        newNs = newNs[~isOverlap]
+        isNewNaT = isNewNaT[~isOverlap]
+
+    # re-round the segment that the first new record is in, and the records
+    # that come after it
+    if (~isNewNaT).any():
+        insertIndex = np.searchsorted(tNs, newNs[~isNewNaT].min(),
+                                      side="right")
+        startIndex = _last_segment_start(tNs, insertIndex,
+                                         timeIntervalMinutes,
+                                         max(2 * len(newData), 4096))
+    else:
+        startIndex = nTimes
+    nTail = nTimes - startIndex
+
+    tail = pd.concat([df.iloc[:nTail], df.iloc[nTimes:], newData], sort=False)
+    tail = tail.drop(columns=["TIB", "TIB_cumsum", roundedTimeFieldName],
+                     errors="ignore")
+    tail = round_time(tail, timeIntervalMinutes, timeField,
+                      roundedTimeFieldName, verbose)
+
+    # the records with missing times stay at the end
+    # NOTE: a tail without any times (e.g., the new records all overlap df)
+    # is rounded to naive NaTs, so the rounded times keep the dtype of df
+    roundedDtype = df[roundedTimeFieldName].dtype
+    isTailNaT = np.asarray(_to_datetime_index(tail[timeField]).isna())
+    df = pd.concat([tail[~isTailNaT], df.iloc[nTail:nTimes], tail[isTailNaT]],
+                   sort=False)
+    df[roundedTimeFieldName] = df[roundedTimeFieldName].astype(roundedDtype)
     df.reset_index(drop=True, inplace=True)
-    if verbose is False:
-        df.drop(columns=["TIB", "TIB_cumsum"], inplace=True)
 
     return df
 
 
+def _group_codes(*fields):
+    # an int64 key for each unique combination of the fields, from the hash
+    # table codes of each field (missing values are treated as equal)
+    codes = np.zeros(len(fields[0]), dtype=np.int64)
+    for field in fields:
+        fieldCodes, uniques = pd.factorize(field)
+        codes = codes * (len(uniques) + 1) + (fieldCodes + 1)
+
+    return codes
+
+
+def dedupe_cgm(df, timeIntervalMinutes=5, roundedTimeFieldName="roundedTime"):
+    # remove the duplicate cgm (cbg) records in three stages, where the record
+    # from the latest upload (uploadTime) wins:
+    #   1. records with the same deviceTime and value
+    #   2. records with the same (utc) time and value
+    #   3. records with the same rounded time (see round_time)
+    # This is the same as removing the duplicates on deviceTime and time (see
+    # qualify-data removeCgmDuplicates), rounding the time, and then removing
+    # the duplicates on roundedTime, but the data is only sorted once (by
+    # time and uploadTime), and the rest is done with hash tables
+    # OUTPUT: the data sorted descendingly by time (with roundedTime), and
+    # the number of duplicates removed by each of the three stages
+    t = _to_datetime_index(df["time"])
+    isNaT = np.asarray(t.isna())
+    if "uploadTime" in list(df):
+        uploadNs = _to_datetime_index(df["uploadTime"]).asi8
+    else:
+        uploadNs = np.zeros(len(df), dtype=np.int64)
+
+    # the one sort: ascending by time (missing times at the end), then
+    # ascending by uploadTime (missing uploadTimes first), so within a time
+    # the last record is from the latest upload
+    order = np.lexsort((uploadNs, t.asi8, isNaT))
+    sortedTimes = t.asi8[order]
+    sortedValues = df["value"].values[order]
+    uploadNs = uploadNs[order]
+    keep = np.ones(len(df), dtype=bool)
+
+    # 1. deviceTime and value, where the group can span different times, so
+    # the record with the latest uploadTime is found with a groupby (and if
+    # there is a tie, the record with the earliest time wins)
+    nDuplicatesRemovedDeviceTime = 0
+    if "deviceTime" in list(df):
+        deviceTimes = df["deviceTime"].values[order]
+        hasDeviceTime = pd.notnull(deviceTimes)
+        codes = _group_codes(deviceTimes[hasDeviceTime],
+                             sortedValues[hasDeviceTime])
+        deviceUploads = pd.Series(uploadNs[hasDeviceTime])
+        isLatest = (deviceUploads == deviceUploads.groupby(codes).transform(
+            "max")).values
+        isLatest[isLatest] = ~pd.Series(codes[isLatest]).duplicated().values
+        keep[hasDeviceTime] = isLatest
+        nDuplicatesRemovedDeviceTime = int((~isLatest).sum())
+
+    # 2. time and value, which are sorted, so the last record of each group
+    # is from the latest upload
+    hasTime = keep & ~isNaT[order]
+    isLast = ~pd.Series(_group_codes(sortedTimes[hasTime],
+                                     sortedValues[hasTime])).duplicated(
+        keep="last").values
+    keep[hasTime] = isLast
+    nDuplicatesRemovedUtcTime = int((~isLast).sum())
+
+    # 3. round the (sorted) times that are left, and keep the last record of
+    # each rounded time (i.e., the one with the latest time)
+    keepIndices = np.flatnonzero(keep)
+    _, _, roundedTimes = _round_sorted_times(t[order[keepIndices]],
+                                             timeIntervalMinutes)
+    isLast = ~pd.Series(roundedTimes).duplicated(keep="last").values
+    nDuplicatesRemovedRoundedTime = int((~isLast).sum())
+    keepIndices = keepIndices[isLast]
+    roundedTimes = roundedTimes[isLast]
+
+    # sort descendingly by time (with the missing times at the end)
+    isKeepNaT = np.asarray(roundedTimes.isna())
+    descending = np.concatenate([np.flatnonzero(~isKeepNaT)[::-1],
+                                 np.flatnonzero(isKeepNaT)])
+    df = df.iloc[order[keepIndices[descending]]].reset_index(drop=True)
+    df[roundedTimeFieldName] = roundedTimes[descending]
+
+    return df, nDuplicatesRemovedDeviceTime, nDuplicatesRemovedUtcTime, \
+        nDuplicatesRemovedRoundedTime
+
+
 def remove_brackets(df, fieldName):
     if fieldName in list(df):
         df.loc[df[fieldName].notnull(), fieldName] = \
@@ -74,26 +295,78 @@ def remove_brackets(df, fieldName):
     return df
 
 
-def flatten_json(df):
+def _has_dicts(series):
+    # only object fields can have embedded json, and pandas can tell (in c)
+    # that a field is all text or all numbers, so only fields with mixed
+    # values are checked one value at a time
+    if series.dtype != object:
+        return False
+    if pd.api.types.infer_dtype(series, skipna=True) not in \
+       ["mixed", "mixed-integer"]:
+        return False
+
+    return any(isinstance(item, dict) for item in series)
+
+
+def _get_parents(columns):
+    # the prefixes of the nested fields, e.g., "suppressed" and
+    # "suppressed.suppressed" for "suppressed.suppressed.rate"
+    parents = set()
+    for colHead in columns:
+        keys = colHead.split(".")
+        for kIndex in range(1, len(keys)):
+            parents.add(".".join(keys[:kIndex]))
+
+    return parents
+
+
+def _flatten_dict(record, prefix, flatRecord, columns, parents):
+    # add the fields of the (nested) dictionary to flatRecord, where the
+    # field names are the keys joined by "." (e.g., suppressed.suppressed.rate)
+    for key, value in record.items():
+        colHead = prefix + "." + str(key)
+        if isinstance(value, dict) and ((parents is None) or
+                                        (colHead in parents)):
+            _flatten_dict(value, colHead, flatRecord, columns, parents)
+        elif (columns is None) or (colHead in columns):
+            flatRecord[colHead] = value
+
+    return flatRecord
+
+
+def flatten_json(df, columns=None):
+    # flatten the embedded json (i.e., dictionaries) in df to any depth in a
+    # single pass. The embedded json is replaced with nan, and the nested
+    # fields are added as new columns (e.g., suppressed.rate and
+    # suppressed.suppressed.rate)
+    # INPUTS:
+    #   * columns (optional) is an allow-list of the nested fields to add,
+    #     the nested fields that are not in the list are never created
+    if columns is not None:
+        columns = set(columns)
+        parents = _get_parents(columns)
+    else:
+        parents = None
+
     # remove [] from annotations field
     df = remove_brackets(df, "annotations")
 
-    # loop through each columnHeading
-    newDataFrame = pd.DataFrame()
-
+    newDataFrames = []
     for colHead in list(df):
-        # if the df field has embedded json
-        if any(isinstance(item, dict) for item in df[colHead]):
-            # grab the data that is in brackets
-            jsonBlob = df[colHead][df[colHead].astype(str).str[0] == "{"]
+        if not _has_dicts(df[colHead]):
+            continue
 
-            # replace those values with nan
-            df.loc[jsonBlob.index, colHead] = np.nan
+        isDict = df[colHead].map(lambda x: isinstance(x, dict)).values
+        jsonBlob = df.loc[isDict, colHead]
+        if (parents is None) or (colHead in parents):
+            newDataFrames.append(pd.DataFrame(
+                [_flatten_dict(record, colHead, {}, columns, parents)
+                 for record in jsonBlob], index=jsonBlob.index))
 
-            # turn jsonBlob to dataframe
-            newDataFrame = pd.concat([newDataFrame, pd.DataFrame(jsonBlob.tolist(),
-                                      index=jsonBlob.index).add_prefix(colHead + '.')], axis=1)
+        # replace those values with nan
+        df.loc[isDict, colHead] = np.nan
 
-    df = pd.concat([df, newDataFrame], axis=1)
+    if len(newDataFrames) > 0:
+        df = pd.concat([df] + newDataFrames, axis=1)
 
     return df
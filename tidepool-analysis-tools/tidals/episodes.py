@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: hypo/hyperglycemia and missing data episodes for tidals
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+from .series import CgmSeries
+
+# the default episodes, as {episodeType: (low, high, minDurationMinutes)}.
+# The values of an episode are >= low and < high (None means the range is
+# open on that side), and low = high = None is an episode without cgm data.
+# NOTE: the thresholds are in mg/dL (the flags of daily-feedback.py), so the
+# cgm series must be in mg/dL too
+episodeDefinitions = {
+    "below54": (None, 54, 15),
+    "54to70": (54, 70, 120),
+    "above250": (250, None, 120),
+    "noSignal": (None, None, 240),
+}
+
+
+def _combine_series(cgmSeries):
+    # the values of all series end to end, the index of the first slot of
+    # each series, and the keys of the series
+    if isinstance(cgmSeries, CgmSeries):
+        cgmSeries = {None: cgmSeries}
+    keys = list(cgmSeries)
+    seriesList = [cgmSeries[key] for key in keys]
+    intervals = set(s.intervalMinutes for s in seriesList)
+    if len(intervals) > 1:
+        raise ValueError("the cgm series must have the same intervalMinutes")
+
+    seriesStarts = np.cumsum([0] + [len(s) for s in seriesList])
+    if len(seriesList) == 0:
+        values = np.zeros(0, dtype=np.float32)
+    else:
+        values = np.concatenate([s.values for s in seriesList])
+
+    return values, seriesStarts, keys, seriesList
+
+
+def _runs(mask, seriesStarts):
+    # run length encoding of mask: the first and last index of each run of
+    # True values (runs do not cross from one series into the next)
+    isNewSeries = np.zeros(len(mask) + 1, dtype=bool)
+    isNewSeries[seriesStarts] = True
+    previous = np.concatenate([[False], mask[:-1]]) & ~isNewSeries[:-1]
+    following = np.concatenate([mask[1:], [False]]) & ~isNewSeries[1:]
+
+    return np.nonzero(mask & ~previous)[0], np.nonzero(mask & ~following)[0]
+
+
+def _observed_span(values, seriesStarts):
+    # True for the slots from the first to the last cgm value of each series
+    # (i.e., not the padding before the first and after the last value that
+    # fills the grid out to whole days)
+    isObserved = ~np.isnan(values)
+    nObserved = np.concatenate([[0], np.cumsum(isObserved)])
+    seriesIndex = np.repeat(np.arange(len(seriesStarts) - 1),
+                            np.diff(seriesStarts))
+    slotIndex = np.arange(len(values))
+    nBefore = nObserved[slotIndex + 1] - \
+        nObserved[seriesStarts[:-1][seriesIndex]]
+    nAfter = nObserved[seriesStarts[1:][seriesIndex]] - nObserved[slotIndex]
+
+    return (nBefore > 0) & (nAfter > 0)
+
+
+def find_episodes(cgmSeries, low=None, high=None, minDurationMinutes=15):
+    # the episodes of consecutive cgm values that are >= low and < high (or,
+    # if low and high are both None, of consecutive missing values) that last
+    # at least minDurationMinutes. A missing value ends an episode. Missing
+    # values are only counted between the first and last cgm value of each
+    # series.
+    # INPUTS:
+    #   * cgmSeries is a CgmSeries, or a dict of them (e.g., {userID: series})
+    #     which are all done at once
+    # OUTPUT: one row per episode with the key of the series (if a dict is
+    #   given), the utc start and end time (of the first and last slot), the
+    #   local start time, the duration (the number of slots * the interval),
+    #   and the nadir and peak
+    values, seriesStarts, keys, seriesList = _combine_series(cgmSeries)
+    if (low is None) and (high is None):
+        mask = np.isnan(values) & _observed_span(values, seriesStarts)
+    else:
+        mask = ~np.isnan(values)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values < high
+
+    runStarts, runEnds = _runs(mask, seriesStarts)
+    intervalMinutes = seriesList[0].intervalMinutes if seriesList else 5
+    nSlots = runEnds - runStarts + 1
+    isEpisode = nSlots * intervalMinutes >= minDurationMinutes
+    runStarts, runEnds = runStarts[isEpisode], runEnds[isEpisode]
+    nSlots = nSlots[isEpisode]
+
+    # the series of each episode, and the position of the episode in it
+    seriesIndex = np.searchsorted(seriesStarts, runStarts, side="right") - 1
+    seriesStartTimes = np.array([s.startTime.value for s in seriesList],
+                                dtype=np.int64)[seriesIndex]
+    intervalNs = intervalMinutes * 60 * 10**9
+    startTimes = seriesStartTimes + \
+        (runStarts - seriesStarts[seriesIndex]) * intervalNs
+
+    tzOffsetNs = np.array([s.tzOffsetMinutes * 60 * 10**9 for s in seriesList],
+                          dtype=np.int64)[seriesIndex]
+    episodes = pd.DataFrame({
+        "startTime": pd.to_datetime(startTimes),
+        "endTime": pd.to_datetime(startTimes + (nSlots - 1) * intervalNs),
+        "localStartTime": pd.to_datetime(startTimes + tzOffsetNs),
+        "durationMinutes": nSlots * intervalMinutes})
+
+    if (low is None) and (high is None):
+        episodes["nadir"] = np.full(len(episodes), np.nan, dtype=np.float32)
+        episodes["peak"] = np.full(len(episodes), np.nan, dtype=np.float32)
+    elif len(runStarts) > 0:
+        # min and max of each [start, end] segment
+        edges = np.column_stack([runStarts, runEnds + 1]).ravel()
+        paddedValues = np.append(values, np.float32(np.nan))
+        episodes["nadir"] = np.minimum.reduceat(paddedValues, edges)[::2]
+        episodes["peak"] = np.maximum.reduceat(paddedValues, edges)[::2]
+    else:
+        episodes["nadir"] = np.zeros(0, dtype=np.float32)
+        episodes["peak"] = np.zeros(0, dtype=np.float32)
+
+    if not isinstance(cgmSeries, CgmSeries):
+        episodes.insert(0, "key", [keys[i] for i in seriesIndex])
+
+    return episodes
+
+
+def detect_episodes(cgmSeries, definitions=None):
+    # the episodes of each type in definitions (see episodeDefinitions),
+    # with an episodeType field, sorted by series and start time
+    if definitions is None:
+        definitions = episodeDefinitions
+
+    allEpisodes = []
+    for episodeType, (low, high, minDurationMinutes) in definitions.items():
+        episodes = find_episodes(cgmSeries, low, high, minDurationMinutes)
+        episodes.insert(0, "episodeType", episodeType)
+        allEpisodes.append(episodes)
+    allEpisodes = pd.concat(allEpisodes, ignore_index=True)
+
+    sortFields = ["startTime"]
+    if "key" in allEpisodes:
+        allEpisodes = allEpisodes[["key"] + [c for c in allEpisodes
+                                             if c != "key"]]
+        allEpisodes["seriesOrder"] = allEpisodes["key"].map(
+            {key: i for i, key in enumerate(cgmSeries)})
+        sortFields = ["seriesOrder", "startTime"]
+    allEpisodes = allEpisodes.sort_values(sortFields, kind="mergesort")
+
+    return allEpisodes.drop(columns=["seriesOrder"], errors="ignore") \
+        .reset_index(drop=True)
@@ -8,40 +8,535 @@ license: BSD-2-Clause
 """
 
 import pandas as pd
+import numpy as np
 import os
 import sys
+import re
+import bz2
+import gzip
+import lzma
+import json
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from .cache import read_cache, write_cache, cacheSettings
+from .schema import apply_schema, get_csv_dtypes, parse_times, \
+    get_time_bounds, in_time_range, tidepoolSchema
 
 
-def load_json(dataPathAndName):
-    df = pd.read_json(dataPathAndName, orient="records")
+# compressed files are decompressed as they are read (i.e., streamed), the
+# entire (uncompressed) file is never held in memory
+_COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".zst": "zstd"}
+
+# characters that can sit between records in a json list of records
+_RECORD_SEPARATORS = re.compile(r"[\s,]*")
+# a complete record is followed by a comma or the closing bracket of the list
+_RECORD_END = re.compile(r"\s*[,\]]")
+_WHITESPACE = re.compile(r"\s*")
+
+
+def split_compression(inputFile):
+    # returns the file name without the compression extension, and the
+    # compression (None if the file is not compressed), for example,
+    # "PHI-jill-jellyfish.json.gz" -> ("PHI-jill-jellyfish.json", "gzip")
+    for extension, compression in _COMPRESSIONS.items():
+        if inputFile.lower().endswith(extension):
+            return inputFile[:-len(extension)], compression
+
+    return inputFile, None
+
+
+def open_data_file(inputFile, mode="rt"):
+    # open a file that may be compressed
+    _, compression = split_compression(inputFile)
+    if compression == "gzip":
+        return gzip.open(inputFile, mode)
+    elif compression == "bz2":
+        return bz2.open(inputFile, mode)
+    elif compression == "xz":
+        return lzma.open(inputFile, mode)
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            sys.exit("zstandard is needed to read {0}".format(inputFile))
+        return zstandard.open(inputFile, mode)
+
+    return open(inputFile, mode)
+
+
+def has_data(inputFile, minSize=2):
+    # True if the (uncompressed) data is bigger than <minSize> bytes. Only
+    # the first <minSize> + 1 bytes of a compressed file are decompressed
+    if split_compression(inputFile)[1] is None:
+        return os.stat(inputFile).st_size > minSize
+    with open_data_file(inputFile, "rb") as f:
+        return len(f.read(minSize + 1)) > minSize
+
+
+def _read_more(f, buffer, idx, readSize):
+    # drop the text that has already been parsed and read the next chunk
+    newText = f.read(readSize)
+    return buffer[idx:] + newText, 0, (newText == "")
+
+
+def iter_json_records(dataPathAndName, readSize=2**20):
+    # incrementally parse a json file that contains a list of records
+    # (i.e., the Tidepool export format) and yield one record (dict) at a time.
+    # Only <readSize> characters (plus the record being parsed) are held in
+    # memory, regardless of the size of the file.
+    # NOTE: compressed files (e.g., .json.gz) are decompressed as they are read
+    # A record that can't be parsed raises a ValueError as soon as more text
+    # doesn't fix it (i.e., the file is not read to the end first)
+    decoder = json.JSONDecoder()
+    lastError = None
+    with open_data_file(dataPathAndName, "rt") as f:
+        buffer, idx, eof = _read_more(f, "", 0, readSize)
+
+        # find the opening bracket of the list
+        idx = _RECORD_SEPARATORS.match(buffer, idx).end()
+        while (idx >= len(buffer)) and not eof:
+            buffer, idx, eof = _read_more(f, buffer, idx, readSize)
+            idx = _RECORD_SEPARATORS.match(buffer, idx).end()
+        if idx >= len(buffer):
+            return
+        if buffer[idx] != "[":
+            raise ValueError(
+                "{0} is not a json list of records".format(dataPathAndName))
+        idx += 1
+
+        while True:
+            idx = _RECORD_SEPARATORS.match(buffer, idx).end()
+            if idx >= len(buffer):
+                if eof:
+                    raise ValueError(
+                        "{0} ended before the json list was closed".format(
+                            dataPathAndName))
+                buffer, idx, eof = _read_more(f, buffer, idx, readSize)
+                continue
+
+            if buffer[idx] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, idx)
+            except json.JSONDecodeError as e:
+                # the record may be split across reads, so get more text,
+                # unless more text gave the same error (i.e., the record is
+                # malformed)
+                error = (e.pos - idx, e.msg)
+                if eof or (error == lastError):
+                    raise ValueError("{0} has a malformed record: {1}".format(
+                        dataPathAndName, e)) from e
+                lastError = error
+                buffer, idx, eof = _read_more(f, buffer, idx, readSize)
+                continue
+            lastError = None
+
+            # a record that is only followed by whitespace may have been cut
+            # short (e.g., a number), so get more text and re-parse
+            if _RECORD_END.match(buffer, end) is None:
+                if eof or (_WHITESPACE.match(buffer, end).end() < len(buffer)):
+                    raise ValueError(
+                        "{0} is not a json list of records".format(
+                            dataPathAndName))
+                buffer, idx, eof = _read_more(f, buffer, idx, readSize)
+                continue
+
+            idx = end
+            yield record
+
+
+def _select_fields(record, columns):
+    return {k: record[k] for k in columns if k in record}
+
+
+def _make_type_frame(records, rowIndices, times, startTime, endTime):
+    # drop the records that are outside of the time range before they
+    # become DataFrame rows
+    if times is not None:
+        keep = in_time_range(parse_times(pd.Series(times, dtype=object)),
+                             startTime, endTime).values
+        records = [r for r, k in zip(records, keep) if k]
+        rowIndices = [i for i, k in zip(rowIndices, keep) if k]
+
+    return pd.DataFrame(records, index=rowIndices)
+
+
+def stream_json(dataPathAndName, types=None, batchSize=10000, columns=None,
+                start=None, end=None):
+    # stream a json file and yield (type, DataFrame) pairs, one DataFrame per
+    # data type (e.g., cbg, bolus, basal, wizard, upload) per batch.
+    # INPUTS:
+    #   * types (optional) is a list of data types to keep, all other records
+    #     are skipped and never become DataFrame rows
+    #   * batchSize is the max number of records held in memory before they
+    #     are turned into DataFrames, which bounds the peak memory
+    #   * columns (optional) is a list of the fields to keep
+    #   * start and end (optional) only keep the records with a utc time
+    #     between start and end (see schema.get_time_bounds)
+    # NOTE: the index of each DataFrame is the row index of the record in the
+    # json file, so batches can be put back into their original order
+    if types is not None:
+        types = set(types)
+    startTime, endTime = get_time_bounds(start, end)
+    filterByTime = (startTime is not None) or (endTime is not None)
+
+    batch = {}
+    batchIndex = {}
+    batchTimes = {}
+    nRecordsInBatch = 0
+    for rowIndex, record in enumerate(iter_json_records(dataPathAndName)):
+        dataType = record.get("type")
+        if (types is not None) and (dataType not in types):
+            continue
+
+        if filterByTime:
+            batchTimes.setdefault(dataType, []).append(record.get("time"))
+        if columns is not None:
+            record = _select_fields(record, columns)
+
+        batch.setdefault(dataType, []).append(record)
+        batchIndex.setdefault(dataType, []).append(rowIndex)
+        nRecordsInBatch += 1
+
+        if nRecordsInBatch >= batchSize:
+            for dataType in batch.keys():
+                df = _make_type_frame(batch[dataType], batchIndex[dataType],
+                                      batchTimes.get(dataType),
+                                      startTime, endTime)
+                if len(df) > 0:
+                    yield dataType, df
+            batch = {}
+            batchIndex = {}
+            batchTimes = {}
+            nRecordsInBatch = 0
+
+    for dataType in batch.keys():
+        df = _make_type_frame(batch[dataType], batchIndex[dataType],
+                              batchTimes.get(dataType), startTime, endTime)
+        if len(df) > 0:
+            yield dataType, df
+
+
+def load_json_by_type(dataPathAndName, types=None, batchSize=10000,
+                      applySchema=True, columns=None, start=None, end=None):
+    # collect the output of stream_json into a dictionary of
+    # {type: DataFrame}, where each DataFrame only has the fields of that type
+    typeBatches = {}
+    for dataType, df in stream_json(dataPathAndName, types, batchSize,
+                                    columns, start, end):
+        typeBatches.setdefault(dataType, []).append(df)
+
+    typeData = {}
+    for dataType in list(typeBatches.keys()):
+        typeData[dataType] = _infer_json_dtypes(
+            pd.concat(typeBatches.pop(dataType), sort=False))
+        if applySchema:
+            typeData[dataType] = apply_schema(typeData[dataType])
+
+    return typeData
+
+
+def _select_columns(df, columns):
+    # keep the requested columns (that exist) in the requested order
+    if columns is None:
+        return df
+
+    return df[[c for c in columns if c in df]]
+
+
+def _row_mask(df, types, startTime, endTime):
+    mask = pd.Series(True, index=df.index)
+    if types is not None:
+        if "type" in df:
+            mask = mask & df["type"].isin(types)
+        else:
+            mask[:] = False
+    if (startTime is not None) or (endTime is not None):
+        if "time" in df:
+            mask = mask & in_time_range(parse_times(df["time"]),
+                                        startTime, endTime)
+        else:
+            mask[:] = False
+
+    return mask
+
+
+def _filter_rows(df, types, startTime, endTime):
+    return df[_row_mask(df, types, startTime, endTime)]
+
+
+def _is_number(value):
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _witness_rows(df):
+    # the index of a few rows of df that have every kind of value that each
+    # field of df has, i.e., missing values, each python type, text that
+    # isn't a number, the smallest, largest, and fractional numbers, and
+    # each value of the category fields. The dtypes that are inferred for
+    # the data (and set by apply_schema) only depend on these values
+    rows = list(df.index[:1])
+    for colHead in df.columns:
+        data = df[colHead]
+        notNull = data.notnull()
+        rows.extend(data.index[~notNull][:1])
+        values = data[notNull]
+        numbers = None
+        if values.dtype == object:
+            rows.extend(values.map(type).drop_duplicates().index)
+            try:
+                values.astype("float64")
+            except (TypeError, ValueError):
+                for rowIndex, value in values.items():
+                    if not _is_number(value):
+                        rows.append(rowIndex)
+                        break
+            try:
+                numbers = pd.to_numeric(values, errors="coerce")
+                rows.extend(values.index[numbers.isnull()][:1])
+                numbers = numbers.dropna()
+            except (TypeError, ValueError):
+                numbers = None
+        elif pd.api.types.is_numeric_dtype(values) and \
+                not pd.api.types.is_bool_dtype(values):
+            numbers = values
+        if (numbers is not None) and (len(numbers) > 0):
+            rows.extend([numbers.idxmin(), numbers.idxmax()])
+            rows.extend(numbers.index[numbers != np.round(numbers)][:1])
+        if tidepoolSchema.get(colHead) == "category":
+            try:
+                rows.extend(values.drop_duplicates().index)
+            except TypeError:
+                pass
+
+    return pd.Index(rows).unique()
+
+
+def _needed_columns(columnHeadings, columns, types, start, end):
+    # the columns that have to be read to project and filter the data
+    if columns is None:
+        return columnHeadings
+    neededColumns = set(columns)
+    if types is not None:
+        neededColumns.add("type")
+    if (start is not None) or (end is not None):
+        neededColumns.add("time")
+
+    return [c for c in columnHeadings if c in neededColumns]
+
+
+def _infer_json_dtypes(df):
+    # the dtypes that pd.read_json infers for the columns of a json list of
+    # records, i.e., text that can be numbers is float64, and float64 that
+    # is all whole numbers is int64
+    for column in df.columns:
+        data = df[column]
+        isConverted = False
+        if data.dtype == object:
+            try:
+                data = data.astype("float64")
+                isConverted = True
+            except (TypeError, ValueError):
+                pass
+        if (len(data) > 0) and (data.dtype in ("float64", "object")):
+            try:
+                intData = data.astype("int64")
+                if (intData == data).all():
+                    data = intData
+                    isConverted = True
+            except (TypeError, ValueError, OverflowError):
+                pass
+        if isConverted:
+            df[column] = data
+
+    return df
+
+
+def _json_batches(dataPathAndName, batchSize=10000, fields=None):
+    # yield the records of a json file as DataFrames of batchSize records,
+    # indexed by the row index of the records in the file, so the whole text
+    # of the file is never held in memory. fields (optional) are the fields
+    # of the records to keep
+    batch = []
+    batchStart = 0
+    for record in iter_json_records(dataPathAndName):
+        if fields is not None:
+            record = _select_fields(record, fields)
+        batch.append(record)
+        if len(batch) >= batchSize:
+            yield pd.DataFrame(batch, index=range(batchStart,
+                                                  batchStart + len(batch)))
+            batchStart += len(batch)
+            batch = []
+    if (len(batch) > 0) or (batchStart == 0):
+        yield pd.DataFrame(batch, index=range(batchStart,
+                                              batchStart + len(batch)))
+
+
+def _load_json_records(dataPathAndName, batchSize=10000):
+    # all of the records of a json file (in the order of the file)
+    df = pd.concat(_json_batches(dataPathAndName, batchSize),
+                   ignore_index=True, sort=False)
+
+    return _infer_json_dtypes(df)
+
+
+def _load_json_filtered(dataPathAndName, types=None, applySchema=True,
+                        columns=None, start=None, end=None, batchSize=10000):
+    # the records of a json file with the data types, fields, and times that
+    # are needed, with the same dtypes as the whole file. Each batch of
+    # records is filtered as it is read, and only a few of the records that
+    # are filtered out (see _witness_rows) are kept until the dtypes are set
+    startTime, endTime = get_time_bounds(start, end)
+    fields = None
+    if columns is not None:
+        fields = _needed_columns(list(columns) + ["type", "time"], columns,
+                                 types, start, end)
+
+    batches = []
+    witnesses = None
+    fieldOrder = {}
+    for df in _json_batches(dataPathAndName, batchSize, fields):
+        fieldOrder.update(dict.fromkeys(df.columns))
+        mask = _row_mask(df, types, startTime, endTime)
+        if mask.any():
+            batches.append(df[mask])
+        droppedRows = df[~mask]
+        droppedRows = droppedRows.loc[_witness_rows(droppedRows)]
+        if len(droppedRows) > 0:
+            if witnesses is not None:
+                droppedRows = pd.concat([witnesses, droppedRows], sort=False)
+            witnesses = droppedRows.loc[_witness_rows(droppedRows)]
+
+    if witnesses is not None:
+        batches.append(witnesses)
+    if len(batches) > 0:
+        df = pd.concat(batches, sort=False)
+    else:
+        df = pd.DataFrame()
+    df = _infer_json_dtypes(df[list(fieldOrder)])
+    if applySchema:
+        df = apply_schema(df)
+    if witnesses is not None:
+        df = df.drop(index=witnesses.index)
+
+    return _select_columns(df, columns)
+
+
+def load_json(dataPathAndName, types=None, applySchema=True, columns=None,
+              start=None, end=None):
+    # NOTE: the numbers are parsed exactly (pd.read_json rounds some of them
+    # in the last digit, e.g., 5.05118 -> 5.0511800000000004)
+    if (types is None) and (columns is None) and \
+       (start is None) and (end is None):
+        df = _load_json_records(dataPathAndName)
+        if applySchema:
+            df = apply_schema(df)
+    else:
+        # only materialize the data types, fields, and times that are needed
+        df = _load_json_filtered(dataPathAndName, types=types,
+                                 applySchema=applySchema, columns=columns,
+                                 start=start, end=end)
+
     return df
 
 
-def load_csv(dataPathAndName):
-    df = pd.read_csv(dataPathAndName, low_memory=False)
+def load_csv(dataPathAndName, applySchema=True, columns=None, types=None,
+             start=None, end=None, chunkSize=100000):
+    # NOTE: pandas infers the compression (if any) from the file extension,
+    # and decompresses the file as it is read
+    columnHeadings = list(pd.read_csv(dataPathAndName, nrows=0))
+    readColumns = _needed_columns(columnHeadings, columns, types, start, end)
+    csvDtypes = None
+    if applySchema:
+        # read the text fields with few unique values in as categories
+        csvDtypes = get_csv_dtypes(readColumns)
+
+    if (types is None) and (start is None) and (end is None):
+        df = pd.read_csv(dataPathAndName, low_memory=False,
+                         usecols=readColumns, dtype=csvDtypes)
+    else:
+        # filter the file a chunk at a time, so that only the rows that
+        # are kept are held in memory
+        startTime, endTime = get_time_bounds(start, end)
+        chunks = [_filter_rows(chunk, types, startTime, endTime)
+                  for chunk in pd.read_csv(dataPathAndName,
+                                           usecols=readColumns,
+                                           dtype=csvDtypes,
+                                           chunksize=chunkSize)]
+        df = pd.concat(chunks, sort=False)
+
+    df = _select_columns(df, columns)
+    if applySchema:
+        df = apply_schema(df)
     return df
 
 
-def load_xlsx(dataPathAndName):
+def load_xlsx(dataPathAndName, applySchema=True, columns=None, types=None,
+              start=None, end=None):
     # load xlsx
-    df = pd.read_excel(dataPathAndName, sheet_name=None, ignore_index=True)
-    cdf = pd.concat(df.values(), ignore_index=True)
+    xlsxFile = pd.ExcelFile(dataPathAndName)
+    sheetNames = xlsxFile.sheet_names
+
+    # exported xlsx files have one sheet per data type, so only read the
+    # sheets of the data types that are needed
+    if types is not None:
+        typeSheets = [s for s in sheetNames if s in set(types)]
+        if len(typeSheets) > 0:
+            sheetNames = typeSheets
+
+    readColumns = None
+    if columns is not None:
+        readColumns = set(_needed_columns(
+            ["jsonRowIndex", "type", "time"] + list(columns),
+            list(columns) + ["jsonRowIndex"], types, start, end))
+
+    df = pd.read_excel(xlsxFile, sheet_name=sheetNames,
+                       usecols=(None if readColumns is None else
+                                (lambda c: c in readColumns)))
+    cdf = pd.concat(df.values(), ignore_index=True, sort=False)
     cdf = cdf.set_index('jsonRowIndex')
+
+    startTime, endTime = get_time_bounds(start, end)
+    if (types is not None) or (startTime is not None) or (endTime is not None):
+        cdf = _filter_rows(cdf, types, startTime, endTime)
+    cdf = _select_columns(cdf, columns)
+
+    if applySchema:
+        cdf = apply_schema(cdf)
     return cdf
 
 
-def load_data(inputFile):
+def load_data(inputFile, useCache=True, columns=None, types=None,
+              start=None, end=None, applySchema=True):
+    # INPUTS:
+    #   * useCache, use (and keep) a columnar copy of the data (see cache.py)
+    #   * applySchema, convert the fields to the dtypes of schema.py. The
+    #     cache only keeps data with the schema applied, so it is not used
+    #     when applySchema is False
+    #   * columns, types, start, and end (all optional) are applied while the
+    #     data is read, so the fields, data types, and times that are not
+    #     needed never become DataFrame rows or columns
+    # compressed files (.gz, .bz2, .xz, .zst) are decompressed as they are
+    # read, e.g., PHI-jill-jellyfish.json.gz or PHI-jill-jellyfish.csv.gz
+    baseFile, compression = split_compression(inputFile)
     if os.path.isfile(inputFile):
-        if os.stat(inputFile).st_size > 2:
-            if inputFile[-4:] == "json":
-                inputData = load_json(inputFile)
-                fileName = os.path.split(inputFile)[-1][:-5]
-            elif inputFile[-4:] == "xlsx":
-                inputData = load_xlsx(inputFile)
-                fileName = os.path.split(inputFile)[-1][:-5]
-            elif inputFile[-3:] == "csv":
-                inputData = load_csv(inputFile)
-                fileName = os.path.split(inputFile)[-1][:-4]
+        if has_data(inputFile, 2):
+            if baseFile[-4:] == "json":
+                loadFunction = load_json
+                fileName = os.path.split(baseFile)[-1][:-5]
+            elif (baseFile[-4:] == "xlsx") and (compression is None):
+                loadFunction = load_xlsx
+                fileName = os.path.split(baseFile)[-1][:-5]
+            elif baseFile[-3:] == "csv":
+                loadFunction = load_csv
+                fileName = os.path.split(baseFile)[-1][:-4]
             else:
                 sys.exit("{0} is not a json, xlsx, or csv".format(inputFile))
         else:
@@ -49,8 +544,112 @@ def load_data(inputFile):
     else:
         sys.exit("{0} does not exist".format(inputFile))
 
+    filters = {"columns": columns, "types": types, "start": start, "end": end}
+    isFiltered = any(v is not None for v in filters.values())
+
+    # use the cached (columnar) copy of the data if there is one, otherwise
+    # parse the file and cache it for the next time it is loaded
+    # NOTE: only complete copies of the data are cached, so the first
+    # filtered load of a file loads (and caches) all of the data and then
+    # filters it, which gives the same data as the filtered cache
+    useCache = useCache and applySchema and cacheSettings["enabled"]
+    inputData = None
+    if useCache:
+        inputData = read_cache(inputFile, **filters)
+    if inputData is None:
+        if useCache:
+            inputData = loadFunction(inputFile, applySchema=applySchema)
+            write_cache(inputFile, inputData)
+            if isFiltered:
+                startTime, endTime = get_time_bounds(start, end)
+                inputData = _select_columns(
+                    _filter_rows(inputData, types, startTime, endTime),
+                    columns)
+        else:
+            inputData = loadFunction(inputFile, applySchema=applySchema,
+                                     **filters)
+
     # if fileName has PHI in it, remove PHI to get userID
     if "PHI" in fileName.upper():
         fileName = fileName[4:]
 
     return inputData, fileName
+
+
+def list_donor_files(dataPath):
+    # the json, xlsx, and csv files (compressed or not) in a folder
+    # (e.g., donorJsonData)
+    donorFiles = []
+    for f in os.listdir(dataPath):
+        baseFile = split_compression(f)[0]
+        if (baseFile[-4:] in ["json", "xlsx"]) or (baseFile[-3:] == "csv"):
+            donorFiles.append(os.path.join(dataPath, f))
+
+    return sorted(donorFiles)
+
+
+def _load_donor_file(inputFile, loadArgs):
+    # worker for load_dataset. NOTE: load_data exits if a file is bad, so
+    # catch that here so one bad file doesn't stop the whole dataset
+    try:
+        data, userID = load_data(inputFile, **loadArgs)
+    except SystemExit as e:
+        return None, None, str(e)
+
+    return userID, data, None
+
+
+def load_dataset(donors, fileSizes=None, nProcesses=None, maxInFlight=None,
+                 **loadArgs):
+    # load many donor files in parallel and yield (userID, DataFrame) pairs
+    # in the order that they finish loading
+    # INPUTS:
+    #   * donors is a folder of donor files, or a list of donor files
+    #   * fileSizes (optional) are the sizes of the donor files (e.g., the
+    #     fileSize that qualify-data records), which are used to load the
+    #     largest files first, so one big donor doesn't hold up the end of a
+    #     run. If not given, the sizes are looked up.
+    #   * nProcesses is the number of processes, defaults to the cpu count
+    #   * maxInFlight caps the number of files that are being loaded or are
+    #     waiting to be used, which bounds the memory. Defaults to
+    #     2 * nProcesses
+    #   * loadArgs are passed to load_data (e.g., types, columns, start, end)
+    if isinstance(donors, str):
+        donorFiles = list_donor_files(donors)
+    else:
+        donorFiles = list(donors)
+
+    if fileSizes is None:
+        fileSizes = [os.stat(f).st_size if os.path.isfile(f) else 0
+                     for f in donorFiles]
+    queue = [f for _, f in sorted(zip(fileSizes, donorFiles),
+                                  key=lambda x: x[0], reverse=True)]
+
+    if nProcesses is None:
+        nProcesses = os.cpu_count()
+    if maxInFlight is None:
+        maxInFlight = 2 * nProcesses
+
+    # fork (where available) so scripts without a __main__ guard (e.g.,
+    # qualify-data) are not re-run by each worker
+    mpContext = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        mpContext = multiprocessing.get_context("fork")
+
+    with ProcessPoolExecutor(max_workers=nProcesses,
+                             mp_context=mpContext) as executor:
+        inFlight = set()
+        queueIndex = 0
+        while (queueIndex < len(queue)) or (len(inFlight) > 0):
+            while (queueIndex < len(queue)) and (len(inFlight) < maxInFlight):
+                inFlight.add(executor.submit(_load_donor_file,
+                                             queue[queueIndex], loadArgs))
+                queueIndex += 1
+
+            done, inFlight = wait(inFlight, return_when=FIRST_COMPLETED)
+            for future in done:
+                userID, data, errorMessage = future.result()
+                if errorMessage is not None:
+                    warnings.warn(errorMessage)
+                    continue
+                yield userID, data
@@ -0,0 +1,967 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: local time estimation for tidals
+created: 2026-10-18
+author: Ed Nykaza
+dependencies:
+    * numba (optional), if it is installed the day loops are compiled
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+import datetime as dt
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .tz import timezone_offsets, local_time_offsets, is_dst_change_day, \
+    tzo_ranges, TimezoneAliases
+from .load import split_compression, has_data, list_donor_files, \
+    load_data
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# NOTE: the day series estimation works on numpy arrays (one per column of
+# the day series), with integer codes for the estimate types, timezones,
+# and time processing, and bit flags for the annotations. The days are in
+# the order of the day series (i.e., the most recent day first), so the
+# "previous day" of day i is day i - 1. The results are the same as the
+# ones of the day by day (reference) implementation, see
+# localtime_reference.py.
+
+# the version of the local time estimation (see est.version)
+estimateVersion = "0.0.3"
+
+# the estimate types (0 is no estimate)
+estimateTypes = [np.nan, "UPLOAD", "DEVICE", "UNCERTAIN", "IMPUTE"]
+_UPLOAD, _DEVICE, _UNCERTAIN, _IMPUTE = 1, 2, 3, 4
+
+# the imputed series that a device tzo is compared to, and the devices
+_imputedSeries = ["pump.upload.imputed", "cgm.upload.imputed",
+                  "healthkit.upload.imputed", "home.imputed"]
+_HOME = 3
+_devices = ["pump", "cgm"]
+
+# the annotations of the days are bit flags (see est.annotationFlags), and
+# these are the messages of the flags, one per bit. The bits are in the order
+# that the estimation adds them (which is the order of the est.annotations
+# messages), so the uncertain device tzos of each device (which the next
+# device can add to) have their own bits, before the others. The gap size of
+# the "gap" flag is kept in est.gapSize.
+_uncertainMessages = ["likely-dst-error-OR-travel", "likely-15-min-dst-error",
+                      "likely-AM-PM-error"]
+annotationMessages = (
+    ["travel"] +
+    _uncertainMessages * len(_devices) +
+    ["dst-change-day"] +
+    ["tz-inferred-from-" + s for s in _imputedSeries] +
+    ["tz-inferred-from-prev-day", "likely-travel"] +
+    ["tzo-from-" + d for d in _devices] +
+    ["pump-cgm-tzo-mismatch", "unable-to-impute-tzo", "gap"])
+
+# the flag(s) of each message, e.g., to find the days that were unable to be
+# imputed: (cDays["est.annotationFlags"] & annotationFlags[
+# "unable-to-impute-tzo"]) > 0
+annotationFlags = {
+    message: sum(1 << bit for bit, m in enumerate(annotationMessages)
+                 if m == message) for message in annotationMessages}
+
+# the flag of each annotation (of the first device, for the uncertain device
+# tzos and "tzo-from-", and of the first imputed series, for "tz-inferred-
+# from-")
+_TRAVEL, _DST_ERROR_OR_TRAVEL, _DST_15_MIN_ERROR, _AM_PM_ERROR, \
+    _DST_CHANGE_DAY, _FROM_SERIES, _FROM_PREV_DAY, _LIKELY_TRAVEL, \
+    _TZO_FROM_DEVICE, _TZO_MISMATCH, _UNABLE, _GAP = [
+        1 << annotationMessages.index(m) for m in
+        ["travel"] + _uncertainMessages +
+        ["dst-change-day", "tz-inferred-from-" + _imputedSeries[0],
+         "tz-inferred-from-prev-day", "likely-travel",
+         "tzo-from-" + _devices[0], "pump-cgm-tzo-mismatch",
+         "unable-to-impute-tzo", "gap"]]
+
+# the uncertain flags of device d are the ones of device 0 << d * this
+_UNCERTAIN_SHIFT = len(_uncertainMessages)
+
+
+def _make_day_loops(jit):
+    # the loops over the days, as plain python functions (jit is the
+    # identity), or compiled with numba (jit is numba.njit)
+
+    @jit
+    def in_tzo_range(tzo, minTzo, maxTzo):
+        # whether tzo is in np.arange(minTzo, maxTzo + 1, 15)
+        if np.isnan(tzo) or np.isnan(minTzo):
+            return False
+        lastTzo = minTzo + np.floor((maxTzo - minTzo) / 15) * 15
+        return (tzo >= minTzo) and (tzo <= lastTzo) and \
+            ((tzo - minTzo) % 15 == 0)
+
+    @jit
+    def is_min_or_max(tzo, minTzo, maxTzo):
+        # whether tzo is the first or last value of the tzo range
+        lastTzo = minTzo + np.floor((maxTzo - minTzo) / 15) * 15
+        return (tzo == minTzo) or (tzo == lastTzo)
+
+    @jit
+    def compare_to_imputed_series(
+            dIndex, deviceTzos, seriesTzos, seriesTzs, seriesTps,
+            isChangeDay, minTzos, maxTzos,
+            estTypes, estTzos, estTzs, estTps, flags):
+        # 2A. compare the device tzo to the imputed series
+        nDays = len(estTzos)
+        isCandidate = np.isnan(estTzos) & ~np.isnan(deviceTzos[dIndex])
+        for i in range(nDays):
+            if not isCandidate[i]:
+                continue
+            for s in range(len(seriesTzos)):
+                if estTzs[i] >= 0:
+                    continue
+                tz = seriesTzs[s, i]
+                isMatch = deviceTzos[dIndex, i] == seriesTzos[s, i]
+                if (not isMatch) and (tz >= 0):
+                    if not isChangeDay[tz, i]:
+                        continue
+                    if not (in_tzo_range(deviceTzos[dIndex, i],
+                                         minTzos[tz, i], maxTzos[tz, i]) and
+                            in_tzo_range(seriesTzos[s, i],
+                                         minTzos[tz, i], maxTzos[tz, i])):
+                        continue
+                elif not isMatch:
+                    continue
+
+                estTypes[i] = _DEVICE
+                estTzos[i] = seriesTzos[s, i]
+                estTzs[i] = tz
+                estTps[i] = seriesTps[s, i]
+                if not isMatch:
+                    flags[i] |= _DST_CHANGE_DAY
+                flags[i] |= _FROM_SERIES << s
+
+    @jit
+    def assign_device_tzo(i, dIndex, deviceTzos, deviceTps,
+                          estTypes, estTzos, estTps, flags):
+        estTypes[i] = _DEVICE
+        estTzos[i] = deviceTzos[dIndex, i]
+        estTps[i] = deviceTps[dIndex, i]
+        flags[i] |= _LIKELY_TRAVEL
+        flags[i] |= _TZO_FROM_DEVICE << dIndex
+
+    @jit
+    def compare_to_previous_day(
+            dIndex, deviceTzos, deviceTps, homeTzos, homeTzs,
+            dayTzos, isChangeDay, minTzos, maxTzos,
+            estTypes, estTzos, estTzs, estTps, flags):
+        # 2B. compare the device tzo to the previous day's estimate (or to
+        # the home tzo, if the previous day does not have an estimate)
+        nDays = len(estTzos)
+        uncertainShift = dIndex * _UNCERTAIN_SHIFT
+        isCandidate = np.isnan(estTzos) & ~np.isnan(deviceTzos[dIndex])
+        for i in range(1, nDays):
+            if not isCandidate[i]:
+                continue
+            deviceTzo = deviceTzos[dIndex, i]
+            if not np.isnan(estTzos[i - 1]):
+                previousTzo = estTzos[i - 1]
+                previousTz = estTzs[i - 1]
+                timeDiff = abs(deviceTzo - previousTzo)
+                if previousTz >= 0:
+                    minTzo = minTzos[previousTz, i]
+                    maxTzo = maxTzos[previousTz, i]
+                    if timeDiff == 0:
+                        isFromPreviousDay = True
+                    elif (in_tzo_range(deviceTzo, minTzo, maxTzo) and
+                          in_tzo_range(previousTzo, minTzo, maxTzo)):
+                        isFromPreviousDay = isChangeDay[previousTz, i]
+                        if isFromPreviousDay:
+                            flags[i] |= _DST_CHANGE_DAY
+                        else:
+                            estTypes[i] = _UNCERTAIN
+                            if is_min_or_max(deviceTzo, minTzo, maxTzo) and \
+                               is_min_or_max(previousTzo, minTzo, maxTzo):
+                                flags[i] |= \
+                                    _DST_ERROR_OR_TRAVEL << uncertainShift
+                            else:
+                                flags[i] |= \
+                                    _DST_15_MIN_ERROR << uncertainShift
+                    elif timeDiff == 720:
+                        isFromPreviousDay = False
+                        estTypes[i] = _UNCERTAIN
+                        flags[i] |= _AM_PM_ERROR << uncertainShift
+                    else:
+                        isFromPreviousDay = False
+                        assign_device_tzo(i, dIndex, deviceTzos, deviceTps,
+                                          estTypes, estTzos, estTps, flags)
+
+                    if isFromPreviousDay:
+                        estTypes[i] = _DEVICE
+                        estTzs[i] = previousTz
+                        estTzos[i] = dayTzos[previousTz, i]
+                        estTps[i] = estTps[i - 1]
+                        flags[i] |= _FROM_PREV_DAY
+
+                elif timeDiff == 0:
+                    assign_device_tzo(i, dIndex, deviceTzos, deviceTps,
+                                      estTypes, estTzos, estTps, flags)
+
+            else:
+                homeTzo = homeTzos[i]
+                homeTz = homeTzs[i]
+                timeDiff = abs(deviceTzo - homeTzo)
+                isInRange = False
+                if homeTz >= 0:
+                    minTzo = minTzos[homeTz, i]
+                    maxTzo = maxTzos[homeTz, i]
+                    isInRange = in_tzo_range(deviceTzo, minTzo, maxTzo) and \
+                        in_tzo_range(homeTzo, minTzo, maxTzo)
+                if isInRange:
+                    if isChangeDay[homeTz, i]:
+                        flags[i] |= _DST_CHANGE_DAY
+                        estTypes[i] = _DEVICE
+                        estTzos[i] = deviceTzo
+                        estTzs[i] = homeTz
+                        estTps[i] = deviceTps[dIndex, i]
+                    else:
+                        estTypes[i] = _UNCERTAIN
+                        if is_min_or_max(deviceTzo, minTzo, maxTzo) and \
+                           is_min_or_max(homeTzo, minTzo, maxTzo):
+                            flags[i] |= \
+                                _DST_ERROR_OR_TRAVEL << uncertainShift
+                        else:
+                            flags[i] |= _DST_15_MIN_ERROR << uncertainShift
+                elif timeDiff == 720:
+                    estTypes[i] = _UNCERTAIN
+                    flags[i] |= _AM_PM_ERROR << uncertainShift
+                else:
+                    assign_device_tzo(i, dIndex, deviceTzos, deviceTps,
+                                      estTypes, estTzos, estTps, flags)
+
+    @jit
+    def impute_gaps(homeTzos, homeTzs, dayTzos,
+                    estTypes, estTzos, estTzs, gapSizes, flags):
+        # 3. impute the days without an estimate from the days before and
+        # after each gap, and the days after the last estimate from the home
+        # series
+        nDays = len(estTzos)
+        lastEstimate = -1
+        lastMissing = -1
+        for i in range(nDays):
+            if np.isnan(estTzos[i]):
+                lastMissing = i
+            else:
+                lastEstimate = i
+
+        if lastEstimate < 0:
+            for i in range(nDays):
+                estTypes[i] = _UNCERTAIN
+                flags[i] = _UNABLE
+            return
+        if lastMissing < 0:
+            return
+
+        # the gaps are imputed one at a time, and the days of a gap are all
+        # either imputed or unable to be imputed, so the first day of the
+        # next gap is after the end of the current one
+        currentDay = 0
+        while True:
+            while (currentDay < nDays) and \
+                    ((not np.isnan(estTzos[currentDay])) or
+                     ((flags[currentDay] & _UNABLE) > 0)):
+                currentDay += 1
+            if (currentDay >= nDays) or (currentDay >= lastEstimate):
+                break
+
+            nextDay = currentDay + 1
+            while np.isnan(estTzos[nextDay]):
+                nextDay += 1
+            previousDay = currentDay - 1
+            gapSize = nextDay - currentDay
+
+            if (previousDay >= 0) and (estTzs[previousDay] >= 0) and \
+                    (estTzs[previousDay] == estTzs[nextDay]):
+                tz = estTzs[previousDay]
+                for i in range(currentDay, nextDay):
+                    estTzs[i] = tz
+                    estTzos[i] = dayTzos[tz, i]
+                    estTypes[i] = _IMPUTE
+                    flags[i] |= _GAP
+                    gapSizes[i] = gapSize
+            elif (previousDay >= 0) and \
+                    (estTzos[previousDay] == estTzos[nextDay]):
+                for i in range(currentDay, nextDay):
+                    estTzos[i] = estTzos[previousDay]
+                    estTypes[i] = _IMPUTE
+                    flags[i] |= _GAP
+                    gapSizes[i] = gapSize
+            else:
+                for i in range(currentDay, nextDay):
+                    estTypes[i] = _UNCERTAIN
+                    flags[i] |= _UNABLE
+            currentDay = nextDay
+
+        # the days after the last estimate, if the last estimate is the home
+        # tzo, then impute using the home timezone
+        if currentDay < nDays:
+            previousDay = currentDay - 1
+            gapSize = lastMissing - currentDay
+            isHome = estTzos[previousDay] == homeTzos[previousDay]
+            for i in range(currentDay, lastMissing + 1):
+                if isHome:
+                    estTypes[i] = _IMPUTE
+                    estTzos[i] = homeTzos[i]
+                    estTzs[i] = homeTzs[i]
+                    flags[i] |= _GAP
+                    gapSizes[i] = gapSize
+                else:
+                    estTypes[i] = _UNCERTAIN
+                    flags[i] |= _UNABLE
+
+    return compare_to_imputed_series, compare_to_previous_day, impute_gaps
+
+
+_dayLoops = {False: _make_day_loops(lambda function: function)}
+
+
+def _get_day_loops(compiled):
+    if compiled is None:
+        compiled = numba is not None
+    if compiled and (numba is None):
+        raise ImportError("numba is needed for the compiled day loops")
+    if compiled not in _dayLoops:
+        _dayLoops[compiled] = _make_day_loops(numba.njit)
+
+    return _dayLoops[compiled]
+
+
+def _codes(df, fields):
+    # integer codes (-1 is missing) of the values of the fields, with the
+    # same code for the same value in all of the fields
+    values = [df[field].values if field in df else
+              np.full(len(df), np.nan, dtype=object) for field in fields]
+    codes, uniqueValues = pd.factorize(
+        np.concatenate(values).astype(object))
+
+    return codes.reshape(len(fields), len(df)).astype(np.int64), \
+        np.asarray(uniqueValues, dtype=object)
+
+
+def _decode(codes, values, dtype=np.float64):
+    # the values of the codes, with nan for missing codes. If all of the
+    # values are missing, the values are an array of dtype (i.e., the dtype
+    # of the column before any values were estimated). Without any codes
+    # (e.g., an empty day series), the values are an (empty) object array
+    if (len(codes) > 0) and (codes < 0).all():
+        return np.full(len(codes), np.nan).astype(dtype)
+    decoded = np.full(len(codes), np.nan, dtype=object)
+    decoded[codes >= 0] = np.asarray(values, dtype=object)[codes[codes >= 0]]
+
+    return decoded
+
+
+def _dtype(df, field):
+    return df[field].dtype if field in df else np.float64
+
+
+def _timezone_tables(timezones, dates):
+    # the (date + 1 day) tzo, whether it is a dst change day, and the range
+    # of tzos of the year, of each day in each timezone
+    shape = (max(len(timezones), 1), len(dates))
+    dayTzos = np.full(shape, np.nan)
+    isChangeDay = np.zeros(shape, dtype=bool)
+    minTzos = np.full(shape, np.nan)
+    maxTzos = np.full(shape, np.nan)
+    for tz, timezoneName in enumerate(timezones):
+        dayTzos[tz] = timezone_offsets(timezoneName, dates)
+        isChangeDay[tz] = is_dst_change_day(timezoneName, dates)
+        minTzos[tz], maxTzos[tz] = tzo_ranges(timezoneName, dates)
+
+    return dayTzos, isChangeDay, minTzos, maxTzos
+
+
+def render_annotations(flags, gapSizes):
+    # the comma separated annotation messages (in the order of their bits) of
+    # each day or record (nan if there are none), made once per unique flags
+    # (and gap size)
+    flags = pd.Series(flags).fillna(0).values.astype(np.int64)
+    gapSizes = np.where((flags & _GAP) > 0, gapSizes, 0).astype(np.int64)
+    codes, uniqueKeys = pd.factorize((flags << 32) | gapSizes)
+
+    uniqueMessages = np.full(len(uniqueKeys), np.nan, dtype=object)
+    for k, key in enumerate(uniqueKeys):
+        keyFlags, gapSize = key >> 32, key & 0xFFFFFFFF
+        messages = [m if m != "gap" else "gap=" + str(gapSize)
+                    for bit, m in enumerate(annotationMessages)
+                    if keyFlags & (1 << bit)]
+        if len(messages) > 0:
+            uniqueMessages[k] = ", ".join(messages)
+
+    return _decode(np.where(flags > 0, codes, -1), uniqueMessages)
+
+
+def with_annotation_messages(df):
+    # the data (or day series) with the est.annotations messages in place of
+    # the est.annotationFlags, as they are written by write_estimates. The
+    # other columns are not copied.
+    if "est.annotationFlags" not in df:
+        return df
+    df = df.copy(deep=False)
+    df["est.annotationFlags"] = render_annotations(
+        df["est.annotationFlags"], df["est.gapSize"])
+    df.columns = ["est.annotations" if c == "est.annotationFlags" else c
+                  for c in df.columns]
+
+    return df
+
+
+def estimate_day_series(cDays, compiled=None):
+    # estimate the timezone offset (and timezone, if possible) of each day of
+    # a day series. The estimate is made with:
+    #   1. the upload records
+    #   2. the device (pump and cgm) tzos, compared to the imputed series and
+    #      to the estimate of the previous day
+    #   3. imputation of the days without an estimate
+    # INPUTS:
+    #   * cDays: the day series (most recent day first, with a 0 to n - 1
+    #     index) with the upload, device, imputed upload, and home columns
+    #   * compiled: whether to compile the day loops with numba. If None,
+    #     they are compiled if numba is installed
+    # OUTPUT: the day series with the est.* columns. The annotations are bit
+    # flags (est.annotationFlags, see annotationFlags and render_annotations)
+    cDays = cDays.copy()
+    nDays = len(cDays)
+    dates = pd.to_datetime(cDays["date"])
+
+    tzFields = [s + ".timezone" for s in _imputedSeries] + ["upload.timezone"]
+    tzCodes, timezones = _codes(cDays, tzFields)
+    tpFields = [s + ".timeProcessing" for s in _imputedSeries] + \
+        ["upload.timeProcessing"]
+    tpCodes, timeProcessings = _codes(cDays, tpFields)
+    dayTzos, isChangeDay, minTzos, maxTzos = \
+        _timezone_tables(timezones, dates)
+
+    seriesTzos = np.vstack([cDays[s + ".timezoneOffset"].values
+                            for s in _imputedSeries]).astype(np.float64)
+    deviceTzos = np.vstack([cDays[d + ".timezoneOffset"].values
+                            for d in _devices]).astype(np.float64)
+    deviceTps = tpCodes[[_imputedSeries.index(d + ".upload.imputed")
+                         for d in _devices]]
+
+    # 1. use upload records to estimate the tz and tzo
+    estTzos = cDays["upload.timezoneOffset"].values.astype(np.float64)
+    estTzs = tzCodes[-1].copy()
+    estTps = tpCodes[-1].copy()
+    estTypes = np.where(estTzs >= 0, _UPLOAD, 0).astype(np.int64)
+    if "upload.timezone" not in cDays:
+        estTypes[:] = 0
+    gapSizes = np.full(nDays, np.nan)
+    isTravel = ~np.isnan(estTzos) & ~(estTzos == seriesTzos[_HOME])
+    flags = np.where(isTravel, _TRAVEL, 0).astype(np.int64)
+
+    # 2. use device tzos to estimate the tzo and tz (if possible)
+    compare_to_imputed_series, compare_to_previous_day, impute_gaps = \
+        _get_day_loops(compiled)
+    for dIndex in range(len(_devices)):
+        compare_to_imputed_series(
+            dIndex, deviceTzos, seriesTzos, tzCodes[:-1], tpCodes[:-1],
+            isChangeDay, minTzos, maxTzos,
+            estTypes, estTzos, estTzs, estTps, flags)
+    for dIndex in range(len(_devices)):
+        compare_to_previous_day(
+            dIndex, deviceTzos, deviceTps, seriesTzos[_HOME], tzCodes[_HOME],
+            dayTzos, isChangeDay, minTzos, maxTzos,
+            estTypes, estTzos, estTzs, estTps, flags)
+
+    # the pump and cgm tzos of a device estimate must be within 60 minutes
+    isMismatch = (estTypes == _DEVICE) & \
+        (np.abs(deviceTzos[1] - deviceTzos[0]) > 60)
+    estTypes[isMismatch] = _UNCERTAIN
+    flags[isMismatch] |= _TZO_MISMATCH
+
+    # 3. impute, infer, or interpolate gaps in the estimated tzo and tz
+    impute_gaps(seriesTzos[_HOME], tzCodes[_HOME], dayTzos,
+                estTypes, estTzos, estTzs, gapSizes, flags)
+
+    cDays["est.type"] = _decode(estTypes - 1, estimateTypes[1:])
+    cDays["est.gapSize"] = gapSizes
+    cDays["est.timezoneOffset"] = estTzos
+    cDays["est.annotationFlags"] = flags
+    cDays["est.timezone"] = _decode(
+        estTzs, timezones, _dtype(cDays, "upload.timezone"))
+    cDays["est.timeProcessing"] = _decode(
+        estTps, timeProcessings, _dtype(cDays, "upload.timeProcessing"))
+
+    return cDays
+
+
+def _day_keys(dates):
+    # the (int64) number of days since 1970-01-01 of each date (e.g., of a
+    # column of datetime.date), converting each unique date once
+    codes, uniqueDates = pd.factorize(np.asarray(dates))
+    uniqueKeys = pd.to_datetime(uniqueDates).values.astype("datetime64[D]") \
+        .astype(np.int64)
+
+    return np.where(codes >= 0, uniqueKeys[codes], np.iinfo(np.int64).min)
+
+
+def correct_estimates_around_dst(data, cDays):
+    # the local time (and tzo) of the records within a day of a dst change
+    # (of the home timezone), from the utc time of each record and the
+    # estimated timezone of its day, rather than from the tzo of its day
+    # INPUTS:
+    #   * data: the records, with the utcTime, date, and est.* columns
+    #   * cDays: the day series, with the home.imputed.timezoneOffset
+    # OUTPUT: the data, with the corrected est.localTime and
+    # est.timezoneOffset
+    homeTzos = cDays["home.imputed.timezoneOffset"]
+    changeDays = _day_keys(
+        cDays.loc[abs(homeTzos - homeTzos.shift(-1)) > 0, "date"])
+    dayKeys = _day_keys(data["date"])
+    isNearChange = np.isin(dayKeys, changeDays) | \
+        np.isin(dayKeys - 1, changeDays) | np.isin(dayKeys + 1, changeDays)
+    isCorrected = isNearChange & data["est.timezone"].notnull().values
+    if not isCorrected.any():
+        return data
+
+    # the tzo at the utc time plus the smallest tzo of the timezone (i.e.,
+    # the earliest the local time can be), with the records grouped by
+    # timezone (see tz.local_time_offsets)
+    timezones = data.loc[isCorrected, "est.timezone"].values
+    minTzos, _ = tzo_ranges(timezones, data.loc[isCorrected, "date"])
+    utcTimes = data.loc[isCorrected, "utcTime"]
+    tzos = local_time_offsets(
+        timezones, utcTimes + pd.to_timedelta(minTzos, unit="m").values)
+
+    data.loc[isCorrected, "est.localTime"] = \
+        utcTimes + pd.to_timedelta(tzos, unit="m").values
+    data.loc[isCorrected, "est.timezoneOffset"] = tzos
+
+    return data
+
+
+def apply_local_time_estimates(data, cDays):
+    # add the day series estimates to each record (joined on integer day
+    # keys), and the local time of each record
+    # INPUTS:
+    #   * data: the records, with the utcTime and date columns
+    #   * cDays: the day series, with the est.* columns
+    # OUTPUT: the data with the day series columns and est.localTime
+    dayKey = "est.dayKey"
+    data = data.assign(**{dayKey: _day_keys(data["date"])})
+    estimates = cDays.drop(columns="date")
+    estimates[dayKey] = _day_keys(cDays["date"])
+    data = pd.merge(data, estimates, how="left", on=dayKey).drop(
+        columns=dayKey)
+    data["est.localTime"] = \
+        data["utcTime"] + pd.to_timedelta(data["est.timezoneOffset"], unit="m")
+
+    data = correct_estimates_around_dst(data, cDays)
+
+    return data
+
+
+def filter_by_dates(df, startDate, endDate):
+    # filter by qualified start & end date
+    df = df[(df.time >= startDate) & (df.time <= (endDate + "T23:59:59"))]
+
+    return df
+
+
+def convert_deprecated_timezones(df, timezoneAliases):
+    # replace the deprecated timezones (e.g., "US/Central") with their alias
+    # INPUTS:
+    #   * timezoneAliases: a TimezoneAliases, or a table of aliases (with tz
+    #     and alias columns)
+    if "timezone" in df:
+        if not isinstance(timezoneAliases, TimezoneAliases):
+            timezoneAliases = TimezoneAliases(timezoneAliases)
+        df["timezone"] = timezoneAliases.resolve(df["timezone"])
+
+    return df
+
+
+def large_timezone_offset_correction(df):
+    # bring the tzos (of the bootstrapping to utc) back into -720 to 840
+    # minutes, moving the difference into the conversion offset
+    while ((df.timezoneOffset > 840).sum() > 0):
+        df.loc[df.timezoneOffset > 840, ["conversionOffset"]] = \
+            df.loc[df.timezoneOffset > 840, ["conversionOffset"]] - \
+            (1440 * 60 * 1000)
+
+        df.loc[df.timezoneOffset > 840, ["timezoneOffset"]] = \
+            df.loc[df.timezoneOffset > 840, ["timezoneOffset"]] - 1440
+
+    while ((df.timezoneOffset < -720).sum() > 0):
+        df.loc[df.timezoneOffset < -720, ["conversionOffset"]] = \
+            df.loc[df.timezoneOffset < -720, ["conversionOffset"]] + \
+            (1440 * 60 * 1000)
+
+        df.loc[df.timezoneOffset < -720, ["timezoneOffset"]] = \
+            df.loc[df.timezoneOffset < -720, ["timezoneOffset"]] + 1440
+
+    return df
+
+
+def _contiguous_days(df):
+    # all of the days from the first to the last date, most recent first
+    days = pd.date_range(df.date.min(), df.date.max()).date
+    contiguousDays = pd.DataFrame(days, columns=["date"]).sort_values(
+        "date", ascending=False).reset_index(drop=True)
+
+    return contiguousDays
+
+
+def _upload_records(df):
+    # the upload records, with a device type (pump, cgm, or healthkit)
+    # NOTE: the deviceTags of df are converted to strings
+    df["deviceTags"] = df.deviceTags.astype(str)
+    ud = df[df.type == "upload"].copy()
+    ud["deviceType"] = pd.Series(np.nan, index=ud.index, dtype=object)
+    ud.loc[ud.deviceTags.str.contains("pump"), ["deviceType"]] = "pump"
+
+    # this is for non-healthkit cgm records only
+    ud.loc[((ud.deviceTags.str.contains("cgm")) &
+            (ud.timeProcessing != "none")), ["deviceType"]] = "cgm"
+
+    ud.loc[((ud.deviceTags.str.contains("cgm")) &
+            (ud.timeProcessing == "none")), ["deviceType"]] = "healthkit"
+
+    return ud
+
+
+def _cgm_records(df):
+    # non-healthkit cgm records, excluding the dexcom-api data
+    if "payload" in df:
+        df["isDexcomAPI"] = df.payload.astype(str).str.contains("systemTime")
+        cd = df[(df.type == "cbg") &
+                (df.timezoneOffset.notnull()) &
+                (~df.isDexcomAPI.fillna(False))].copy()
+
+    else:
+        cd = df[(df.type == "cbg") & (df.timezoneOffset.notnull())]
+
+    return cd
+
+
+def add_device_day_series(df, cDays, deviceTypeName):
+    # the median tzo of each day (and for uploads, the most frequent timezone
+    # and time processing) of a device, as deviceTypeName.* columns
+    if len(df) > 0:
+        dfDayGroups = df.groupby("date")
+        dfDaySeries = pd.DataFrame(dfDayGroups.timezoneOffset.median())
+        if "upload" in deviceTypeName:
+            if "timezone" in df:
+                if dfDayGroups.timezone.count().values[0] > 0:
+                    dfDaySeries["timezone"] = \
+                        dfDayGroups.timezone.describe()["top"]
+                    # get the timezone offset for the timezone
+                    hasTz = dfDaySeries["timezone"].notnull()
+                    dfDaySeries.loc[hasTz, "timezoneOffset"] = \
+                        timezone_offsets(
+                            dfDaySeries.loc[hasTz, "timezone"].values,
+                            dfDaySeries.index[hasTz])
+
+                    dfDaySeries["timeProcessing"] = \
+                        dfDayGroups.timeProcessing.describe()["top"]
+
+        dfDaySeries = dfDaySeries.add_prefix(deviceTypeName + "."). \
+            rename(columns={deviceTypeName + ".date": "date"})
+
+        cDays = pd.merge(cDays, dfDaySeries.reset_index(),
+                         on="date", how="left")
+
+    else:
+        cDays[deviceTypeName + ".timezoneOffset"] = np.nan
+
+    return cDays
+
+
+def impute_upload_records(df, cDays, deviceTypeName):
+    # the upload day series of a device, with the timezone (and time
+    # processing) carried forward to the days without an upload
+    daySeries = add_device_day_series(df, cDays, deviceTypeName)
+
+    if ((len(df) > 0) & (deviceTypeName + ".timezone" in daySeries)):
+        # carry the timezone forward to the days without one, and get the
+        # timezone offset of every day that has a timezone
+        daySeries[deviceTypeName + ".timezone"] = \
+            daySeries[deviceTypeName + ".timezone"].ffill()
+        hasTz = daySeries[deviceTypeName + ".timezone"].notnull()
+        daySeries.loc[hasTz, deviceTypeName + ".timezoneOffset"] = \
+            timezone_offsets(
+                daySeries.loc[hasTz, deviceTypeName + ".timezone"].values,
+                daySeries.loc[hasTz, "date"])
+
+        # the first time processing (of the most recent day) is carried to
+        # all of the days after it
+        timeProcessing = daySeries[deviceTypeName + ".timeProcessing"]
+        firstIndex = timeProcessing.first_valid_index()
+        if firstIndex is not None:
+            daySeries.loc[daySeries.index > firstIndex,
+                          deviceTypeName + ".timeProcessing"] = \
+                timeProcessing[firstIndex]
+
+    else:
+        daySeries[deviceTypeName + ".timezone"] = np.nan
+        daySeries[deviceTypeName + ".timeProcessing"] = np.nan
+
+    return daySeries
+
+
+def add_home_timezone(df, cDays):
+    # the most frequent timezone of the data, with its tzo on each day (to
+    # account for daylight savings time changes). Data without any timezone
+    # (e.g., all null) does not have a home timezone.
+    if ("timezone" in df) and df["timezone"].notnull().any():
+        homeTimezone = df["timezone"].describe()["top"]
+        tzo = timezone_offsets(homeTimezone, cDays.date)
+
+        cDays["home.imputed.timezoneOffset"] = tzo
+        cDays["home.imputed.timezone"] = homeTimezone
+
+    else:
+        cDays["home.imputed.timezoneOffset"] = np.nan
+        cDays["home.imputed.timezone"] = np.nan
+    cDays["home.imputed.timeProcessing"] = np.nan
+
+    return cDays
+
+
+daySeriesColumns = [
+    "pump.upload.imputed.timezoneOffset",
+    "pump.upload.imputed.timezone",
+    "pump.upload.imputed.timeProcessing",
+    "cgm.upload.imputed.timezoneOffset",
+    "cgm.upload.imputed.timezone",
+    "cgm.upload.imputed.timeProcessing",
+    "healthkit.upload.imputed.timezoneOffset",
+    "healthkit.upload.imputed.timezone",
+    "healthkit.upload.imputed.timeProcessing",
+    "home.imputed.timezoneOffset",
+    "home.imputed.timezone",
+    "home.imputed.timeProcessing",
+    "upload.timezoneOffset",
+    "upload.timezone",
+    "upload.timeProcessing",
+    "cgm.timezoneOffset",
+    "pump.timezoneOffset",
+    "date",
+    "est.type",
+    "est.timezoneOffset",
+    "est.timezone",
+    "est.timeProcessing",
+    "est.annotationFlags",
+    "est.gapSize",
+    "est.version"]
+
+
+def make_day_series(data):
+    # the day series (most recent day first) of the upload, cgm, and pump
+    # tzos, the imputed upload series of each device type, and the home
+    # timezone, that the estimates are made from
+    # NOTE: data needs the utcTime and date columns
+    cDays = _contiguous_days(data)
+
+    # create day series for pump, and non-healthkit cgm upload records
+    uploadData = _upload_records(data)
+    cDays = add_device_day_series(uploadData, cDays, "upload")
+
+    # create day series for cgm data
+    cDays = add_device_day_series(_cgm_records(data), cDays, "cgm")
+
+    # create day series for pump data
+    pumpData = data[(data.type == "bolus") & (data.timezoneOffset.notnull())]
+    cDays = add_device_day_series(pumpData, cDays, "pump")
+
+    # interpolate between upload records of the same deviceType, and create a
+    # day series for interpolated pump, non-hk-cgm, and healthkit uploads
+    for deviceType in ["pump", "cgm", "healthkit"]:
+        deviceUploadData = uploadData[uploadData.deviceType == deviceType]
+        cDays = impute_upload_records(deviceUploadData, cDays,
+                                      deviceType + ".upload.imputed")
+
+    # add a home timezone that also accounts for daylight savings time changes
+    cDays = add_home_timezone(data, cDays)
+
+    return cDays
+
+
+def _utc_times(times):
+    # the (tz-aware) utc time of each time, where the times can have different
+    # formats (e.g., "2018-01-31T18:31:14.000Z" and
+    # "2018-01-31T10:31:14-08:00")
+    try:
+        utcTimes = pd.to_datetime(times, utc=True)
+    except ValueError:
+        # newer versions of pandas infer one format from the first time
+        utcTimes = pd.to_datetime(times, utc=True, format="mixed")
+
+    return utcTimes
+
+
+def estimate(df, timezoneAliases, startDate="2010-01-01", endDate=None,
+             compiled=None):
+    # estimate the local time of each record of a (single donor) dataset
+    # INPUTS:
+    #   * df: the data (e.g., of load_data), it is not changed
+    #   * timezoneAliases: the deprecated timezone aliases, a TimezoneAliases
+    #     (see read_timezone_aliases) or a table with tz and alias columns,
+    #     e.g., wikipedia-timezone-aliases-2018-04-28.csv
+    #   * startDate, endDate: only the data from startDate to endDate (by
+    #     default, today) is kept
+    #   * compiled: see estimate_day_series
+    # OUTPUT: the data (with the day series and est.localTime columns), and
+    # the day series
+    if endDate is None:
+        endDate = dt.datetime.now().strftime("%Y-%m-%d")
+
+    # filter, clean, and correct the data
+    data = df[df.time.notnull()]
+    data = filter_by_dates(data, startDate, endDate).copy()
+    data = convert_deprecated_timezones(data, timezoneAliases)
+    # apply the large timezone offset correction (AKA Darin's fix)
+    data = large_timezone_offset_correction(data)
+
+    data["utcTime"] = _utc_times(data.time)
+    data["date"] = data["utcTime"].dt.date
+    cDays = make_day_series(data)
+
+    # estimate the tzo (and tz) of each day, and apply them to all of the data
+    cDays = estimate_day_series(cDays, compiled=compiled)
+    cDays["est.version"] = estimateVersion
+    cDays = cDays.reindex(columns=daySeriesColumns)
+    data = apply_local_time_estimates(data, cDays)
+
+    return data, cDays
+
+
+def read_data_file(inputFile, minSize=1000):
+    # the data of a (donor) json, xlsx, or csv file (compressed or not), as
+    # it is read by estimate-local-time (i.e., load_data without the schema
+    # or the cache), and the file name (without the extensions, and with
+    # PHI- kept). Bad files, and files with less than minSize bytes of data,
+    # raise a ValueError
+    if os.path.isfile(inputFile) and not has_data(inputFile, minSize):
+        raise ValueError("{0} contains too little data".format(inputFile))
+    try:
+        inputData, _ = load_data(inputFile, useCache=False, applySchema=False)
+    except SystemExit as e:
+        raise ValueError(str(e))
+    baseFile = split_compression(inputFile)[0]
+    fileName = os.path.splitext(os.path.split(baseFile)[-1])[0]
+
+    return inputData, fileName
+
+
+def write_estimates(data, cDays, fileName, outputPath,
+                    daySeriesOutputPath=None):
+    # write the data (as <fileName>.csv) and the day series (as
+    # <fileName without PHI->-daySeries.csv), with the est.annotations
+    # messages of the annotation flags
+    data = with_annotation_messages(data)
+    cDays = with_annotation_messages(cDays)
+    data.to_csv(os.path.join(outputPath, fileName + ".csv"))
+
+    if daySeriesOutputPath is not None:
+        daySeriesFileName = fileName
+        if "PHI" in fileName:
+            daySeriesFileName = fileName[4:]
+        cDays.to_csv(os.path.join(daySeriesOutputPath,
+                                  daySeriesFileName + "-daySeries.csv"))
+
+
+# the timezone aliases of each worker process of estimate_dataset, which
+# (along with the timezone tables) are kept from one donor to the next
+_workerTimezoneAliases = None
+
+
+def _init_worker(timezoneAliases):
+    global _workerTimezoneAliases
+    _workerTimezoneAliases = timezoneAliases
+
+
+def _estimate_donor_file(inputFile, outputPath, daySeriesOutputPath,
+                         estimateArgs):
+    # worker for estimate_dataset. NOTE: any error is caught (and returned),
+    # so one bad donor doesn't stop the whole dataset
+    startTime = time.time()
+    result = {"inputFile": inputFile, "fileName": np.nan, "status": "ok",
+              "nRecords": np.nan, "nDays": np.nan, "error": np.nan}
+    try:
+        df, result["fileName"] = read_data_file(inputFile)
+        data, cDays = estimate(df, _workerTimezoneAliases, **estimateArgs)
+        write_estimates(data, cDays, result["fileName"], outputPath,
+                        daySeriesOutputPath)
+        result["nRecords"], result["nDays"] = len(data), len(cDays)
+    except (Exception, SystemExit) as e:
+        result["status"] = "failed"
+        result["error"] = "{0}: {1}".format(type(e).__name__, e)
+    result["seconds"] = round(time.time() - startTime, 3)
+
+    return result
+
+
+def estimate_dataset(donors, timezoneAliases, outputPath,
+                     daySeriesOutputPath=None, fileSizes=None, nProcesses=None,
+                     verbose=False, **estimateArgs):
+    # estimate the local time of many donor files in parallel, and write the
+    # data and day series of each donor as soon as it is done
+    # INPUTS:
+    #   * donors is a folder of donor files (e.g., donorJsonData), or a list
+    #     of donor files
+    #   * timezoneAliases: see estimate, it is made into a TimezoneAliases
+    #     (once) and sent to each worker once
+    #   * outputPath, daySeriesOutputPath: see write_estimates
+    #   * fileSizes (optional) are the sizes of the donor files, which are
+    #     used to estimate the largest files first, so one big donor doesn't
+    #     hold up the end of a run. If not given, the sizes are looked up.
+    #   * nProcesses is the number of processes, defaults to the cpu count
+    #   * verbose prints the result of each donor as it is done
+    #   * estimateArgs are passed to estimate (e.g., startDate, endDate)
+    # OUTPUT: a manifest with the status (ok or failed), number of records
+    # and days, time (in seconds), and error of each donor file, in the order
+    # that they were done
+    if not isinstance(timezoneAliases, TimezoneAliases):
+        timezoneAliases = TimezoneAliases(timezoneAliases)
+
+    if isinstance(donors, str):
+        donorFiles = list_donor_files(donors)
+    else:
+        donorFiles = list(donors)
+
+    if fileSizes is None:
+        fileSizes = [os.stat(f).st_size if os.path.isfile(f) else 0
+                     for f in donorFiles]
+    queue = [f for _, f in sorted(zip(fileSizes, donorFiles),
+                                  key=lambda x: x[0], reverse=True)]
+
+    if nProcesses is None:
+        nProcesses = os.cpu_count()
+
+    # fork (where available) so scripts without a __main__ guard (e.g.,
+    # estimate-local-time) are not re-run by each worker
+    mpContext = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        mpContext = multiprocessing.get_context("fork")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=nProcesses, mp_context=mpContext,
+                             initializer=_init_worker,
+                             initargs=(timezoneAliases,)) as executor:
+        futures = [executor.submit(_estimate_donor_file, inputFile,
+                                   outputPath, daySeriesOutputPath,
+                                   estimateArgs) for inputFile in queue]
+        for future in as_completed(futures):
+            results.append(future.result())
+            if verbose:
+                print("{0} of {1}: {2} {3} ({4} s)".format(
+                    len(results), len(queue), results[-1]["status"],
+                    results[-1]["inputFile"], results[-1]["seconds"]))
+
+    manifest = pd.DataFrame(results, columns=[
+        "inputFile", "fileName", "status", "nRecords", "nDays", "seconds",
+        "error"])
+
+    return manifest
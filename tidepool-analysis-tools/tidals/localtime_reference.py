@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: the reference (day by day) implementation of the local time
+    estimation of the day series, of its application to each record, and of
+    the deprecated timezone conversion (see localtime.estimate_day_series,
+    localtime.apply_local_time_estimates, and tz.TimezoneAliases)
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import timedelta
+from .tz import timezone_offsets, local_time_offsets, is_dst_change_day, \
+    tzo_ranges
+
+# NOTE: these are the functions of estimate-local-time.py (version 0.0.3),
+# as they were before the day series estimation was rewritten over arrays.
+# They are kept (as is) so the rewrite can be checked against them.
+
+
+def convertDeprecatedTimezoneToAlias(df, tzAlias):
+    if "timezone" in df:
+        uniqueTimezones = df.timezone.unique()
+        uniqueTimezones = uniqueTimezones[pd.notnull(df.timezone.unique())]
+
+        for uniqueTimezone in uniqueTimezones:
+            alias = tzAlias.loc[tzAlias.tz.str.endswith(uniqueTimezone),
+                                ["alias"]].values
+            if len(alias) == 1:
+                df.loc[df.timezone == uniqueTimezone, ["timezone"]] = alias
+
+    return df
+
+
+def getTimezoneOffset(currentDate, currentTimezone):
+    # the offset of the start of the next day, to account for changes to/from
+    # DST (see tz.timezone_offsets for whole arrays of dates)
+    tzo = int(timezone_offsets(currentTimezone, [currentDate])[0])
+
+    return tzo
+
+
+def getTzoForDateTime(currentDateTime, currentTimezone):
+    tzo = int(local_time_offsets(currentTimezone,
+                                 [pd.to_datetime(currentDateTime)])[0])
+
+    return tzo
+
+
+def isDSTChangeDay(currentDate, currentTimezone):
+    # whether the tzo of the current day is not the tzo of the previous day
+    # (see tz.is_dst_change_day for whole arrays of dates)
+    isChangeDay = bool(is_dst_change_day(currentTimezone,
+                                         [pd.to_datetime(currentDate)])[0])
+
+    return isChangeDay
+
+
+def addAnnotation(df, idx, annotationMessage):
+    if pd.notnull(df.loc[idx, "est.annotations"]):
+        df.loc[idx, ["est.annotations"]] = df.loc[idx, "est.annotations"] + \
+            ", " + annotationMessage
+    else:
+        df.loc[idx, ["est.annotations"]] = annotationMessage
+
+    return df
+
+
+def estimateTzAndTzoWithUploadRecords(cDF):
+
+    # the text fields are object columns, so they can be filled with text
+    cDF["est.type"] = pd.Series(np.nan, index=cDF.index, dtype=object)
+    cDF["est.gapSize"] = np.nan
+    cDF["est.timezoneOffset"] = cDF["upload.timezoneOffset"]
+    cDF["est.annotations"] = pd.Series(np.nan, index=cDF.index, dtype=object)
+
+    if "upload.timezone" in cDF:
+        cDF.loc[cDF["upload.timezone"].notnull(), ["est.type"]] = "UPLOAD"
+        cDF["est.timezone"] = cDF["upload.timezone"]
+        cDF["est.timeProcessing"] = cDF["upload.timeProcessing"]
+    else:
+        cDF["est.timezone"] = pd.Series(np.nan, index=cDF.index,
+                                        dtype=object)
+        cDF["est.timeProcessing"] = pd.Series(np.nan, index=cDF.index,
+                                              dtype=object)
+
+    cDF.loc[((cDF["est.timezoneOffset"] !=
+              cDF["home.imputed.timezoneOffset"]) &
+            (pd.notnull(cDF["est.timezoneOffset"]))),
+            "est.annotations"] = "travel"
+
+    return cDF
+
+
+def estimateTzAndTzoWithDeviceRecords(cDF):
+
+    # 2A. use the TZO of the pump or cgm device if it exists on a given day. In
+    # addition, compare the TZO to one of the imputed day series (i.e., the
+    # upload and home series to see if the TZ can be inferred)
+    for deviceType in ["pump", "cgm"]:
+        # find the indices of days where a TZO estimate has not been made AND
+        # where the device (e.g., pump or cgm) TZO has data
+        sIndices = cDF[((cDF["est.timezoneOffset"].isnull()) &
+                        (cDF[deviceType + ".timezoneOffset"].notnull()))].index
+        # compare the device TZO to the imputed series to infer time zone
+        cDF = compareDeviceTzoToImputedSeries(cDF, sIndices, deviceType)
+
+    # 2B. if the TZ cannot be inferred with 2A, then see if the TZ can be
+    # inferred from the previous day's TZO. If the device TZO is equal to the
+    # previous day's TZO, AND if the previous day has a TZ estimate, use the
+    # previous day's TZ estimate for the current day's TZ estimate
+    for deviceType in ["pump", "cgm"]:
+        sIndices = cDF[((cDF["est.timezoneOffset"].isnull()) &
+                        (cDF[deviceType + ".timezoneOffset"].notnull()))].index
+
+        cDF = compareDeviceTzoToPrevDayTzo(cDF, sIndices, deviceType)
+
+    # 2C. after 2A and 2B, check the DEVICE estimates to make sure that the
+    # pump and cgm tzo do not differ by more than 60 minutes. If they differ
+    # by more that 60 minutes, then mark the estimate as UNCERTAIN. Also, we
+    # allow the estimates to be off by 60 minutes as there are a lot of cases
+    # where the devices are off because the user changes the time for DST,
+    # at different times
+    sIndices = cDF[((cDF["est.type"] == "DEVICE") &
+                    (cDF["pump.timezoneOffset"].notnull()) &
+                    (cDF["cgm.timezoneOffset"].notnull()) &
+                    (cDF["pump.timezoneOffset"] != cDF["cgm.timezoneOffset"])
+                    )].index
+
+    tzoDiffGT60 = abs(cDF.loc[sIndices, "cgm.timezoneOffset"] -
+                      cDF.loc[sIndices, "pump.timezoneOffset"]) > 60
+
+    idx = tzoDiffGT60.index[tzoDiffGT60]
+
+    cDF.loc[idx, ["est.type"]] = "UNCERTAIN"
+    for i in idx:
+        cDF = addAnnotation(cDF, i, "pump-cgm-tzo-mismatch")
+
+    return cDF
+
+
+def getRangeOfTZOsForTimezone(tz, currentDate):
+    # the range of tzos (in 15 minute steps) of the timezone, in the year of
+    # the current date (see tz.tzo_ranges for whole arrays of dates)
+    minTzo, maxTzo = tzo_ranges(tz, [pd.to_datetime(currentDate)])
+
+    rangeOfTzo = np.arange(int(minTzo[0]), int(maxTzo[0])+1, 15)
+
+    return rangeOfTzo
+
+
+def tzoRangeWithComparisonTz(df, i, comparisonTz):
+    # if we have a previous timezone estimate, then calcuate the range of
+    # timezone offset values for that time zone
+    if pd.notnull(comparisonTz):
+        rangeTzos = getRangeOfTZOsForTimezone(comparisonTz, df.loc[i, "date"])
+    else:
+        comparisonTz = np.nan
+        rangeTzos = np.array([])
+
+    return rangeTzos
+
+
+def tzAndTzoRangePreviousDay(df, i):
+    # if we have a previous timezone estimate, then calcuate the range of
+    # timezone offset values for that time zone
+    comparisonTz = df.loc[i-1, "est.timezone"]
+
+    rangeTzos = tzoRangeWithComparisonTz(df, i, comparisonTz)
+
+    return comparisonTz, rangeTzos
+
+
+def tzAndTzoRangeWithHomeTz(df, i):
+    # if we have a previous timezone estimate, then calcuate the range of
+    # timezone offset values for that time zone
+    comparisonTz = df.loc[i, "home.imputed.timezone"]
+
+    rangeTzos = tzoRangeWithComparisonTz(df, i, comparisonTz)
+
+    return comparisonTz, rangeTzos
+
+
+def assignTzoFromImputedSeries(df, i, imputedSeries):
+    df.loc[i, ["est.type"]] = "DEVICE"
+
+    df.loc[i, ["est.timezoneOffset"]] = \
+        df.loc[i, imputedSeries + ".timezoneOffset"]
+
+    df.loc[i, ["est.timezone"]] = \
+        df.loc[i, imputedSeries + ".timezone"]
+
+    df.loc[i, ["est.timeProcessing"]] = \
+        df.loc[i, imputedSeries + ".timeProcessing"]
+
+    return df
+
+
+def compareDeviceTzoToImputedSeries(df, sIdx, device):
+    imputedSeriesList = ["pump.upload.imputed", "cgm.upload.imputed",
+                         "healthkit.upload.imputed", "home.imputed"]
+
+    # get the dst change days and the range of tzos of the imputed timezones
+    # for all of the days at once
+    isDstChangeDay, minTzo, maxTzo = {}, {}, {}
+    for imputedSeries in imputedSeriesList:
+        imputedTimezones = df[imputedSeries + ".timezone"].values
+        isDstChangeDay[imputedSeries] = \
+            is_dst_change_day(imputedTimezones, df["date"])
+        minTzo[imputedSeries], maxTzo[imputedSeries] = \
+            tzo_ranges(imputedTimezones, df["date"])
+
+    for i in sIdx:
+        # if the device tzo = imputed tzo, then chose the imputed tz and tzo
+        # note, dst is accounted for in the imputed tzo
+        for imputedSeries in imputedSeriesList:
+            # if the estimate has not already been made
+            if pd.isnull(df.loc[i, "est.timezone"]):
+
+                if df.loc[i, device + ".timezoneOffset"] == \
+                  df.loc[i, imputedSeries + ".timezoneOffset"]:
+
+                    assignTzoFromImputedSeries(df, i, imputedSeries)
+
+                    df = addAnnotation(df, i,
+                                       "tz-inferred-from-" + imputedSeries)
+
+                # if the imputed series has a timezone estimate, then see if
+                # the current day is a dst change day
+                elif (pd.notnull(df.loc[i, imputedSeries + ".timezone"])):
+                    if isDstChangeDay[imputedSeries][i]:
+
+                        dstRange = np.arange(
+                            int(minTzo[imputedSeries][i]),
+                            int(maxTzo[imputedSeries][i])+1, 15)
+                        if ((df.loc[i, device + ".timezoneOffset"] in dstRange)
+                          & (df.loc[i, imputedSeries + ".timezoneOffset"] in dstRange)):
+
+                            assignTzoFromImputedSeries(df, i, imputedSeries)
+
+                            df = addAnnotation(df, i, "dst-change-day")
+                            df = addAnnotation(
+                                    df, i, "tz-inferred-from-" + imputedSeries)
+
+    return df
+
+
+def assignTzoFromPreviousDay(df, i, previousDayTz):
+
+    df.loc[i, ["est.type"]] = "DEVICE"
+    df.loc[i, ["est.timezone"]] = previousDayTz
+    df.loc[i, ["est.timezoneOffset"]] = \
+        getTimezoneOffset(pd.to_datetime(df.loc[i, "date"]), previousDayTz)
+
+    df.loc[i, ["est.timeProcessing"]] = df.loc[i-1, "est.timeProcessing"]
+    df = addAnnotation(df, i, "tz-inferred-from-prev-day")
+
+    return df
+
+
+def assignTzoFromDeviceTzo(df, i, device):
+
+    df.loc[i, ["est.type"]] = "DEVICE"
+    df.loc[i, ["est.timezoneOffset"]] = \
+        df.loc[i, device + ".timezoneOffset"]
+    df.loc[i, ["est.timeProcessing"]] = \
+        df.loc[i, device + ".upload.imputed.timeProcessing"]
+
+    df = addAnnotation(df, i, "likely-travel")
+    df = addAnnotation(df, i, "tzo-from-" + device)
+
+    return df
+
+
+def compareDeviceTzoToPrevDayTzo(df, sIdx, device):
+
+    # get the dst change days of the home timezone for all of the days at once
+    isHomeDstChangeDay = is_dst_change_day(
+        df["home.imputed.timezone"].values, df["date"])
+
+    for i in sIdx[sIdx > 0]:
+
+        # first see if the previous record has a tzo
+        if (pd.notnull(df.loc[i-1, "est.timezoneOffset"])):
+
+            previousDayTz, dstRange = tzAndTzoRangePreviousDay(df, i)
+            timeDiff = abs((df.loc[i, device + ".timezoneOffset"]) -
+                           df.loc[i-1, "est.timezoneOffset"])
+
+            # next see if the previous record has a tz
+            if (pd.notnull(df.loc[i-1, "est.timezone"])):
+
+                if timeDiff == 0:
+                    assignTzoFromPreviousDay(df, i, previousDayTz)
+
+                # see if the previous day's tzo and device tzo are within the
+                # dst range (as that is a common problem with this data)
+                elif ((df.loc[i, device + ".timezoneOffset"] in dstRange)
+                      & (df.loc[i-1, "est.timezoneOffset"] in dstRange)):
+
+                    # then see if it is DST change day
+                    if isDSTChangeDay(df.loc[i, "date"], previousDayTz):
+
+                        df = addAnnotation(df, i, "dst-change-day")
+                        assignTzoFromPreviousDay(df, i, previousDayTz)
+
+                    # if it is not DST change day, then mark this as uncertain
+                    else:
+                        # also, check to see if the difference between device.
+                        # tzo and prev.tzo is less than the expected dst
+                        # difference. There is a known issue where the BtUTC
+                        # procedure puts clock drift into the device.tzo,
+                        # and as a result the tzo can be off by 15, 30,
+                        # or 45 minutes.
+                        if (((df.loc[i, device + ".timezoneOffset"] ==
+                              min(dstRange)) |
+                            (df.loc[i, device + ".timezoneOffset"] ==
+                             max(dstRange))) &
+                           ((df.loc[i-1, "est.timezoneOffset"] ==
+                             min(dstRange)) |
+                            (df.loc[i-1, "est.timezoneOffset"] ==
+                             max(dstRange)))):
+
+                            df.loc[i, ["est.type"]] = "UNCERTAIN"
+                            df = addAnnotation(df, i,
+                                               "likely-dst-error-OR-travel")
+
+                        else:
+
+                            df.loc[i, ["est.type"]] = "UNCERTAIN"
+                            df = addAnnotation(df, i,
+                                               "likely-15-min-dst-error")
+
+                # next see if time difference between device.tzo and prev.tzo
+                # is off by 720 minutes, which is indicative of a common
+                # user AM/PM error
+                elif timeDiff == 720:
+                    df.loc[i, ["est.type"]] = "UNCERTAIN"
+                    df = addAnnotation(df, i, "likely-AM-PM-error")
+
+                # if it doesn't fall into any of these cases, then the
+                # tzo difference is likely due to travel
+                else:
+                    df = assignTzoFromDeviceTzo(df, i, device)
+
+            elif timeDiff == 0:
+                df = assignTzoFromDeviceTzo(df, i, device)
+
+        # if there is no previous record to compare with check for dst errors,
+        # and if there are no errors, it is likely a travel day
+        else:
+
+            comparisonTz, dstRange = tzAndTzoRangeWithHomeTz(df, i)
+            timeDiff = abs((df.loc[i, device + ".timezoneOffset"]) -
+                           df.loc[i, "home.imputed.timezoneOffset"])
+
+            if ((df.loc[i, device + ".timezoneOffset"] in dstRange)
+               & (df.loc[i, "home.imputed.timezoneOffset"] in dstRange)):
+
+                # see if it is DST change day
+                if isHomeDstChangeDay[i]:
+
+                    df = addAnnotation(df, i, "dst-change-day")
+                    df.loc[i, ["est.type"]] = "DEVICE"
+                    df.loc[i, ["est.timezoneOffset"]] = \
+                        df.loc[i, device + ".timezoneOffset"]
+                    df.loc[i, ["est.timezone"]] = \
+                        df.loc[i, "home.imputed.timezone"]
+                    df.loc[i, ["est.timeProcessing"]] = \
+                        df.loc[i, device + ".upload.imputed.timeProcessing"]
+
+                # if it is not DST change day, then mark this as uncertain
+                else:
+                    # also, check to see if the difference between device.
+                    # tzo and prev.tzo is less than the expected dst
+                    # difference. There is a known issue where the BtUTC
+                    # procedure puts clock drift into the device.tzo,
+                    # and as a result the tzo can be off by 15, 30,
+                    # or 45 minutes.
+                    if (((df.loc[i, device + ".timezoneOffset"] ==
+                          min(dstRange)) |
+                        (df.loc[i, device + ".timezoneOffset"] ==
+                         max(dstRange))) &
+                       ((df.loc[i, "home.imputed.timezoneOffset"] ==
+                         min(dstRange)) |
+                        (df.loc[i, "home.imputed.timezoneOffset"] ==
+                         max(dstRange)))):
+
+                        df.loc[i, ["est.type"]] = "UNCERTAIN"
+                        df = addAnnotation(df, i, "likely-dst-error-OR-travel")
+
+                    else:
+
+                        df.loc[i, ["est.type"]] = "UNCERTAIN"
+                        df = addAnnotation(df, i, "likely-15-min-dst-error")
+
+            # next see if time difference between device.tzo and prev.tzo
+            # is off by 720 minutes, which is indicative of a common
+            # user AM/PM error
+            elif timeDiff == 720:
+                df.loc[i, ["est.type"]] = "UNCERTAIN"
+                df = addAnnotation(df, i, "likely-AM-PM-error")
+
+            # if it doesn't fall into any of these cases, then the
+            # tzo difference is likely due to travel
+
+            else:
+                df = assignTzoFromDeviceTzo(df, i, device)
+
+    return df
+
+
+def getImputIndices(df, sIdx, hIdx):
+
+    lastDayIdx = len(df) - 1
+
+    currentDayIdx = sIdx.min()
+    tempList = pd.Series(hIdx) - currentDayIdx
+    prevDayIdx = currentDayIdx - 1
+    nextDayIdx = \
+        min(currentDayIdx + min(tempList[tempList >= 0]), lastDayIdx)
+
+    return currentDayIdx, prevDayIdx, nextDayIdx
+
+
+def imputeByTimezone(df, currentDay, prevDaywData, nextDaywData):
+
+    gapSize = (nextDaywData - currentDay)
+
+    if prevDaywData >= 0:
+
+        if df.loc[prevDaywData, "est.timezone"] == \
+          df.loc[nextDaywData, "est.timezone"]:
+
+            tz = df.loc[prevDaywData, "est.timezone"]
+
+            for i in range(currentDay, nextDaywData):
+
+                df.loc[i, ["est.timezone"]] = tz
+
+                df.loc[i, ["est.timezoneOffset"]] = \
+                    getTimezoneOffset(pd.to_datetime(df.loc[i, "date"]), tz)
+
+                df.loc[i, ["est.type"]] = "IMPUTE"
+
+                df = addAnnotation(df, i, "gap=" + str(gapSize))
+                df.loc[i, ["est.gapSize"]] = gapSize
+
+        # TODO: this logic should be updated to handle the edge case
+        # where the day before and after the gap have differing TZ, but
+        # the same TZO. In that case the gap should be marked as UNCERTAIN
+        elif df.loc[prevDaywData, "est.timezoneOffset"] == \
+          df.loc[nextDaywData, "est.timezoneOffset"]:
+
+            for i in range(currentDay, nextDaywData):
+
+                df.loc[i, ["est.timezoneOffset"]] = \
+                    df.loc[prevDaywData, "est.timezoneOffset"]
+
+                df.loc[i, ["est.type"]] = "IMPUTE"
+
+                df = addAnnotation(df, i, "gap=" + str(gapSize))
+                df.loc[i, ["est.gapSize"]] = gapSize
+
+        else:
+            for i in range(currentDay, nextDaywData):
+                df.loc[i, ["est.type"]] = "UNCERTAIN"
+                df = addAnnotation(df, i, "unable-to-impute-tzo")
+
+    else:
+        for i in range(currentDay, nextDaywData):
+            df.loc[i, ["est.type"]] = "UNCERTAIN"
+            df = addAnnotation(df, i, "unable-to-impute-tzo")
+
+    return df
+
+
+def imputeTzAndTzo(cDF):
+
+    sIndices = cDF[cDF["est.timezoneOffset"].isnull()].index
+    hasTzoIndices = cDF[cDF["est.timezoneOffset"].notnull()].index
+    if len(hasTzoIndices) > 0:
+        if len(sIndices) > 0:
+            lastDay = max(sIndices)
+
+            while ((sIndices.min() < max(hasTzoIndices)) &
+                   (len(sIndices) > 0)):
+
+                currentDay, prevDayWithDay, nextDayIdx = \
+                    getImputIndices(cDF, sIndices, hasTzoIndices)
+
+                cDF = imputeByTimezone(cDF, currentDay,
+                                       prevDayWithDay, nextDayIdx)
+
+                sIndices = cDF[((cDF["est.timezoneOffset"].isnull()) &
+                                (~cDF["est.annotations"].str.contains(
+                                "unable-to-impute-tzo").fillna(False)))].index
+
+                hasTzoIndices = cDF[cDF["est.timezoneOffset"].notnull()].index
+
+            # try to impute to the last day (earliest day) in the dataset
+            # if the last record has a timezone that is the home record, then
+            # impute using the home timezone
+            if len(sIndices) > 0:
+                currentDay = min(sIndices)
+                prevDayWithDay = currentDay - 1
+                gapSize = lastDay - currentDay
+
+                for i in range(currentDay, lastDay + 1):
+                    if cDF.loc[prevDayWithDay, "est.timezoneOffset"] == \
+                      cDF.loc[prevDayWithDay, "home.imputed.timezoneOffset"]:
+
+                        cDF.loc[i, ["est.type"]] = "IMPUTE"
+
+                        cDF.loc[i, ["est.timezoneOffset"]] = \
+                            cDF.loc[i, "home.imputed.timezoneOffset"]
+
+                        cDF.loc[i, ["est.timezone"]] = \
+                            cDF.loc[i, "home.imputed.timezone"]
+
+                        cDF = addAnnotation(cDF, i, "gap=" + str(gapSize))
+                        cDF.loc[i, ["est.gapSize"]] = gapSize
+
+                    else:
+                        cDF.loc[i, ["est.type"]] = "UNCERTAIN"
+                        cDF = addAnnotation(cDF, i, "unable-to-impute-tzo")
+    else:
+        cDF["est.type"] = "UNCERTAIN"
+        cDF["est.annotations"] = "unable-to-impute-tzo"
+
+    return cDF
+
+
+def getListOfDSTChangeDays(cDF):
+
+    # get a list of DST change days for the home time zone
+    dstChangeDays = \
+        cDF[abs(cDF["home.imputed.timezoneOffset"] -
+                cDF["home.imputed.timezoneOffset"].shift(-1)) > 0].date
+
+    return dstChangeDays
+
+
+def correctEstimatesAroundDst(df, cDF):
+
+    # get a list of DST change days for the home time zone
+    dstChangeDays = getListOfDSTChangeDays(cDF)
+
+    # loop through the df within 2 days of a daylight savings time change
+    for d in dstChangeDays:
+        dstIndex = df[(df.date > (d + timedelta(days=-2))) &
+                      (df.date < (d + timedelta(days=2)))].index
+        for dIdx in dstIndex:
+            if pd.notnull(df.loc[dIdx, "est.timezone"]):
+                tz = df.loc[dIdx, "est.timezone"]
+                tzRange = getRangeOfTZOsForTimezone(tz, df.loc[dIdx, "date"])
+                minHoursToLocal = min(tzRange)/60
+                tzo = getTzoForDateTime(df.loc[dIdx, "utcTime"] +
+                                        timedelta(hours=minHoursToLocal), tz)
+                localTime = \
+                    df.loc[dIdx, "utcTime"] + pd.to_timedelta(tzo, unit="m")
+                df.loc[dIdx, ["est.localTime"]] = localTime
+                df.loc[dIdx, ["est.timezoneOffset"]] = tzo
+    return df
+
+
+def applyLocalTimeEstimates(df, cDF):
+    df = pd.merge(df, cDF, how="left", on="date")
+    df["est.localTime"] = \
+        df["utcTime"] + pd.to_timedelta(df["est.timezoneOffset"], unit="m")
+
+    df = correctEstimatesAroundDst(df, cDF)
+
+    return df
+
+
+def estimate_day_series_reference(cDays):
+    # estimate the timezone offset and timezone of each day of a day series,
+    # one day (and one .loc) at a time
+    # 1. use upload records to estimate the tz and tzo
+    cDays = estimateTzAndTzoWithUploadRecords(cDays)
+
+    # 2. use device tzos to estimate the tzo and tz (if possible)
+    cDays = estimateTzAndTzoWithDeviceRecords(cDays)
+
+    # 3. impute, infer, or interpolate gaps in the estimated tzo and tz
+    cDays = imputeTzAndTzo(cDays)
+
+    return cDays
+
+
+def apply_local_time_estimates_reference(df, cDF):
+    # the local time of each record, one record (near dst changes) at a time
+    return applyLocalTimeEstimates(df, cDF)
+
+
+def convert_deprecated_timezones_reference(df, timezoneAliases):
+    # the alias of each deprecated timezone, one unique timezone (and one
+    # str.endswith over the alias table) at a time
+    return convertDeprecatedTimezoneToAlias(df, timezoneAliases)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: Tidepool data schema (compact dtypes) for tidals
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+
+_pandasMajorVersion = int(pd.__version__.split(".")[0])
+
+# compact dtypes for the known Tidepool data fields. Fields that are not
+# in the registry are left as is.
+#   * category: text fields with few unique values
+#   * float64: glucose values (mmol/L), which are not made float32, as the
+#     float32 mmol/L of a mg/dL threshold (e.g., 38 / 18.01559) can fall on
+#     the other side of the (float64) threshold
+#   * int16: timezone offsets (minutes)
+#   * datetime: utc and device times, stored as (tz-naive) datetime64
+tidepoolSchema = {
+    "type": "category",
+    "subType": "category",
+    "deliveryType": "category",
+    "deviceId": "category",
+    "uploadId": "category",
+    "timezone": "category",
+    "units": "category",
+    "timeProcessing": "category",
+    "scheduleName": "category",
+    "activeSchedule": "category",
+    "deviceModel": "category",
+    "deviceSerialNumber": "category",
+    "dataSetType": "category",
+    "byUser": "category",
+    "status": "category",
+    "reason": "category",
+    "alarmType": "category",
+    "version": "category",
+    "_state": "category",
+    "_dataState": "category",
+    "value": "float64",
+    "bgInput": "float64",
+    "bgTarget.target": "float64",
+    "bgTarget.low": "float64",
+    "bgTarget.high": "float64",
+    "bgTarget.range": "float64",
+    "timezoneOffset": "int16",
+    "time": "datetime",
+    "deviceTime": "datetime",
+    "computerTime": "datetime",
+}
+
+
+def register_field(fieldName, dtype):
+    # add (or change) the dtype of a field in the schema
+    if dtype not in ["category", "float64", "float32", "int16", "datetime"]:
+        raise ValueError("{0} is not a supported schema dtype".format(dtype))
+    tidepoolSchema[fieldName] = dtype
+
+    return
+
+
+def get_csv_dtypes(columnHeadings):
+    # the dtypes that can be applied by pd.read_csv while the file is parsed
+    return {col: "category" for col in columnHeadings
+            if tidepoolSchema.get(col) == "category"}
+
+
+def _to_numeric(series):
+    # returns None if the field contains values that are not numbers
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    numericSeries = pd.to_numeric(series, errors="coerce")
+    if numericSeries.notnull().sum() != series.notnull().sum():
+        return None
+
+    return numericSeries
+
+
+def _to_category(series):
+    # only text fields are converted (e.g., not fields that are all missing)
+    if series.dtype != object:
+        return series
+    try:
+        return series.astype("category")
+    except TypeError:
+        # e.g., fields that contain lists or embedded json
+        return series
+
+
+def _to_float64(series):
+    numericSeries = _to_numeric(series)
+    if numericSeries is None:
+        return series
+
+    return numericSeries.astype("float64")
+
+
+def _to_float32(series):
+    numericSeries = _to_numeric(series)
+    if numericSeries is None:
+        return series
+
+    return numericSeries.astype("float32")
+
+
+def _to_int16(series):
+    numericSeries = _to_numeric(series)
+    if numericSeries is None:
+        return series
+
+    notNull = numericSeries[numericSeries.notnull()]
+    if ((notNull != np.round(notNull)).any() or
+       (notNull.min() < np.iinfo(np.int16).min) or
+       (notNull.max() > np.iinfo(np.int16).max)):
+        return series
+
+    # use the nullable integer type if there are missing values
+    if len(notNull) < len(numericSeries):
+        return numericSeries.astype("Int16")
+
+    return numericSeries.astype("int16")
+
+
+def parse_times(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if getattr(series.dt, "tz", None) is not None:
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        return series
+    # utc times end in "Z" (or have an offset), and device times do not have
+    # a timezone, so both are parsed as utc and then stored without the
+    # timezone. NOTE: pandas >= 2 needs to be told the times are ISO8601,
+    # otherwise times that are not in the format of the first time are lost
+    if _pandasMajorVersion >= 2:
+        dateTimes = pd.to_datetime(series, utc=True, errors="coerce",
+                                   format="ISO8601")
+    else:
+        dateTimes = pd.to_datetime(series, utc=True, errors="coerce")
+
+    return dateTimes.dt.tz_localize(None)
+
+
+def get_time_bounds(start=None, end=None):
+    # returns the [startTime, endTime) utc bounds used to filter by time.
+    # An end date without a time (e.g., "2018-03-02") includes that entire day
+    startTime, endTime = None, None
+    if start is not None:
+        startTime = pd.Timestamp(start)
+        if startTime.tzinfo is not None:
+            startTime = startTime.tz_convert("UTC").tz_localize(None)
+    if end is not None:
+        endTime = pd.Timestamp(end)
+        if endTime.tzinfo is not None:
+            endTime = endTime.tz_convert("UTC").tz_localize(None)
+        if isinstance(end, str) and (len(end) <= 10):
+            endTime = endTime + pd.Timedelta(days=1)
+        else:
+            endTime = endTime + pd.Timedelta(1, unit="ns")
+
+    return startTime, endTime
+
+
+def in_time_range(times, startTime, endTime):
+    # boolean mask of the (parsed) times that are within [startTime, endTime)
+    # NOTE: missing times are never in range
+    mask = times.notnull()
+    if startTime is not None:
+        mask = mask & (times >= startTime)
+    if endTime is not None:
+        mask = mask & (times < endTime)
+
+    return mask
+
+
+_convertFunctions = {
+    "category": _to_category,
+    "float64": _to_float64,
+    "float32": _to_float32,
+    "int16": _to_int16,
+    "datetime": parse_times,
+}
+
+
+def apply_schema(df):
+    # a copy of df with the known Tidepool fields converted to their compact
+    # dtypes. NOTE: the columns that are not converted are not copied, and
+    # df is not changed
+    df = df.copy(deep=False)
+    for colHead in list(df):
+        if colHead in tidepoolSchema:
+            df[colHead] = \
+                _convertFunctions[tidepoolSchema[colHead]](df[colHead])
+
+    return df
+
+
+def memory_report(df):
+    # per-column memory usage (in bytes) before and after applying the
+    # schema, which is useful for measuring the savings on real donor files
+    typedDF = apply_schema(df)
+    before = df.memory_usage(index=False, deep=True)
+    after = typedDF.memory_usage(index=False, deep=True)
+
+    report = pd.DataFrame({"dtype.before": df.dtypes.astype(str),
+                           "bytes.before": before,
+                           "dtype.after": typedDF.dtypes.astype(str),
+                           "bytes.after": after})
+    report["bytes.saved"] = report["bytes.before"] - report["bytes.after"]
+    report["percent.saved"] = \
+        round(report["bytes.saved"] / report["bytes.before"] * 100, 1)
+    report = report.sort_values("bytes.saved", ascending=False)
+
+    total = pd.DataFrame({"bytes.before": [before.sum()],
+                          "bytes.after": [after.sum()]}, index=["total"])
+    total["bytes.saved"] = total["bytes.before"] - total["bytes.after"]
+    total["percent.saved"] = \
+        round(total["bytes.saved"] / total["bytes.before"] * 100, 1)
+    report = pd.concat([report, total], sort=False)
+    report.index.name = "field"
+
+    return report
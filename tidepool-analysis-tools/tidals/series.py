@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: regular grid (array) representation of cgm data for tidals
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+import warnings
+from .clean import _to_datetime_index
+
+_DAY_NS = 86400 * 10**9
+
+
+class CgmSeries(object):
+    # cgm data on a regular grid: one float32 value per <intervalMinutes>,
+    # with nan for the slots that don't have data. The grid starts at local
+    # midnight of the first day and covers whole (local) days, so the data of
+    # each day is a fixed-size slice of the values array (no copies)
+    # INPUTS:
+    #   * startTime is the (tz-naive) utc time of the first slot
+    #   * values is the (float32) array of values, one per slot
+    #   * tzOffsetMinutes is the (fixed) offset of local time from utc
+    # NOTE: use to_cgm_series to build a CgmSeries from round_time output
+
+    def __init__(self, startTime, values, intervalMinutes=5,
+                 tzOffsetMinutes=0):
+        self.startTime = pd.Timestamp(startTime)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.intervalMinutes = intervalMinutes
+        self.tzOffsetMinutes = tzOffsetMinutes
+        self.slotsPerDay = (24 * 60) // intervalMinutes
+        if len(self.values) % self.slotsPerDay != 0:
+            raise ValueError("values must cover whole days of " +
+                             "{0} slots".format(self.slotsPerDay))
+        self.nDays = len(self.values) // self.slotsPerDay
+        self.firstDate = (self.startTime +
+                          pd.Timedelta(tzOffsetMinutes, unit="m")).normalize()
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return "CgmSeries({0} days from {1}, {2} of {3} slots)".format(
+            self.nDays, self.firstDate.date(), self.count(), len(self))
+
+    @property
+    def dates(self):
+        # the local date of each day
+        return pd.date_range(self.firstDate, periods=self.nDays, freq="D")
+
+    @property
+    def times(self):
+        # the utc time of each slot
+        return pd.date_range(self.startTime, periods=len(self.values),
+                             freq=str(self.intervalMinutes) + "min")
+
+    @property
+    def local_times(self):
+        return self.times + pd.Timedelta(self.tzOffsetMinutes, unit="m")
+
+    def days(self):
+        # the values as a (nDays, slotsPerDay) array (a view, not a copy)
+        return self.values.reshape(self.nDays, self.slotsPerDay)
+
+    def _day_index(self, date):
+        return (pd.Timestamp(date).normalize() - self.firstDate).days
+
+    def day(self, date):
+        # the values of one local day (a view, not a copy)
+        dIndex = self._day_index(date)
+        if (dIndex < 0) or (dIndex >= self.nDays):
+            raise KeyError("{0} is not in the series".format(date))
+
+        return self.values[dIndex * self.slotsPerDay:
+                           (dIndex + 1) * self.slotsPerDay]
+
+    def slice_days(self, startDate=None, endDate=None):
+        # a CgmSeries of the local days from startDate to endDate (inclusive),
+        # which shares its values with this series
+        startIndex = 0 if startDate is None else \
+            min(max(self._day_index(startDate), 0), self.nDays)
+        endIndex = self.nDays if endDate is None else \
+            min(max(self._day_index(endDate) + 1, startIndex), self.nDays)
+
+        return CgmSeries(
+            self.startTime + pd.Timedelta(days=startIndex),
+            self.values[startIndex * self.slotsPerDay:
+                        endIndex * self.slotsPerDay],
+            self.intervalMinutes, self.tzOffsetMinutes)
+
+    def count(self):
+        return int(np.count_nonzero(~np.isnan(self.values)))
+
+    def day_counts(self):
+        # the number of cgm values on each local day
+        return pd.Series(np.count_nonzero(~np.isnan(self.days()), axis=1),
+                         index=self.dates, name="cgm.count")
+
+    def coverage(self):
+        # the percent of the possible cgm values on each local day
+        return pd.Series(self.day_counts().values / self.slotsPerDay * 100,
+                         index=self.dates, name="cgm.percent")
+
+    def day_stats(self):
+        # the count, coverage, mean, std, min, median, and max of each day
+        days = self.days()
+        dayStats = pd.DataFrame({"cgm.count": self.day_counts(),
+                                 "cgm.percent": self.coverage()})
+        with warnings.catch_warnings():
+            # the days without data have nan stats
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            dayStats["cgm.mean"] = np.nanmean(days, axis=1)
+            dayStats["cgm.std"] = np.nanstd(days, axis=1, ddof=1)
+            dayStats["cgm.min"] = np.nanmin(days, axis=1)
+            dayStats["cgm.median"] = np.nanmedian(days, axis=1)
+            dayStats["cgm.max"] = np.nanmax(days, axis=1)
+        dayStats.index.name = "date"
+
+        return dayStats
+
+    def to_frame(self, dropMissing=True):
+        # the data as a DataFrame of roundedTime, localTime, and value
+        df = pd.DataFrame({"roundedTime": self.times,
+                           "localTime": self.local_times,
+                           "value": self.values})
+        if dropMissing:
+            df = df[~np.isnan(self.values)].reset_index(drop=True)
+
+        return df
+
+
+def to_cgm_series(df, valueField="value", roundedTimeField="roundedTime",
+                  intervalMinutes=5, tzOffsetMinutes=0):
+    # build a CgmSeries from the output of round_time (the rounded times are
+    # on a regular grid). If there is more than one value for a rounded
+    # time, the first one is used (like remove_duplicates)
+    # INPUTS:
+    #   * tzOffsetMinutes is the (fixed) offset of local time from utc, which
+    #     is used to split the data into local days
+    if (24 * 60) % intervalMinutes != 0:
+        raise ValueError("intervalMinutes must divide a day evenly")
+    intervalNs = intervalMinutes * 60 * 10**9
+
+    t = _to_datetime_index(df[roundedTimeField])
+    if t.tz is not None:
+        t = t.tz_convert("UTC").tz_localize(None)
+    values = np.asarray(df[valueField], dtype=np.float32)
+    hasData = ~(np.asarray(t.isna()) | np.isnan(values))
+    localNs = t.asi8[hasData] + tzOffsetMinutes * 60 * 10**9
+    values = values[hasData]
+
+    if len(localNs) == 0:
+        return CgmSeries(pd.Timestamp(0), np.zeros(0, dtype=np.float32),
+                         intervalMinutes, tzOffsetMinutes)
+
+    # the grid starts at local midnight of the first day (plus the offset of
+    # the grid from midnight, if the tz offset isn't a multiple of the
+    # interval) and covers whole days
+    firstDayNs = (localNs.min() // _DAY_NS) * _DAY_NS
+    gridOffsetNs = (localNs.min() - firstDayNs) % intervalNs
+    nDays = int((localNs.max() - firstDayNs - gridOffsetNs) // _DAY_NS) + 1
+    slots = (localNs - firstDayNs - gridOffsetNs) // intervalNs
+
+    isFirst = ~pd.Series(slots).duplicated().values
+    gridValues = np.full(nDays * ((24 * 60) // intervalMinutes), np.nan,
+                         dtype=np.float32)
+    gridValues[slots[isFirst]] = values[isFirst]
+
+    startTime = pd.Timestamp(firstDayNs + gridOffsetNs -
+                             tzOffsetMinutes * 60 * 10**9)
+
+    return CgmSeries(startTime, gridValues, intervalMinutes, tzOffsetMinutes)
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: cgm (glucose) statistics for tidals
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+from .clean import _to_datetime_index
+
+_DAY_NS = 86400 * 10**9
+
+# the glucose (mg/dL) ranges that are counted, as (name, low, high, includes
+# low, includes high). None means the range is open on that side.
+# NOTE: these are the definitions used in clinician-insights/daily-feedback.py
+glucoseRanges = [
+    ("Below54", None, 54, False, False),
+    ("Below70", None, 70, False, False),
+    ("54to70", 54, 70, True, False),
+    ("70to140", 70, 140, True, True),
+    ("70to180", 70, 180, True, True),
+    ("180to250", 180, 250, False, True),
+    ("Above180", 180, None, False, False),
+    ("Above250", 250, None, False, False),
+]
+
+# the ranges that are also reported as a percent of the cgm values
+percentRanges = ["Below54", "Below70", "70to140", "70to180",
+                 "Above180", "Above250"]
+
+
+def in_range(values, low, high, includeLow, includeHigh):
+    # boolean mask of the values that are in the range (nan is never in range)
+    mask = np.ones(len(values), dtype=bool)
+    if low is not None:
+        mask &= (values >= low) if includeLow else (values > low)
+    if high is not None:
+        mask &= (values <= high) if includeHigh else (values < high)
+
+    return mask
+
+
+def _group_keys(df, by):
+    # the group number of each row, and the (sorted) keys of the groups
+    if by is None:
+        return np.zeros(len(df), dtype=np.int64), pd.RangeIndex(1)
+
+    grouper = df.groupby(by, sort=True, observed=True, dropna=False)
+    codes = grouper.ngroup().values.astype(np.int64)
+    keys = grouper.size().index
+
+    return codes, keys
+
+
+def _sort_by_group(groupKeys, values):
+    # the order that sorts the data by group, then by value. Sorting by value
+    # first (the order of equal values doesn't matter), and then by group with
+    # a stable (radix) sort is faster than a lexsort
+    valueOrder = np.argsort(values)
+
+    return valueOrder[np.argsort(groupKeys[valueOrder], kind="stable")]
+
+
+def _segment_median(sortedValues, segmentStarts, counts):
+    # the median of each segment of the sorted values (nan if it is empty)
+    medians = np.full(len(counts), np.nan)
+    hasData = counts > 0
+    lower = segmentStarts[hasData] + (counts[hasData] - 1) // 2
+    upper = segmentStarts[hasData] + counts[hasData] // 2
+    medians[hasData] = (sortedValues[lower] + sortedValues[upper]) / 2
+
+    return medians
+
+
+def _segment_percentiles(sortedValues, segmentStarts, counts, q):
+    # the q-th percentiles of each (non-empty) segment of the sorted values,
+    # with linear interpolation between the closest ranks (like pandas)
+    percentiles = np.empty((len(counts), len(q)))
+    for qIndex, percent in enumerate(q):
+        rank = percent / 100 * (counts - 1)
+        lowerRank = np.floor(rank).astype(np.int64)
+        upperRank = np.ceil(rank).astype(np.int64)
+        lowerValue = sortedValues[segmentStarts + lowerRank]
+        upperValue = sortedValues[segmentStarts + upperRank]
+        percentiles[:, qIndex] = \
+            lowerValue + (upperValue - lowerValue) * (rank - lowerRank)
+
+    return percentiles
+
+
+def cgm_stats(df, by=None, valueField="mg_dL", timeField="localTime",
+              intervalMinutes=5):
+    # the glucose stats of each group of cgm data (e.g., each participant,
+    # or each participant and day), with one row per group. All of the groups
+    # are computed at once: the range counts and moments are bin counts over
+    # the group numbers, and the min/median/max come from a single sort.
+    # INPUTS:
+    #   * by is the field(s) to group by, or None to treat df as one group
+    #   * timeField (optional) is used for the start and end time of the data,
+    #     and the number and percent of the possible cgm values
+    # NOTE: the stats match get_stats in clinician-insights/daily-feedback.py
+    codes, keys = _group_keys(df, by)
+    nGroups = len(keys)
+    values = np.asarray(df[valueField], dtype=np.float64)
+    hasValue = ~np.isnan(values)
+    codes, values = codes[hasValue], values[hasValue]
+
+    stats = pd.DataFrame(index=keys)
+    counts = np.bincount(codes, minlength=nGroups)
+    stats["totalNumberCBGValues"] = counts
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.bincount(codes, weights=values, minlength=nGroups) / counts
+        sumSquares = np.bincount(codes, weights=(values - means[codes]) ** 2,
+                                 minlength=nGroups)
+        stats["mean_mgdL"] = means
+        stats["std_mgdL"] = np.where(counts > 1,
+                                     np.sqrt(sumSquares / (counts - 1)),
+                                     np.nan)
+        stats["cov_mgdL"] = stats["std_mgdL"] / stats["mean_mgdL"]
+
+        for rangeName, low, high, includeLow, includeHigh in glucoseRanges:
+            stats["total" + rangeName] = np.bincount(
+                codes[in_range(values, low, high, includeLow, includeHigh)],
+                minlength=nGroups)
+
+        for rangeName in percentRanges:
+            stats["percent" + rangeName] = \
+                stats["total" + rangeName].values / counts
+
+    # sort by group, then by value, so each group is a sorted segment
+    sortOrder = _sort_by_group(codes, values)
+    sortedValues = values[sortOrder]
+    segmentStarts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    hasData = counts > 0
+    for statName, position in [("min_mgdL", segmentStarts),
+                               ("max_mgdL", segmentStarts + counts - 1)]:
+        stat = np.full(nGroups, np.nan)
+        stat[hasData] = sortedValues[position[hasData]]
+        stats[statName] = stat
+    stats["median_mgdL"] = _segment_median(sortedValues, segmentStarts, counts)
+
+    if (timeField is not None) and (timeField in df):
+        times = pd.Series(
+            pd.to_datetime(df[timeField]).values[hasValue]).groupby(codes)
+        stats["startTime"] = times.min().reindex(range(nGroups)).values
+        stats["endTime"] = times.max().reindex(range(nGroups)).values
+        dataSpan = stats["endTime"] - stats["startTime"]
+        stats["totalNumberPossibleCBGvalues"] = \
+            (dataSpan // pd.Timedelta(intervalMinutes, unit="m")) + 1
+        stats["percentOfExpectedData"] = \
+            dataSpan.dt.total_seconds() / (86400 - (intervalMinutes * 60))
+
+    if by is None:
+        return stats
+
+    return stats.reset_index()
+
+
+def _histogram_percentiles(histograms, q, binWidth):
+    # the q-th percentiles of each row of histograms (with bins centered on
+    # multiples of binWidth), as a (rows, len(q)) array
+    cumulativeCounts = np.cumsum(histograms, axis=1)
+    counts = cumulativeCounts[:, -1]
+    percentiles = np.full((len(histograms), len(q)), np.nan)
+    hasData = counts > 0
+    cumulativeCounts = cumulativeCounts[hasData]
+    for qIndex, percent in enumerate(q):
+        rank = percent / 100 * (counts[hasData] - 1)
+        lowerRank, upperRank = np.floor(rank), np.ceil(rank)
+        # the bin of the value at each rank is the first bin whose
+        # cumulative count is more than the rank
+        lowerValue = (cumulativeCounts <= lowerRank[:, np.newaxis]).sum(
+            axis=1) * binWidth
+        upperValue = (cumulativeCounts <= upperRank[:, np.newaxis]).sum(
+            axis=1) * binWidth
+        percentiles[hasData, qIndex] = \
+            lowerValue + (upperValue - lowerValue) * (rank - lowerRank)
+
+    return percentiles
+
+
+class GlucoseAccumulator(object):
+    # running glucose (mg/dL) stats that are updated one chunk of data at a
+    # time, and that can be merged (e.g., the partial results of each donor
+    # or day computed in different processes). The counts, mean, std, min,
+    # and max are exact (the mean and variance are combined with Welford's /
+    # Chan's method). The median and percentiles come from a histogram with
+    # bins centered on multiples of binWidth, so they are exact for whole
+    # number mg/dL values (with binWidth=1), and within binWidth / 2 otherwise
+    # NOTE: the stats are the ones returned by cgm_stats
+
+    def __init__(self, binWidth=1, maxValue=1000, intervalMinutes=5):
+        self.binWidth = binWidth
+        self.maxValue = maxValue
+        self.intervalMinutes = intervalMinutes
+        self.count = 0
+        self.mean = 0.0
+        self.sumSquares = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.rangeCounts = np.zeros(len(glucoseRanges), dtype=np.int64)
+        self.histogram = np.zeros(int(round(maxValue / binWidth)) + 1,
+                                  dtype=np.int64)
+        self.startTime = pd.NaT
+        self.endTime = pd.NaT
+
+    def _is_compatible(self, other):
+        return ((self.binWidth == other.binWidth) and
+                (self.maxValue == other.maxValue) and
+                (self.intervalMinutes == other.intervalMinutes))
+
+    def _add_moments(self, count, mean, sumSquares):
+        # combine the count, mean, and sum of squared differences of two sets
+        totalCount = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / totalCount
+        self.sumSquares = (self.sumSquares + sumSquares +
+                           delta ** 2 * self.count * count / totalCount)
+        self.count = totalCount
+
+        return
+
+    def update(self, values, times=None):
+        # add a chunk of glucose values (and, optionally, their local times)
+        values = np.asarray(values, dtype=np.float64)
+        hasValue = ~np.isnan(values)
+        values = values[hasValue]
+        if len(values) == 0:
+            return self
+
+        mean = values.mean()
+        self._add_moments(len(values), mean, ((values - mean) ** 2).sum())
+        self.min = np.nanmin([self.min, values.min()])
+        self.max = np.nanmax([self.max, values.max()])
+
+        for rIndex, (_, low, high, includeLow, includeHigh) in \
+                enumerate(glucoseRanges):
+            self.rangeCounts[rIndex] += np.count_nonzero(
+                in_range(values, low, high, includeLow, includeHigh))
+
+        bins = np.clip(np.round(values / self.binWidth), 0,
+                       len(self.histogram) - 1).astype(np.int64)
+        self.histogram += np.bincount(bins, minlength=len(self.histogram))
+
+        if times is not None:
+            times = pd.to_datetime(pd.Series(np.asarray(times)[hasValue]))
+            self._add_times(times.min(), times.max())
+
+        return self
+
+    def _add_times(self, startTime, endTime):
+        if pd.notnull(startTime):
+            self.startTime = startTime if pd.isnull(self.startTime) else \
+                min(self.startTime, startTime)
+        if pd.notnull(endTime):
+            self.endTime = endTime if pd.isnull(self.endTime) else \
+                max(self.endTime, endTime)
+
+        return
+
+    def merge(self, other):
+        # add the data of another accumulator (with the same settings)
+        if not self._is_compatible(other):
+            raise ValueError("accumulators must have the same binWidth, " +
+                             "maxValue, and intervalMinutes to be merged")
+        if other.count == 0:
+            return self
+
+        self._add_moments(other.count, other.mean, other.sumSquares)
+        self.min = np.nanmin([self.min, other.min])
+        self.max = np.nanmax([self.max, other.max])
+        self.rangeCounts += other.rangeCounts
+        self.histogram += other.histogram
+        self._add_times(other.startTime, other.endTime)
+
+        return self
+
+    def percentile(self, q):
+        # the q-th percentile(s), with linear interpolation between the
+        # closest ranks (like numpy and pandas)
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+
+        percentiles = _histogram_percentiles(
+            self.histogram[np.newaxis, :], np.atleast_1d(q), self.binWidth)[0]
+
+        # the extremes are known exactly
+        return np.clip(percentiles, self.min, self.max).reshape(q.shape)
+
+    def median(self):
+        return float(self.percentile(50))
+
+    def std(self):
+        if self.count < 2:
+            return np.nan
+        return np.sqrt(self.sumSquares / (self.count - 1))
+
+    def to_stats(self):
+        # the stats as a dict, with the same names as the cgm_stats fields
+        stats = {"totalNumberCBGValues": self.count,
+                 "mean_mgdL": self.mean if self.count > 0 else np.nan,
+                 "std_mgdL": self.std()}
+        stats["cov_mgdL"] = stats["std_mgdL"] / stats["mean_mgdL"]
+        for rIndex, (rangeName, _, _, _, _) in enumerate(glucoseRanges):
+            stats["total" + rangeName] = int(self.rangeCounts[rIndex])
+        for rangeName in percentRanges:
+            stats["percent" + rangeName] = \
+                stats["total" + rangeName] / self.count \
+                if self.count > 0 else np.nan
+        stats["min_mgdL"] = self.min
+        stats["max_mgdL"] = self.max
+        stats["median_mgdL"] = self.median()
+        if pd.notnull(self.startTime):
+            dataSpan = self.endTime - self.startTime
+            stats["startTime"] = self.startTime
+            stats["endTime"] = self.endTime
+            stats["totalNumberPossibleCBGvalues"] = \
+                (dataSpan // pd.Timedelta(self.intervalMinutes, unit="m")) + 1
+            stats["percentOfExpectedData"] = \
+                dataSpan.total_seconds() / (86400 - (self.intervalMinutes * 60))
+
+        return stats
+
+
+def merge_accumulators(accumulators):
+    # reduce a list of accumulators (e.g., one per donor) to one accumulator
+    merged = None
+    for accumulator in accumulators:
+        if merged is None:
+            merged = GlucoseAccumulator(accumulator.binWidth,
+                                        accumulator.maxValue,
+                                        accumulator.intervalMinutes)
+        merged.merge(accumulator)
+
+    return merged
+
+
+def accumulator_stats(accumulators):
+    # the stats of a dict of accumulators (e.g., {(userID, date): acc}),
+    # with one row per key, like cgm_stats
+    stats = pd.DataFrame.from_dict(
+        {key: accumulator.to_stats()
+         for key, accumulator in accumulators.items()}, orient="index")
+
+    return stats
+
+
+# the percentiles of the ambulatory glucose profile (agp)
+agpPercentiles = [5, 25, 50, 75, 95]
+
+
+def _time_of_day_bins(localTimes, intervalMinutes):
+    # the time of day bin of each (local) time, and whether the time is missing
+    t = _to_datetime_index(localTimes)
+    if t.tz is not None:
+        t = t.tz_localize(None)
+    timeOfDayNs = np.asarray(t.asi8) % _DAY_NS
+
+    return timeOfDayNs // (intervalMinutes * 60 * 10**9), np.asarray(t.isna())
+
+
+def _agp_frame(binKeys, counts, percentiles, q, intervalMinutes):
+    agpData = pd.DataFrame({"minutesOfDay": binKeys * intervalMinutes,
+                            "count": counts})
+    for qIndex, percent in enumerate(q):
+        agpData["p{0:g}".format(percent)] = percentiles[:, qIndex]
+
+    return agpData
+
+
+def agp(df, by=None, valueField="value", localTimeField="localTime",
+        percentiles=agpPercentiles, intervalMinutes=5):
+    # the ambulatory glucose profile: the percentiles of the cgm values in
+    # each <intervalMinutes> bin of the (local) time of day, over all days.
+    # All of the bins (of all of the groups) are computed with a single sort,
+    # by group and bin, then value.
+    # INPUTS:
+    #   * df is rounded local time cgm data (e.g., estimate-local-time output)
+    #   * by is the field(s) to group by (e.g., "userID"), or None
+    # OUTPUT: one row per group and bin that has data, with the minutes of the
+    #   day of the start of the bin, the number of values, and one p<q> field
+    #   per percentile
+    if (24 * 60) % intervalMinutes != 0:
+        raise ValueError("intervalMinutes must divide a day evenly")
+    nBins = (24 * 60) // intervalMinutes
+    codes, keys = _group_keys(df, by)
+    bins, isNaT = _time_of_day_bins(df[localTimeField], intervalMinutes)
+    values = np.asarray(df[valueField], dtype=np.float64)
+    hasData = ~(isNaT | np.isnan(values))
+    values = values[hasData]
+    binKeys = codes[hasData] * nBins + bins[hasData]
+
+    sortOrder = _sort_by_group(binKeys, values)
+    sortedValues, sortedKeys = values[sortOrder], binKeys[sortOrder]
+    isStart = np.ones(len(sortedKeys), dtype=bool)
+    isStart[1:] = sortedKeys[1:] != sortedKeys[:-1]
+    segmentStarts = np.nonzero(isStart)[0]
+    counts = np.diff(np.append(segmentStarts, len(sortedKeys)))
+    segmentKeys = sortedKeys[segmentStarts]
+
+    agpData = _agp_frame(
+        segmentKeys % nBins, counts,
+        _segment_percentiles(sortedValues, segmentStarts, counts,
+                             percentiles),
+        percentiles, intervalMinutes)
+
+    if by is None:
+        return agpData
+
+    groupKeys = keys[segmentKeys // nBins].to_frame(index=False)
+
+    return pd.concat([groupKeys, agpData], axis=1)
+
+
+class AgpAccumulator(object):
+    # memory-bounded ambulatory glucose profile, for data that is too big to
+    # sort at once (e.g., multi-year datasets): each chunk of data is added to
+    # one histogram per time of day bin, and accumulators can be merged. The
+    # percentiles are within binWidth / 2 of the exact percentiles (and exact
+    # for whole number values that are multiples of binWidth)
+    # NOTE: the defaults are for mg/dL; use e.g., binWidth=0.01 and
+    # maxValue=60 for mmol/L values
+
+    def __init__(self, binWidth=1, maxValue=1000, intervalMinutes=5):
+        if (24 * 60) % intervalMinutes != 0:
+            raise ValueError("intervalMinutes must divide a day evenly")
+        self.binWidth = binWidth
+        self.maxValue = maxValue
+        self.intervalMinutes = intervalMinutes
+        self.nValueBins = int(round(maxValue / binWidth)) + 1
+        self.histograms = np.zeros(((24 * 60) // intervalMinutes,
+                                    self.nValueBins), dtype=np.int64)
+
+    def update(self, values, localTimes):
+        # add a chunk of cgm values and their (local) times
+        bins, isNaT = _time_of_day_bins(localTimes, self.intervalMinutes)
+        values = np.asarray(values, dtype=np.float64)
+        hasData = ~(isNaT | np.isnan(values))
+        valueBins = np.clip(np.round(values[hasData] / self.binWidth), 0,
+                            self.nValueBins - 1).astype(np.int64)
+        self.histograms += np.bincount(
+            bins[hasData] * self.nValueBins + valueBins,
+            minlength=self.histograms.size).reshape(self.histograms.shape)
+
+        return self
+
+    def merge(self, other):
+        if ((self.binWidth != other.binWidth) or
+           (self.maxValue != other.maxValue) or
+           (self.intervalMinutes != other.intervalMinutes)):
+            raise ValueError("accumulators must have the same binWidth, " +
+                             "maxValue, and intervalMinutes to be merged")
+        self.histograms += other.histograms
+
+        return self
+
+    def to_frame(self, percentiles=agpPercentiles):
+        # the agp, in the same format as agp()
+        counts = self.histograms.sum(axis=1)
+        hasData = np.nonzero(counts > 0)[0]
+
+        return _agp_frame(
+            hasData, counts[hasData],
+            _histogram_percentiles(self.histograms[hasData], percentiles,
+                                   self.binWidth),
+            percentiles, self.intervalMinutes)
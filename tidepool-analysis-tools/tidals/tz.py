@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: timezone offset lookup tables for tidals
+created: 2026-10-18
+author: Ed Nykaza
+dependencies:
+    * pytz (the tz database)
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+import datetime as dt
+import functools
+import pytz
+
+_DAY_NS = 86400 * 10**9
+
+# the years of the (yearly) timezone offset ranges, dates outside of them
+# get the range of the first (or last) year
+_FIRST_YEAR = 1900
+_LAST_YEAR = 2100
+
+
+def parse_tzo_number(tzoNum):
+    # the timezone offset (in minutes) of a "%z" formatted offset that has
+    # been converted to a number (e.g., "-0700" -> -700 -> -420).
+    # NOTE: this is the arithmetic that the local time estimation has always
+    # used, and it is kept as is so the estimates do not change (e.g.,
+    # offsets that are negative and not a whole number of hours, like
+    # "-0330", do not convert to -210)
+    tzoHours = np.floor(tzoNum / 100)
+    tzoMinutes = round((tzoNum / 100 - tzoHours) * 100, 0)
+    tzoSign = np.sign(tzoHours)
+    tzo = int((tzoHours * 60) + (tzoMinutes * tzoSign))
+
+    return tzo
+
+
+def _strftime_tzo(offsetSeconds):
+    # the timezone offset (in minutes) of a utc offset, by way of
+    # strftime("%z") and parse_tzo_number
+    tzoString = dt.datetime(2000, 1, 1, tzinfo=dt.timezone(
+        dt.timedelta(seconds=int(offsetSeconds)))).strftime("%z")
+
+    return parse_tzo_number(int(tzoString))
+
+
+class TimezoneTable(object):
+    # the utc transition times of a timezone, and the utc offset of each
+    # period between transitions, so the offsets of many times can be found
+    # at once (with searchsorted) rather than one pytz localize at a time
+    # ATTRIBUTES:
+    #   * transitionTimes: the (int64 ns) utc start of each period. The first
+    #     period starts at the minimum int64, i.e., it has no start
+    #   * offsets: the utc offset (in seconds) of each period
+    #   * isDst: whether each period is daylight savings time
+    #   * localTransitionTimes: the (int64 ns) local start of each period
+    #     (after the first), in the offset of the period before it
+    #   * tzos: the timezone offset (in minutes) of each period, the way that
+    #     the local time estimation has always calculated it (see
+    #     parse_tzo_number)
+    #   * tzoChangeDays: the (int64 ns) dates where the timezone offset (of
+    #     the date, see timezone_offsets) is not the one of the day before
+    #   * minTzos, maxTzos: the smallest and largest timezone offset of each
+    #     year from _FIRST_YEAR to _LAST_YEAR
+
+    def __init__(self, timezoneName):
+        tz = pytz.timezone(timezoneName)
+        self.name = timezoneName
+        if hasattr(tz, "_utc_transition_times"):
+            # the first transition is datetime.min, which is out of the
+            # range of datetime64[ns]
+            self.transitionTimes = np.concatenate([
+                [np.iinfo(np.int64).min],
+                np.array(tz._utc_transition_times[1:],
+                         dtype="datetime64[ns]").astype(np.int64)])
+            transitionInfo = tz._transition_info
+        else:
+            # timezones without transitions (e.g., UTC, Etc/GMT+5)
+            self.transitionTimes = np.array([np.iinfo(np.int64).min],
+                                            dtype=np.int64)
+            transitionInfo = [(tz.utcoffset(dt.datetime(2000, 1, 1)),
+                               dt.timedelta(0), None)]
+
+        self.offsets = np.array(
+            [int(info[0].total_seconds()) for info in transitionInfo],
+            dtype=np.int64)
+        self.isDst = np.array([bool(info[1]) for info in transitionInfo])
+        self.localTransitionTimes = \
+            self.transitionTimes[1:] + self.offsets[:-1] * 10**9
+        tzoOfOffset = {o: _strftime_tzo(o) for o in set(self.offsets)}
+        self.tzos = np.array([tzoOfOffset[o] for o in self.offsets],
+                             dtype=np.int64)
+        self.tzoChangeDays = self._tzo_change_days()
+        self.minTzos, self.maxTzos = self._yearly_tzo_ranges()
+
+    def __repr__(self):
+        return "TimezoneTable({0!r}, {1} periods)".format(
+            self.name, len(self.offsets))
+
+    def _tzo_change_days(self):
+        # the timezone offset of a date (i.e., of the start of the next day)
+        # can only change from the day before if a period starts (locally)
+        # after the start of the date, and no later than the start of the
+        # next day
+        periodStarts = np.concatenate([
+            self.localTransitionTimes,
+            self.transitionTimes[1:] + self.offsets[1:] * 10**9])
+        days = np.floor_divide(periodStarts, _DAY_NS) * _DAY_NS
+        days = np.unique(np.concatenate([days - _DAY_NS, days]))
+
+        # the offset of a date is the one of the start of the next day
+        tzoDayBefore = self.tzos[self.local_periods(days)]
+        tzo = self.tzos[self.local_periods(days + _DAY_NS)]
+
+        return days[tzo != tzoDayBefore]
+
+    def _yearly_tzo_ranges(self):
+        # the periods of the offsets of the first to the last date of each
+        # year (i.e., of the start of Jan 2 to the start of the next Jan 1)
+        yearStarts = pd.to_datetime(
+            ["{0}-01-01".format(y) for y in range(_FIRST_YEAR, _LAST_YEAR + 2)]
+        ).asi8
+        firstPeriods = self.local_periods(yearStarts[:-1] + _DAY_NS)
+        lastPeriods = self.local_periods(yearStarts[1:])
+
+        # min and max of each [first, last] segment
+        edges = np.column_stack([firstPeriods, lastPeriods + 1]).ravel()
+        paddedTzos = np.append(self.tzos, 0)
+        minTzos = np.minimum.reduceat(paddedTzos, edges)[::2]
+        maxTzos = np.maximum.reduceat(paddedTzos, edges)[::2]
+
+        return minTzos, maxTzos
+
+    def utc_periods(self, utcTimes):
+        # the period of each (int64 ns) utc time
+        return np.maximum(np.searchsorted(self.transitionTimes, utcTimes,
+                                          side="right") - 1, 0)
+
+    def local_periods(self, localTimes):
+        # the period of each (int64 ns) local time, which is what pytz
+        # localize gives for the pandas timestamps of the local time
+        # estimation:
+        #   * a local time that does not happen (e.g., when the clocks go
+        #     forward) is in the period after the change
+        #   * a local time that happens twice (e.g., when the clocks go back)
+        #     is in the daylight savings time period, and if both (or
+        #     neither) are daylight savings time, the first period
+        localTimes = np.asarray(localTimes, dtype=np.int64)
+
+        # a period starts at the local time of its transition, in the offset
+        # of the period before it
+        periods = np.searchsorted(self.localTransitionTimes, localTimes,
+                                  side="right")
+
+        # the local times that are also in the next period
+        nextPeriods = np.minimum(periods + 1, len(self.offsets) - 1)
+        isTwice = (nextPeriods > periods) & \
+            (localTimes >= self.transitionTimes[nextPeriods] +
+             self.offsets[nextPeriods] * 10**9)
+        isNextDst = isTwice & self.isDst[nextPeriods] & ~self.isDst[periods]
+
+        return np.where(isNextDst, nextPeriods, periods)
+
+
+@functools.lru_cache(maxsize=512)
+def get_timezone_table(timezoneName):
+    # the (cached) TimezoneTable of a timezone
+    return TimezoneTable(timezoneName)
+
+
+def _to_ns(times):
+    # (naive) times or dates as int64 ns
+    times = pd.DatetimeIndex(pd.to_datetime(times))
+    if times.tz is not None:
+        times = times.tz_localize(None)
+
+    return times.asi8
+
+
+def _by_timezone(timezones, localNs, tableFunction, missingValue=np.nan):
+    # tableFunction(table, localNs) of each local time, with the table of the
+    # timezone of each time (timezones is a name, or one name per time).
+    # Times without a timezone get missingValue.
+    if isinstance(timezones, str):
+        return tableFunction(get_timezone_table(timezones), localNs)
+
+    timezones = np.asarray(timezones, dtype=object)
+    codes, uniqueTimezones = pd.factorize(timezones)
+    results = None
+    for tzIndex, timezoneName in enumerate(uniqueTimezones):
+        isTimezone = codes == tzIndex
+        values = tableFunction(get_timezone_table(timezoneName),
+                               localNs[isTimezone])
+        if results is None:
+            results = np.empty(len(localNs), dtype=values.dtype)
+        results[isTimezone] = values
+
+    if results is None:
+        return np.full(len(localNs), missingValue)
+    if (codes < 0).any():
+        results = results.astype(np.result_type(results, missingValue))
+        results[codes < 0] = missingValue
+
+    return results
+
+
+def _table_tzos(table, localNs):
+    return table.tzos[table.local_periods(localNs)]
+
+
+def _year_index(localNs):
+    years = localNs.astype("datetime64[ns]").astype("datetime64[Y]") \
+        .astype(np.int64) + 1970
+
+    return np.clip(years, _FIRST_YEAR, _LAST_YEAR) - _FIRST_YEAR
+
+
+def local_time_offsets(timezones, localTimes):
+    # the timezone offset (in minutes) of each local time, i.e., the
+    # vectorized version of pytz localize + strftime("%z")
+    # INPUTS:
+    #   * timezones is a timezone name, or one name (or nan) per time
+    # OUTPUT: an int64 array, or a float array if a timezone is missing
+    return _by_timezone(timezones, _to_ns(localTimes), _table_tzos)
+
+
+def timezone_offsets(timezones, dates):
+    # the timezone offset (in minutes) of each date. The offset is the one of
+    # the start of the next day (i.e., of the date + 1 day), so that dates
+    # where daylight savings time starts or ends get the offset of the end
+    # of the day
+    return _by_timezone(timezones, _to_ns(dates) + _DAY_NS, _table_tzos)
+
+
+def is_dst_change_day(timezones, dates):
+    # whether the timezone offset of each date (see timezone_offsets) is not
+    # the one of the day before, i.e., whether the clocks change (e.g., to or
+    # from daylight savings time) on the date. Dates without a timezone are
+    # not change days.
+    dayNs = np.floor_divide(_to_ns(dates), _DAY_NS) * _DAY_NS
+
+    return _by_timezone(
+        timezones, dayNs, lambda table, d: np.isin(d, table.tzoChangeDays),
+        missingValue=False)
+
+
+def dst_change_days(timezoneName, startDate=None, endDate=None):
+    # the dates (from startDate to endDate) where the clocks change in a
+    # timezone (see is_dst_change_day)
+    changeDays = pd.to_datetime(get_timezone_table(timezoneName).tzoChangeDays)
+    if startDate is not None:
+        changeDays = changeDays[changeDays >= pd.to_datetime(startDate)]
+    if endDate is not None:
+        changeDays = changeDays[changeDays <= pd.to_datetime(endDate)]
+
+    return changeDays
+
+
+def tzo_ranges(timezones, dates):
+    # the smallest and largest timezone offset (in minutes) of the year of
+    # each date, e.g., the standard and daylight savings time offsets
+    # OUTPUT: two int64 arrays, or float arrays if a timezone is missing
+    yearIndex = _year_index(_to_ns(dates))
+    minTzos = _by_timezone(timezones, yearIndex,
+                           lambda table, i: table.minTzos[i])
+    maxTzos = _by_timezone(timezones, yearIndex,
+                           lambda table, i: table.maxTzos[i])
+
+    return minTzos, maxTzos
+
+
+class TimezoneAliases(object):
+    # the alias of each deprecated timezone (e.g., "US/Central" ->
+    # "America/Chicago"), from a table with tz and alias columns (e.g.,
+    # wikipedia-timezone-aliases-2018-04-28.csv). A timezone gets the alias
+    # of the row whose tz ends with the timezone, if exactly one row does, so
+    # every suffix of every tz is looked up (in a dict) once, when the
+    # aliases are made. The aliases can be pickled (e.g., sent to worker
+    # processes).
+    # ATTRIBUTES:
+    #   * aliases: the alias of each (unambiguous) tz suffix
+
+    def __init__(self, timezoneAliases):
+        suffixRows = {}
+        for tz, alias in zip(timezoneAliases["tz"], timezoneAliases["alias"]):
+            if not isinstance(tz, str):
+                continue
+            for suffix in set(tz[i:] for i in range(len(tz) + 1)):
+                suffixRows.setdefault(suffix, []).append(alias)
+
+        self.aliases = {suffix: rows[0] for suffix, rows in suffixRows.items()
+                        if len(rows) == 1}
+
+    def __repr__(self):
+        return "TimezoneAliases({0} timezones)".format(len(self.aliases))
+
+    def alias(self, timezone):
+        # the alias of a timezone, or the timezone if it doesn't have one
+        if isinstance(timezone, str):
+            return self.aliases.get(timezone, timezone)
+
+        return timezone
+
+    def resolve(self, timezones):
+        # the alias of each timezone (or the timezone if it doesn't have
+        # one), looking up each unique timezone once
+        # NOTE: the unique timezones are replaced one at a time, in the order
+        # that they first appear (as the local time estimation has always
+        # done), so a timezone that is replaced by another timezone of the
+        # data also gets the alias of that timezone
+        timezones = np.asarray(timezones, dtype=object)
+        codes, uniqueTimezones = pd.factorize(timezones)
+        uniqueAliases = np.array(uniqueTimezones, dtype=object)
+        for tz in uniqueTimezones:
+            alias = self.alias(tz)
+            if alias != tz:
+                uniqueAliases[uniqueAliases == tz] = alias
+
+        # only the timezones that are not null (code -1) are replaced
+        resolved = timezones.copy()
+        isTimezone = codes >= 0
+        resolved[isTimezone] = uniqueAliases[codes[isTimezone]]
+
+        return resolved
+
+
+@functools.lru_cache(maxsize=8)
+def read_timezone_aliases(aliasesPathAndName):
+    # the (cached) TimezoneAliases of a timezone alias csv file
+    return TimezoneAliases(pd.read_csv(aliasesPathAndName, low_memory=False))
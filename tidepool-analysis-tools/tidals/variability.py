@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+description: glycemic variability metrics for tidals
+created: 2026-10-18
+author: Ed Nykaza
+license: BSD-2-Clause
+"""
+
+import pandas as pd
+import numpy as np
+import warnings
+from .series import CgmSeries
+
+# NOTE: the metrics are calculated from regular grid cgm series (see
+# series.to_cgm_series) with values in mg/dL. Every metric is calculated for
+# all of the series (and days) at once, with the values of all of the series
+# end to end, and a group number for each slot (see _slot_groups).
+
+
+def _combine_series(cgmSeries):
+    if isinstance(cgmSeries, CgmSeries):
+        cgmSeries = {None: cgmSeries}
+    keys = list(cgmSeries)
+    seriesList = [cgmSeries[key] for key in keys]
+    if len(set(s.intervalMinutes for s in seriesList)) > 1:
+        raise ValueError("the cgm series must have the same intervalMinutes")
+
+    return keys, seriesList
+
+
+def _slot_groups(seriesList, perDay):
+    # the group of each slot (a series, or a day of a series), and the
+    # series of each slot
+    nSlots = np.array([len(s) for s in seriesList], dtype=np.int64)
+    seriesOfSlot = np.repeat(np.arange(len(seriesList)), nSlots)
+    if perDay:
+        # every series covers whole days, so the slots of each day are
+        # a block of slotsPerDay slots
+        slotsPerDay = seriesList[0].slotsPerDay if seriesList else 1
+        return np.arange(nSlots.sum()) // slotsPerDay, seriesOfSlot
+
+    return seriesOfSlot, seriesOfSlot
+
+
+def _group_mean(values, groups, nGroups):
+    hasValue = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (np.bincount(groups[hasValue], weights=values[hasValue],
+                            minlength=nGroups) /
+                np.bincount(groups[hasValue], minlength=nGroups))
+
+
+def _group_std(values, groups, nGroups):
+    # the sample (ddof=1) standard deviation of each group
+    hasValue = ~np.isnan(values)
+    values, groups = values[hasValue], groups[hasValue]
+    counts = np.bincount(groups, minlength=nGroups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.bincount(groups, weights=values, minlength=nGroups) / counts
+        sumSquares = np.bincount(groups, weights=(values - means[groups]) ** 2,
+                                 minlength=nGroups)
+        return np.where(counts > 1, np.sqrt(sumSquares / (counts - 1)),
+                        np.nan)
+
+
+def _lagged_differences(values, seriesOfSlot, groups, lag):
+    # the difference between each value and the value <lag> slots earlier
+    # (in the same series), and the group of the later value
+    if lag >= len(values):
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    sameSeries = seriesOfSlot[lag:] == seriesOfSlot[:-lag]
+    differences = (values[lag:] - values[:-lag])[sameSeries]
+
+    return differences, groups[lag:][sameSeries]
+
+
+def risk_values(values):
+    # the low and high blood glucose risk of each value (Kovatchev et al.)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        f = 1.509 * (np.log(values) ** 1.084 - 5.381)
+    risk = 10 * f ** 2
+    lowRisk = np.where(f < 0, risk, 0.0)
+    highRisk = np.where(f > 0, risk, 0.0)
+    lowRisk[np.isnan(values)] = np.nan
+    highRisk[np.isnan(values)] = np.nan
+
+    return lowRisk, highRisk
+
+
+def _turning_points(values, groups):
+    # the values (and groups) without the missing values, flat runs, and the
+    # points in the middle of a rise or fall, i.e., the first and last point
+    # of each group, and the points where the direction of the change flips
+    hasValue = ~np.isnan(values)
+    values, groups = values[hasValue], groups[hasValue]
+
+    # flat runs are one point
+    isRepeat = np.zeros(len(values), dtype=bool)
+    isRepeat[1:] = (values[1:] == values[:-1]) & (groups[1:] == groups[:-1])
+    values, groups = values[~isRepeat], groups[~isRepeat]
+
+    sameGroup = groups[1:] == groups[:-1]
+    changes = np.diff(values)
+    isTurningPoint = np.ones(len(values), dtype=bool)
+    isTurningPoint[1:-1] = ~(sameGroup[:-1] & sameGroup[1:] &
+                             (changes[:-1] * changes[1:] > 0))
+
+    return values[isTurningPoint], groups[isTurningPoint]
+
+
+def _excursion_extremes(values, groups, std):
+    # the peaks and nadirs of the glycemic excursions of each group (Service
+    # et al., 1970): a rise or fall only counts once it is more than one std
+    # (of the group), and the smaller oscillations along the way are merged
+    # into it (e.g., 100 -> 200 -> 190 -> 300 is one 200 mg/dL rise). So
+    # the changes from one extreme to the next alternate in direction and
+    # are all more than one std.
+    extremes, extremeGroups = [], []
+    group = None
+    for value, g in zip(values.tolist(), groups.tolist()):
+        if g != group:
+            # the first point of a group, the direction isn't known until
+            # the values move more than one std from their min or max
+            if (group is not None) and (direction != 0):
+                extremes.append(candidate)
+                extremeGroups.append(group)
+            group, threshold, direction = g, std[g], 0
+            low = high = value
+            continue
+
+        if direction == 0:
+            if value - low > threshold:
+                extremes.append(low)
+                direction, candidate = 1, value
+            elif high - value > threshold:
+                extremes.append(high)
+                direction, candidate = -1, value
+            else:
+                low, high = min(low, value), max(high, value)
+                continue
+            extremeGroups.append(g)
+        elif (value - candidate) * direction > 0:
+            candidate = value
+        elif (candidate - value) * direction > threshold:
+            extremes.append(candidate)
+            extremeGroups.append(g)
+            direction, candidate = -direction, value
+
+    if (group is not None) and (direction != 0):
+        extremes.append(candidate)
+        extremeGroups.append(group)
+
+    return np.array(extremes, dtype=np.float64), \
+        np.array(extremeGroups, dtype=np.int64)
+
+
+def _mage(values, groups, nGroups, std):
+    # mean amplitude of glycemic excursions: the mean of the excursions (see
+    # _excursion_extremes) in the direction of the first excursion of each
+    # group, and the means of the rises (magePlus) and falls (mageMinus).
+    # Missing values are skipped.
+    values, groups = _turning_points(values, groups)
+    extremes, extremeGroups = _excursion_extremes(values, groups, std)
+
+    isSameGroup = extremeGroups[1:] == extremeGroups[:-1]
+    changes = np.diff(extremes)[isSameGroup]
+    changeGroups = extremeGroups[1:][isSameGroup]
+
+    # the direction of the first excursion of each group
+    firstDirection = np.zeros(nGroups)
+    isFirst = np.ones(len(changeGroups), dtype=bool)
+    isFirst[1:] = changeGroups[1:] != changeGroups[:-1]
+    firstDirection[changeGroups[isFirst]] = np.sign(changes[isFirst])
+
+    def mean_amplitude(isCounted):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (np.bincount(changeGroups[isCounted],
+                                weights=np.abs(changes[isCounted]),
+                                minlength=nGroups) /
+                    np.bincount(changeGroups[isCounted], minlength=nGroups))
+
+    return mean_amplitude(np.sign(changes) == firstDirection[changeGroups]), \
+        mean_amplitude(changes > 0), mean_amplitude(changes < 0)
+
+
+def variability_metrics(cgmSeries, perDay=False, congaHours=1):
+    # the glycemic variability metrics of each cgm series (or of each day of
+    # each series, if perDay is True):
+    #   * gmi: glucose management indicator (%), 3.31 + 0.02392 * mean
+    #   * jIndex: 0.001 * (mean + std) ** 2
+    #   * lbgi/hbgi: low and high blood glucose index (Kovatchev et al.)
+    #   * adrr: average daily risk range, the mean of the max low risk plus
+    #     the max high risk of each day
+    #   * conga<n>: std of the differences between each value and the value
+    #     n hours earlier
+    #   * modd: mean of the absolute differences between each value and the
+    #     value at the same time on the previous day
+    #   * mage: mean amplitude of glycemic excursions, the mean of the
+    #     excursions of more than one std (after the smaller oscillations are
+    #     merged into them) in the direction of the first excursion, and the
+    #     means of the rises (magePlus) and the falls (mageMinus)
+    # INPUTS:
+    #   * cgmSeries is a CgmSeries, or a dict of them (e.g., {userID: series})
+    # NOTE: for daily metrics, the differences (conga and modd) belong to the
+    #   day of the later value
+    keys, seriesList = _combine_series(cgmSeries)
+    if len(seriesList) == 0:
+        values = np.zeros(0)
+    else:
+        values = np.concatenate([s.values for s in seriesList]).astype(
+            np.float64)
+    groups, seriesOfSlot = _slot_groups(seriesList, perDay)
+    # every series (or day) is a group, including the series without any
+    # slots (e.g., to_cgm_series of empty data)
+    if perDay:
+        nGroups = sum(s.nDays for s in seriesList)
+    else:
+        nGroups = len(seriesList)
+    intervalMinutes = seriesList[0].intervalMinutes if seriesList else 5
+    slotsPerDay = (24 * 60) // intervalMinutes
+
+    metrics = pd.DataFrame({"count": np.bincount(
+        groups[~np.isnan(values)], minlength=nGroups)})
+    mean = _group_mean(values, groups, nGroups)
+    std = _group_std(values, groups, nGroups)
+    metrics["mean"] = mean
+    metrics["std"] = std
+    metrics["gmi"] = 3.31 + 0.02392 * mean
+    metrics["jIndex"] = 0.001 * (mean + std) ** 2
+
+    lowRisk, highRisk = risk_values(values)
+    metrics["lbgi"] = _group_mean(lowRisk, groups, nGroups)
+    metrics["hbgi"] = _group_mean(highRisk, groups, nGroups)
+
+    # the daily risk range of each day (of all series), then the mean of the
+    # days (with data) of each group
+    with warnings.catch_warnings():
+        # the days without data have a nan risk range
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        dailyRiskRange = \
+            np.nanmax(lowRisk.reshape(-1, slotsPerDay), axis=1) + \
+            np.nanmax(highRisk.reshape(-1, slotsPerDay), axis=1)
+    dayGroups = groups[::slotsPerDay]
+    metrics["adrr"] = _group_mean(dailyRiskRange, dayGroups, nGroups)
+
+    congaLag = int(congaHours * 60 // intervalMinutes)
+    differences, differenceGroups = _lagged_differences(
+        values, seriesOfSlot, groups, congaLag)
+    metrics["conga{0:g}".format(congaHours)] = \
+        _group_std(differences, differenceGroups, nGroups)
+
+    differences, differenceGroups = _lagged_differences(
+        values, seriesOfSlot, groups, slotsPerDay)
+    metrics["modd"] = _group_mean(np.abs(differences), differenceGroups,
+                                  nGroups)
+
+    metrics["mage"], metrics["magePlus"], metrics["mageMinus"] = \
+        _mage(values, groups, nGroups, std)
+
+    # the key (and date) of each group
+    if perDay:
+        groupKeys = pd.DataFrame({
+            "key": [keys[i] for i in seriesOfSlot[::slotsPerDay]],
+            "date": np.concatenate(
+                [s.dates.values for s in seriesList]) if seriesList else
+            np.zeros(0, dtype="datetime64[ns]")})
+    else:
+        groupKeys = pd.DataFrame({"key": keys})
+    metrics = pd.concat([groupKeys, metrics], axis=1)
+    if isinstance(cgmSeries, CgmSeries):
+        metrics = metrics.drop(columns=["key"])
+
+    return metrics